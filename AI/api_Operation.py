@@ -1,104 +1,420 @@
 import streamlit as st
 import time
-from AI.api_load import load_models  
+import asyncio
+import logging
+import threading
+import weakref
+from AI.api_load import load_models, get_model, get_async_model, close_async_models, key_for_task
+from AI.pdf_preprocessor import count_pages
+from AI.telemetry import new_call_record, fill_usage, record_call
+from AI.model_routing import choose_tier, next_tier, get_model_name
+from AI.json_repair import parse_json_response
+from AI.response_schemas import validate_response, expected_json_type
+from AI.resilience import call_with_retry, call_with_retry_async, CircuitOpenError
+from AI.prompt_cache import get_prompt_cache
+from AI.budget import get_budget_governor, estimate_call_tokens, current_priority, BudgetExceededError, PRIORITY_BATCH
+
+DEFAULT_MAX_CONCURRENCY = 4
+
+_semaphore_lock = threading.Lock()
+_thread_semaphores = {}
+_async_semaphores = weakref.WeakKeyDictionary()
+
+
+def get_max_concurrency() -> int:
+    """Chamadas simultâneas permitidas por chave de API, configurável em [app_settings] 'gemini_max_concurrency'."""
+    try:
+        return max(1, int(st.secrets.app_settings.get("gemini_max_concurrency", DEFAULT_MAX_CONCURRENCY)))
+    except Exception:
+        return DEFAULT_MAX_CONCURRENCY
+
+
+def _get_thread_semaphore(task_type: str) -> threading.BoundedSemaphore:
+    """Semáforo compartilhado pelo processo para as chamadas síncronas (ex.: pool da importação em lote)."""
+    key = key_for_task(task_type)
+    with _semaphore_lock:
+        if key not in _thread_semaphores:
+            _thread_semaphores[key] = threading.BoundedSemaphore(get_max_concurrency())
+        return _thread_semaphores[key]
+
+
+def _get_async_semaphore(task_type: str) -> asyncio.Semaphore:
+    """
+    Semáforo assíncrono por chave. Um asyncio.Semaphore fica preso ao event loop em que
+    foi usado, por isso mantemos um conjunto por loop (cada asyncio.run cria um novo).
+    """
+    loop = asyncio.get_running_loop()
+    key = key_for_task(task_type)
+    with _semaphore_lock:
+        semaphores = _async_semaphores.setdefault(loop, {})
+        if key not in semaphores:
+            semaphores[key] = asyncio.Semaphore(get_max_concurrency())
+        return semaphores[key]
+
 
 class PDFQA:
     def __init__(self):
         """
         Inicializa a classe carregando os dois modelos de IA (extração e auditoria)
-        usando a função load_models().
+        usando a função load_models(). Os modelos são compartilhados pelo processo,
+        então criar várias instâncias de PDFQA não recria clientes.
         """
         self.extraction_model, self.audit_model = load_models()
 
-    def answer_question(self, pdf_files, question, task_type='extraction'):
+    def _select_model(self, task_type):
+        """Retorna o modelo da tarefa ou None (exibindo o erro) se ele não estiver disponível."""
+        if task_type == 'audit':
+            if not self.audit_model:
+                st.error("O modelo de AUDITORIA não está disponível. Verifique sua chave 'GEMINI_AUDIT_KEY' nos secrets.")
+            return self.audit_model
+        # O padrão é 'extraction'
+        if not self.extraction_model:
+            st.error("O modelo de EXTRAÇÃO não está disponível. Verifique sua chave 'GEMINI_EXTRACTION_KEY' nos secrets.")
+        return self.extraction_model
+
+    def _get_model(self, task_type, tier):
+        """Modelo do tier escolhido pelo roteamento, ligado ao cliente da chave da tarefa."""
+        return get_model(key_for_task(task_type), get_model_name(task_type, tier))
+
+    def _get_async_model(self, task_type, tier):
+        """Equivalente de _get_model para o event loop em execução."""
+        return get_async_model(key_for_task(task_type), get_model_name(task_type, tier))
+
+    def _apply_prompt_prefix(self, model, task_type, tier, question, prompt_prefix):
+        """
+        Modelo e pergunta a usar com o prefixo fixo do prompt. Se o prefixo estiver no
+        cache (AI.prompt_cache), só a parte variável é enviada; senão, o prefixo é
+        anteposto à pergunta.
+        """
+        if not prompt_prefix or model is None:
+            return model, question
+        prompt_cache = get_prompt_cache()
+        cached_model = None
+        if prompt_cache is not None:
+            cached_model = prompt_cache.get_model(model, key_for_task(task_type), get_model_name(task_type, tier), prompt_prefix)
+        if cached_model is None:
+            return model, f"{prompt_prefix}\n\n{question}"
+        return cached_model, question
+
+    def _is_valid_response(self, answer, response_schema):
+        """Indica se a resposta decodifica para um JSON que segue o schema."""
+        data = parse_json_response(answer, expected=expected_json_type(response_schema))
+        return data is not None and validate_response(data, response_schema)
+
+    def answer_question(self, pdf_files, question, task_type='extraction', response_schema=None, doc_type=None,
+                        prompt_prefix=None, on_partial=None):
         """
         Função principal para responder a uma pergunta, selecionando o modelo apropriado.
-        Atua como um "roteador" para o modelo de IA correto.
-        
+        Atua como um "roteador": escolhe o tier do modelo pela tarefa, tipo de documento
+        e número de páginas e, se a resposta não seguir o schema, repete no tier seguinte.
+
         Args:
             pdf_files (list): Lista de caminhos ou objetos de arquivo PDF.
             question (str): A pergunta ou prompt.
             task_type (str): 'extraction' para tarefas simples (padrão), 'audit' para tarefas complexas.
-        
+            response_schema (dict, opcional): Schema de AI.response_schemas; quando informado,
+                o modelo é instruído a responder apenas JSON nesse formato.
+            doc_type (str, opcional): Tipo do documento, usado no roteamento e na telemetria.
+            prompt_prefix (str, opcional): Parte fixa do prompt, enviada antes dos PDFs e
+                registrada no cache de prompts (AI.prompt_cache) para as chamadas seguintes.
+            on_partial (callable, opcional): Ativa o streaming; recebe o texto acumulado a
+                cada trecho da resposta (ver AI.json_stream para ler os campos já completos).
+                Numa nova tentativa ou escalonamento, o texto recomeça do início.
+
         Returns:
             tuple: (response_text, duration) ou (None, 0) em caso de erro.
+
+        Raises:
+            BudgetExceededError: orçamento diário esgotado numa chamada com prioridade de
+                lote (AI.budget); chamadas interativas apenas exibem o aviso.
         """
         start_time = time.time()
-        
-        model_to_use = None
-        if task_type == 'audit':
-            model_to_use = self.audit_model
-            if not model_to_use:
-                st.error("O modelo de AUDITORIA não está disponível. Verifique sua chave 'GEMINI_AUDIT_KEY' nos secrets.")
-                return None, 0
-        else:  # O padrão é 'extraction'
-            model_to_use = self.extraction_model
-            if not model_to_use:
-                st.error("O modelo de EXTRAÇÃO não está disponível. Verifique sua chave 'GEMINI_EXTRACTION_KEY' nos secrets.")
-                return None, 0
+
+        if not self._select_model(task_type):
+            return None, 0
 
         try:
-            answer = self._generate_response(model_to_use, pdf_files, question)
+            pdf_parts = self._read_pdfs(pdf_files)
+            pages = sum(count_pages(pdf_bytes) or 0 for pdf_bytes in pdf_parts)
+            tier = choose_tier(task_type, doc_type, pages)
+
+            answer = None
+            while True:
+                attempt = self._call_model(task_type, tier, pdf_parts, pages, question, response_schema, doc_type, prompt_prefix,
+                                           on_partial)
+                if attempt is not None:
+                    answer = attempt  # Se o escalonamento falhar, fica a última resposta obtida
+                if attempt is None or response_schema is None or self._is_valid_response(attempt, response_schema):
+                    break
+                escalated_tier = next_tier(tier)
+                if not escalated_tier:
+                    break
+                logging.info(f"Resposta fora do schema ({task_type}/{doc_type}) no tier '{tier}'; escalonando para '{escalated_tier}'.")
+                tier = escalated_tier
+
             if answer is not None:
                 return answer, time.time() - start_time
             else:
+                logging.warning(f"Não foi possível obter uma resposta do modelo ({task_type}/{doc_type}).")
                 st.warning("Não foi possível obter uma resposta do modelo.")
                 return None, 0
+        except BudgetExceededError:
+            raise
         except Exception as e:
+            logging.error(f"Erro inesperado ao processar a pergunta para a tarefa '{task_type}': {e}", exc_info=True)
             st.error(f"Erro inesperado ao processar a pergunta para a tarefa '{task_type}': {e}")
             st.exception(e)
             return None, 0
 
-    def _generate_response(self, model, pdf_files, question):
+    def _estimate_tokens(self, pages, question, prompt_prefix):
+        return estimate_call_tokens(pages, len(question) + len(prompt_prefix or ""))
+
+    def _reject_call(self, record, error):
+        """Marca na telemetria uma chamada barrada pelo orçamento diário (AI.budget)."""
+        record['outcome'] = 'budget'
+        record['error'] = str(error)
+        logging.warning(str(error))
+
+    def _call_model(self, task_type, tier, pdf_parts, pages, question, response_schema, doc_type, prompt_prefix=None,
+                    on_partial=None):
         """
-        Função interna que prepara e envia a requisição para um modelo Gemini específico.
+        Uma chamada ao modelo do tier, dentro do orçamento diário e do limite de concorrência,
+        registrando a telemetria.
         """
+        start_time = time.time()
+        model = self._get_model(task_type, tier)
+        record = self._new_record(task_type, tier, model, pdf_parts, pages, doc_type)
+        governor = get_budget_governor()
         try:
-            # Preparar os inputs para o modelo
-            inputs = []
-            
-            for pdf_file in pdf_files:
-                if hasattr(pdf_file, 'read'):  # Se for um objeto de arquivo (como st.UploadedFile)
-                    pdf_bytes = pdf_file.getvalue() # Use getvalue() que é mais seguro
-                else:  # Se for um caminho de arquivo (string)
-                    with open(pdf_file, 'rb') as f:
-                        pdf_bytes = f.read()
-                
-                part = {"mime_type": "application/pdf", "data": pdf_bytes}
-                inputs.append(part)
-            
-            # Adicionar a pergunta como texto
-            inputs.append({"text": question})
-            
-            # Gerar resposta usando o modelo multimodal fornecido
-            response = model.generate_content(inputs)
-            
-            return response.text
-            
+            try:
+                reservation = governor.acquire(task_type, self._estimate_tokens(pages, question, prompt_prefix))
+            except BudgetExceededError as e:
+                self._reject_call(record, e)
+                if current_priority() == PRIORITY_BATCH:
+                    raise  # Trabalhos em lote param e retomam depois (ex.: campanhas de reauditoria)
+                st.warning(str(e))
+                return None
+            try:
+                model, question = self._apply_prompt_prefix(model, task_type, tier, question, prompt_prefix)
+                with _get_thread_semaphore(task_type):
+                    return self._generate_response(model, pdf_parts, question, response_schema, record, task_type, on_partial)
+            finally:
+                governor.settle(reservation, record['total_tokens'])
+        finally:
+            record['latency_s'] = round(time.time() - start_time, 3)
+            record_call(record)
+
+    async def answer_question_async(self, pdf_files, question, task_type='extraction', response_schema=None, doc_type=None,
+                                    prompt_prefix=None):
+        """
+        Versão assíncrona de answer_question, baseada em generate_content_async.
+        O número de chamadas simultâneas por chave é limitado por um semáforo.
+
+        Returns:
+            tuple: (response_text, duration) ou (None, 0) em caso de erro.
+
+        Raises:
+            BudgetExceededError: como em answer_question, só para chamadas com prioridade de lote.
+        """
+        start_time = time.time()
+
+        if not self._select_model(task_type):
+            return None, 0
+
+        try:
+            pdf_parts = self._read_pdfs(pdf_files)
+            pages = sum(count_pages(pdf_bytes) or 0 for pdf_bytes in pdf_parts)
+            tier = choose_tier(task_type, doc_type, pages)
+
+            answer = None
+            while True:
+                attempt = await self._call_model_async(task_type, tier, pdf_parts, pages, question, response_schema, doc_type,
+                                                        prompt_prefix)
+                if attempt is not None:
+                    answer = attempt  # Se o escalonamento falhar, fica a última resposta obtida
+                if attempt is None or response_schema is None or self._is_valid_response(attempt, response_schema):
+                    break
+                escalated_tier = next_tier(tier)
+                if not escalated_tier:
+                    break
+                logging.info(f"Resposta fora do schema ({task_type}/{doc_type}) no tier '{tier}'; escalonando para '{escalated_tier}'.")
+                tier = escalated_tier
+
+            if answer is not None:
+                return answer, time.time() - start_time
+            return None, 0
+        except BudgetExceededError:
+            raise
         except Exception as e:
-            st.error(f"Erro na comunicação com a API Gemini: {str(e)}")
-            return None
+            logging.error(f"Erro inesperado ao processar a pergunta assíncrona para a tarefa '{task_type}': {e}")
+            return None, 0
 
+    async def _call_model_async(self, task_type, tier, pdf_parts, pages, question, response_schema, doc_type,
+                                prompt_prefix=None):
+        """Equivalente assíncrono de _call_model."""
+        start_time = time.time()
+        model = self._get_async_model(task_type, tier)
+        record = self._new_record(task_type, tier, model, pdf_parts, pages, doc_type)
+        governor = get_budget_governor()
+        try:
+            try:
+                # A fila do orçamento bloqueia; aguarda fora do event loop (a prioridade segue no contexto).
+                reservation = await asyncio.to_thread(
+                    governor.acquire, task_type, self._estimate_tokens(pages, question, prompt_prefix)
+                )
+            except BudgetExceededError as e:
+                self._reject_call(record, e)
+                if current_priority() == PRIORITY_BATCH:
+                    raise
+                return None
+            try:
+                model, question = self._apply_prompt_prefix(model, task_type, tier, question, prompt_prefix)
+                async with _get_async_semaphore(task_type):
+                    return await self._generate_response_async(model, pdf_parts, question, response_schema, record, task_type)
+            finally:
+                governor.settle(reservation, record['total_tokens'])
+        finally:
+            record['latency_s'] = round(time.time() - start_time, 3)
+            record_call(record)
 
-   
+    async def gather_answers(self, jobs):
+        """
+        Executa várias perguntas de forma concorrente.
 
+        Args:
+            jobs (list): Lista de tuplas (pdf_files, question, task_type[, response_schema[, doc_type[, prompt_prefix]]]).
 
+        Returns:
+            list: Lista de (response_text, duration), na mesma ordem de 'jobs'.
+        """
+        return await asyncio.gather(*(self.answer_question_async(*job) for job in jobs))
 
+    def answer_questions(self, jobs):
+        """
+        Atalho síncrono para gather_answers, para uso direto nos scripts do Streamlit.
+        Cada chamada roda em um event loop novo (asyncio.run): modelos, clientes e semáforos
+        assíncronos são criados para esse loop (get_async_model, _get_async_semaphore) e os
+        clientes são fechados antes de o loop terminar, para que a chamada seguinte não
+        reutilize nada preso a um loop já encerrado.
+        """
+        if not jobs:
+            return []
 
+        async def run():
+            try:
+                return await self.gather_answers(jobs)
+            finally:
+                await close_async_models()
 
+        return asyncio.run(run())
 
-   
+    def _read_pdfs(self, pdf_files):
+        """Lê o conteúdo de cada PDF (caminho ou objeto de arquivo)."""
+        pdf_parts = []
+        for pdf_file in pdf_files:
+            if hasattr(pdf_file, 'read'):  # Se for um objeto de arquivo (como st.UploadedFile)
+                pdf_parts.append(pdf_file.getvalue()) # Use getvalue() que é mais seguro
+            else:  # Se for um caminho de arquivo (string)
+                with open(pdf_file, 'rb') as f:
+                    pdf_parts.append(f.read())
+        return pdf_parts
 
+    def _build_inputs(self, pdf_parts, question):
+        """Monta a lista de partes (PDFs + pergunta) enviada ao modelo."""
+        inputs = [{"mime_type": "application/pdf", "data": pdf_bytes} for pdf_bytes in pdf_parts]
+        # Adicionar a pergunta como texto
+        inputs.append({"text": question})
+        return inputs
 
+    def _build_generation_config(self, response_schema):
+        """Configuração para saída JSON restrita ao schema (None mantém o padrão do modelo)."""
+        if response_schema is None:
+            return None
+        return {"response_mime_type": "application/json", "response_schema": response_schema}
 
+    def _new_record(self, task_type, tier, model, pdf_parts, pages, doc_type):
+        """Registro de telemetria de uma chamada."""
+        record = new_call_record(task_type, doc_type, getattr(model, 'model_name', None))
+        record['tier'] = tier
+        record['input_bytes'] = sum(len(pdf_bytes) for pdf_bytes in pdf_parts)
+        record['pages'] = pages
+        return record
 
+    def _retry_counter(self, record):
+        """Callback de retentativa que contabiliza as tentativas extras na telemetria."""
+        def on_retry(attempt, delay, error):
+            if record is not None:
+                record['retries'] = attempt
+        return on_retry
 
-   
+    def _finish_record(self, record, response):
+        """Registra consumo e resultado da resposta na telemetria da chamada."""
+        if record is None:
+            return
+        fill_usage(record, response)
+        record['outcome'] = 'ok' if response.text else 'empty'
 
+    def _consume_stream(self, response, on_partial):
+        """Lê a resposta em streaming até o fim, repassando o texto acumulado a on_partial."""
+        text = ""
+        for chunk in response:
+            try:
+                text += chunk.text
+            except ValueError:
+                continue  # Trecho sem texto (ex.: só metadados de uso)
+            try:
+                on_partial(text)
+            except Exception as e:
+                logging.warning(f"Falha ao exibir a resposta parcial: {e}")
+        return response
 
+    def _generate_response(self, model, pdf_parts, question, response_schema=None, record=None, task_type='extraction',
+                           on_partial=None):
+        """
+        Função interna que prepara e envia a requisição para um modelo Gemini específico.
+        Erros transitórios (429/5xx) são repetidos com backoff; ver AI.resilience. Com
+        'on_partial', a resposta é recebida em streaming.
+        """
+        try:
+            inputs = self._build_inputs(pdf_parts, question)
+            generation_config = self._build_generation_config(response_schema)
 
+            def generate():
+                if on_partial is None:
+                    return model.generate_content(inputs, generation_config=generation_config)
+                stream = model.generate_content(inputs, generation_config=generation_config, stream=True)
+                return self._consume_stream(stream, on_partial)
 
-   
+            # Gerar resposta usando o modelo multimodal fornecido
+            response = call_with_retry(generate, key_for_task(task_type), on_retry=self._retry_counter(record))
+            self._finish_record(record, response)
 
+            return response.text
 
+        except CircuitOpenError as e:
+            if record is not None:
+                record['error'] = str(e)
+            st.error("A API Gemini está instável no momento (várias falhas seguidas). Aguarde alguns minutos e tente novamente.")
+            return None
+        except Exception as e:
+            if record is not None:
+                record['error'] = str(e)
+            st.error(f"Erro na comunicação com a API Gemini: {str(e)}")
+            return None
 
+    async def _generate_response_async(self, model, pdf_parts, question, response_schema=None, record=None, task_type='extraction'):
+        """Equivalente assíncrono de _generate_response."""
+        try:
+            inputs = self._build_inputs(pdf_parts, question)
+            generation_config = self._build_generation_config(response_schema)
+            response = await call_with_retry_async(
+                lambda: model.generate_content_async(inputs, generation_config=generation_config),
+                key_for_task(task_type), on_retry=self._retry_counter(record)
+            )
+            self._finish_record(record, response)
+            return response.text
+        except Exception as e:
+            if record is not None:
+                record['error'] = str(e)
+            logging.error(f"Erro na comunicação assíncrona com a API Gemini: {str(e)}")
+            return None
@@ -1,30 +1,132 @@
 import streamlit as st
 import google.generativeai as genai
+import google.ai.generativelanguage as glm
+from google.api_core import client_options as client_options_lib
+import asyncio
+import inspect
 import logging
+import threading
+import weakref
 
 logging.basicConfig(level=logging.INFO)
 
+EXTRACTION_MODEL_NAME = 'gemini-2.5-flash-preview-05-20'
+AUDIT_MODEL_NAME = 'gemini-2.5-flash'
+
+# Cada tipo de tarefa usa uma chave de API própria.
+API_KEY_SECRETS = {
+    'extraction': 'GEMINI_EXTRACTION_KEY',
+    'audit': 'GEMINI_AUDIT_KEY',
+}
+
+_async_lock = threading.Lock()
+_async_models = weakref.WeakKeyDictionary()
+
+
+def key_for_task(task_type: str) -> str:
+    return 'audit' if task_type == 'audit' else 'extraction'
+
+
+def get_api_key(key_name: str) -> str | None:
+    return st.secrets.get("general", {}).get(API_KEY_SECRETS[key_name])
+
+
+def _client_options(api_key: str):
+    return client_options_lib.ClientOptions(api_key=api_key)
+
+
+def default_client_key() -> str | None:
+    """Chave usada pelo cliente global: a de auditoria ou, na falta dela, a de extração."""
+    return next((key_name for key_name in ('audit', 'extraction') if get_api_key(key_name)), None)
+
+
+@st.cache_resource
+def configure_default_client() -> bool:
+    """
+    Configura uma única vez por processo o cliente global do google.generativeai, usado
+    por genai.embed_content e pelo cache de prompts. Os modelos de geração não dependem
+    dele: cada um recebe o cliente da sua própria chave, o que evita a troca de chave
+    entre sessões.
+    """
+    key_name = default_client_key()
+    if not key_name:
+        return False
+    genai.configure(api_key=get_api_key(key_name))
+    return True
+
+
+@st.cache_resource
+def get_generative_client(key_name: str):
+    """Cliente síncrono (thread-safe) da API Gemini para a chave, compartilhado pelo processo."""
+    api_key = get_api_key(key_name)
+    if not api_key:
+        return None
+    return glm.GenerativeServiceClient(client_options=_client_options(api_key))
+
+
+@st.cache_resource
+def get_model(key_name: str, model_name: str):
+    """Modelo Gemini ligado ao cliente da chave, criado uma vez por processo."""
+    client = get_generative_client(key_name)
+    if client is None:
+        return None
+    model = genai.GenerativeModel(model_name)
+    model._client = client
+    return model
+
+
+def get_async_model(key_name: str, model_name: str):
+    """
+    Modelo para generate_content_async. O cliente assíncrono fica preso ao event loop em
+    que foi criado, por isso mantemos um por loop (cada asyncio.run cria um novo).
+    """
+    api_key = get_api_key(key_name)
+    if not api_key:
+        return None
+    loop = asyncio.get_running_loop()
+    with _async_lock:
+        models = _async_models.setdefault(loop, {})
+        if (key_name, model_name) not in models:
+            model = genai.GenerativeModel(model_name)
+            model._async_client = glm.GenerativeServiceAsyncClient(client_options=_client_options(api_key))
+            models[(key_name, model_name)] = model
+        return models[(key_name, model_name)]
+
+
+async def close_async_models():
+    """Fecha os clientes assíncronos do event loop em execução, antes de o loop ser encerrado."""
+    loop = asyncio.get_running_loop()
+    with _async_lock:
+        models = _async_models.pop(loop, {})
+    for model in models.values():
+        try:
+            closing = model._async_client.transport.close()
+            if inspect.isawaitable(closing):
+                await closing
+        except Exception as e:
+            logging.warning(f"Falha ao fechar o cliente assíncrono do Gemini: {e}")
+
+
 def load_models():
     """
-    Carrega e configura dois modelos Gemini distintos, um para extração e outro para auditoria,
-    usando chaves de API separadas dos secrets do Streamlit.
+    Carrega dois modelos Gemini distintos, um para extração e outro para auditoria,
+    usando chaves de API separadas dos secrets do Streamlit. Os modelos e clientes
+    são compartilhados por todo o processo (ver get_model).
     """
     extraction_model = None
     audit_model = None
 
     try:
-        extraction_key = st.secrets.get("general", {}).get("GEMINI_EXTRACTION_KEY")
-        if extraction_key:
-            genai.configure(api_key=extraction_key)
-            extraction_model = genai.GenerativeModel('gemini-2.5-flash-preview-05-20') 
+        configure_default_client()
+
+        extraction_model = get_model('extraction', EXTRACTION_MODEL_NAME)
+        if extraction_model:
             logging.info("Modelo de EXTRAÇÃO carregado com sucesso.")
         else:
             st.warning("Chave 'GEMINI_EXTRACTION_KEY' não encontrada nos secrets. Funções de extração de dados serão desativadas.")
 
-        audit_key = st.secrets.get("general", {}).get("GEMINI_AUDIT_KEY")
-        if audit_key:
-            genai.configure(api_key=audit_key)
-            audit_model = genai.GenerativeModel('gemini-2.5-flash')
+        audit_model = get_model('audit', AUDIT_MODEL_NAME)
+        if audit_model:
             logging.info("Modelo de AUDITORIA carregado com sucesso.")
         else:
             st.warning("Chave 'GEMINI_AUDIT_KEY' não encontrada nos secrets. Funções de auditoria serão desativadas.")
@@ -34,5 +136,3 @@ def load_models():
     except Exception as e:
         st.error(f"Erro crítico ao carregar os modelos de IA: {e}")
         return None, None
-
-
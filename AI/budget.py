@@ -0,0 +1,253 @@
+"""
+Orçamento diário de tokens e chamadas da API Gemini.
+
+Antes de cada chamada, o PDFQA reserva uma estimativa de tokens no BudgetGovernor;
+ao terminar, a reserva é trocada pelo consumo real informado pela API. Os limites
+valem para o dia (total e por task_type) e o consumo do dia é retomado da telemetria
+quando o processo reinicia.
+
+Trabalho interativo (uploads, auditorias abertas pelo usuário) pode usar o orçamento
+inteiro. Trabalho em lote (importação em lote, reauditorias) só usa até a fração
+'ai_budget_soft_ratio' do limite, cedendo a vez sempre que houver uma chamada
+interativa aguardando. Perto do limite, as chamadas entram em fila até as reservas
+em andamento serem liquidadas; se o limite for atingido, BudgetExceededError.
+
+Configurável em [app_settings]: 'ai_daily_token_limit', 'ai_daily_call_limit',
+'ai_daily_token_limit_<task_type>', 'ai_daily_call_limit_<task_type>' (0 = sem
+limite), 'ai_budget_soft_ratio' e 'ai_budget_queue_timeout_s'.
+"""
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date
+
+import streamlit as st
+
+PRIORITY_INTERACTIVE = 'interativa'
+PRIORITY_BATCH = 'lote'
+
+TASK_TYPES = ('extraction', 'audit')
+
+DEFAULT_SOFT_RATIO = 0.8
+DEFAULT_QUEUE_TIMEOUT_S = 300
+
+# Estimativa da reserva: a API conta ~258 tokens por página de PDF, mais prompt e resposta.
+TOKENS_PER_PDF_PAGE = 258
+DEFAULT_OUTPUT_TOKENS = 1024
+CHARS_PER_TOKEN = 4
+
+_priority = contextvars.ContextVar('ai_priority', default=PRIORITY_INTERACTIVE)
+
+
+class BudgetExceededError(Exception):
+    """Orçamento diário esgotado (ou fila de espera expirada) para a chamada."""
+
+
+@contextmanager
+def batch_priority():
+    """As chamadas feitas dentro do bloco (na mesma thread/tarefa) contam como trabalho em lote."""
+    token = _priority.set(PRIORITY_BATCH)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def run_as_batch(func, *args, **kwargs):
+    """Executa func com prioridade de lote; útil como alvo de um ThreadPoolExecutor."""
+    with batch_priority():
+        return func(*args, **kwargs)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+def estimate_call_tokens(pages: int, prompt_chars: int) -> int:
+    return (pages or 1) * TOKENS_PER_PDF_PAGE + prompt_chars // CHARS_PER_TOKEN + DEFAULT_OUTPUT_TOKENS
+
+
+@dataclass
+class BudgetLimits:
+    tokens: int = 0
+    calls: int = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.tokens > 0 or self.calls > 0
+
+
+def get_budget_settings() -> dict:
+    settings = {
+        'total': BudgetLimits(),
+        'tasks': {task_type: BudgetLimits() for task_type in TASK_TYPES},
+        'soft_ratio': DEFAULT_SOFT_RATIO,
+        'queue_timeout_s': DEFAULT_QUEUE_TIMEOUT_S,
+    }
+    try:
+        app_settings = st.secrets.app_settings
+        settings['total'] = BudgetLimits(
+            int(app_settings.get("ai_daily_token_limit", 0)), int(app_settings.get("ai_daily_call_limit", 0))
+        )
+        for task_type in TASK_TYPES:
+            settings['tasks'][task_type] = BudgetLimits(
+                int(app_settings.get(f"ai_daily_token_limit_{task_type}", 0)),
+                int(app_settings.get(f"ai_daily_call_limit_{task_type}", 0))
+            )
+        settings['soft_ratio'] = min(1.0, max(0.0, float(app_settings.get("ai_budget_soft_ratio", DEFAULT_SOFT_RATIO))))
+        settings['queue_timeout_s'] = float(app_settings.get("ai_budget_queue_timeout_s", DEFAULT_QUEUE_TIMEOUT_S))
+    except Exception:
+        pass
+    return settings
+
+
+def load_today_usage() -> dict:
+    """{task_type: [tokens, chamadas]} do dia, a partir da telemetria (chamadas barradas não contam)."""
+    from AI.telemetry import load_telemetry
+
+    try:
+        df = load_telemetry(days=1)
+    except Exception as e:
+        logging.warning(f"Não foi possível ler o consumo do dia na telemetria: {e}")
+        return {}
+    df = df[df['outcome'] != 'budget']
+    if df.empty:
+        return {}
+    grouped = df.assign(total_tokens=df['total_tokens'].fillna(0)).groupby('task_type')['total_tokens']
+    tokens, calls = grouped.sum(), grouped.size()
+    return {task_type: [int(tokens[task_type]), int(calls[task_type])] for task_type in calls.index}
+
+
+@dataclass
+class Reservation:
+    task_type: str
+    tokens: int
+    priority: str
+
+
+class BudgetGovernor:
+    """Controle do orçamento diário compartilhado pelas threads do processo."""
+
+    def __init__(self, settings: dict | None = None, usage_loader=load_today_usage):
+        self.settings = settings or get_budget_settings()
+        self._usage_loader = usage_loader
+        self._cond = threading.Condition()
+        self._day = None
+        self._used = {}
+        self._reserved = {}
+        self._waiting = {PRIORITY_INTERACTIVE: 0, PRIORITY_BATCH: 0}
+        self.rejected = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.settings['total'].enabled or any(limits.enabled for limits in self.settings['tasks'].values())
+
+    def _roll_day(self):
+        today = date.today()
+        if self._day != today:
+            self._day = today
+            self._used = self._usage_loader()
+            self.rejected = 0
+
+    @staticmethod
+    def _sum(usage: dict, task_type: str | None) -> tuple[int, int]:
+        rows = [usage.get(task_type, [0, 0])] if task_type else usage.values()
+        return sum(row[0] for row in rows), sum(row[1] for row in rows)
+
+    def _scopes(self, task_type: str):
+        yield None, self.settings['total']
+        yield task_type, self.settings['tasks'].get(task_type, BudgetLimits())
+
+    def _decide(self, task_type: str, tokens: int, priority: str) -> str:
+        """'ok' (reserva já), 'wait' (aguarda reservas em andamento) ou 'reject'."""
+        ratio = 1.0 if priority == PRIORITY_INTERACTIVE else self.settings['soft_ratio']
+        decision = 'ok'
+        for scope, limits in self._scopes(task_type):
+            if not limits.enabled:
+                continue
+            used_tokens, used_calls = self._sum(self._used, scope)
+            reserved_tokens, reserved_calls = self._sum(self._reserved, scope)
+            token_cap, call_cap = limits.tokens * ratio, limits.calls * ratio
+            if (limits.tokens and used_tokens + tokens > token_cap) or (limits.calls and used_calls + 1 > call_cap):
+                return 'reject'
+            if (limits.tokens and used_tokens + reserved_tokens + tokens > token_cap) or \
+                    (limits.calls and used_calls + reserved_calls + 1 > call_cap):
+                decision = 'wait'
+        if priority == PRIORITY_BATCH and self._waiting[PRIORITY_INTERACTIVE]:
+            return 'wait'
+        return decision
+
+    def acquire(self, task_type: str, tokens: int, priority: str | None = None, timeout: float | None = None) -> Reservation:
+        """
+        Reserva 'tokens' (estimativa) para uma chamada. Bloqueia enquanto a chamada estiver
+        na fila; levanta BudgetExceededError se o orçamento não comportar a chamada.
+        """
+        priority = priority or current_priority()
+        timeout = self.settings['queue_timeout_s'] if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._roll_day()
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    decision = self._decide(task_type, tokens, priority)
+                    if decision == 'ok':
+                        break
+                    remaining = deadline - time.monotonic()
+                    if decision == 'reject' or remaining <= 0:
+                        self.rejected += 1
+                        kind = "do trabalho em lote" if priority == PRIORITY_BATCH else "diário"
+                        raise BudgetExceededError(
+                            f"Orçamento {kind} de IA esgotado para '{task_type}'. "
+                            f"Tente novamente mais tarde ou ajuste os limites em [app_settings]."
+                        )
+                    self._cond.wait(min(remaining, 5.0))
+                    self._roll_day()
+            finally:
+                self._waiting[priority] -= 1
+            row = self._reserved.setdefault(task_type, [0, 0])
+            row[0] += tokens
+            row[1] += 1
+        return Reservation(task_type, tokens, priority)
+
+    def settle(self, reservation: Reservation, actual_tokens: int):
+        """Troca a reserva pelo consumo real (a chamada conta mesmo sem tokens informados)."""
+        with self._cond:
+            row = self._reserved.setdefault(reservation.task_type, [0, 0])
+            row[0] = max(0, row[0] - reservation.tokens)
+            row[1] = max(0, row[1] - 1)
+            used = self._used.setdefault(reservation.task_type, [0, 0])
+            used[0] += int(actual_tokens or 0)
+            used[1] += 1
+            self._cond.notify_all()
+
+    def snapshot(self) -> dict:
+        """Consumo, reservas, limites e fila do dia, para o painel de administração."""
+        with self._cond:
+            self._roll_day()
+            scopes = []
+            for scope, limits in [(None, self.settings['total'])] + list(self.settings['tasks'].items()):
+                used_tokens, used_calls = self._sum(self._used, scope)
+                reserved_tokens, reserved_calls = self._sum(self._reserved, scope)
+                scopes.append({
+                    'escopo': scope or 'total',
+                    'tokens': used_tokens, 'limite_tokens': limits.tokens,
+                    'chamadas': used_calls, 'limite_chamadas': limits.calls,
+                    'tokens_reservados': reserved_tokens, 'chamadas_em_andamento': reserved_calls,
+                })
+            return {
+                'dia': self._day,
+                'escopos': scopes,
+                'fila_interativa': self._waiting[PRIORITY_INTERACTIVE],
+                'fila_lote': self._waiting[PRIORITY_BATCH],
+                'recusadas': self.rejected,
+                'soft_ratio': self.settings['soft_ratio'],
+            }
+
+
+@st.cache_resource
+def get_budget_governor() -> BudgetGovernor:
+    return BudgetGovernor()
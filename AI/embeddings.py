@@ -0,0 +1,119 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import google.generativeai as genai
+
+from AI.api_load import configure_default_client
+from AI.resilience import call_with_retry
+from AI.local_store import get_local_path, append_jsonl, read_jsonl, rewrite_jsonl
+
+# O mesmo modelo precisa ser usado para os chunks e para as consultas.
+EMBEDDING_MODEL = 'models/gemini-embedding-001'
+EMBEDDING_BATCH_SIZE = 90
+
+# embed_content usa o cliente global, configurado com a chave de auditoria.
+EMBEDDING_KEY_NAME = 'audit'
+
+QUERY_CACHE_MAX_ITEMS = 1024
+QUERY_CACHE_FILE = "query_embeddings.jsonl"
+# O arquivo é compactado (reescrito só com as entradas em memória) ao passar deste múltiplo de max_items.
+QUERY_CACHE_COMPACT_FACTOR = 2
+
+
+class QueryEmbeddingCache:
+    """
+    Cache LRU dos embeddings de consultas, chaveado por modelo + texto, com cópia em
+    disco (somente acréscimo, compactada periodicamente) para sobreviver a reinícios do processo.
+    """
+
+    def __init__(self, max_items: int = QUERY_CACHE_MAX_ITEMS, path: str | None = None):
+        self.max_items = max_items
+        self.path = path
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._file_lines = 0
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return hashlib.sha1(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+    def _path(self) -> str:
+        if self.path is None:
+            self.path = get_local_path("rag", QUERY_CACHE_FILE)
+        return self.path
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        records = read_jsonl(self._path())
+        self._file_lines = len(records)
+        for record in records[-self.max_items:]:
+            self._items[record["key"]] = np.asarray(record["vector"], dtype=np.float32)
+
+    def get(self, model: str, text: str) -> np.ndarray | None:
+        key = self.make_key(model, text)
+        with self._lock:
+            self._ensure_loaded()
+            vector = self._items.get(key)
+            if vector is not None:
+                self._items.move_to_end(key)
+            return vector
+
+    def put(self, model: str, text: str, vector: np.ndarray):
+        key = self.make_key(model, text)
+        with self._lock:
+            self._ensure_loaded()
+            is_new = key not in self._items
+            self._items[key] = vector
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+            if not is_new:
+                return
+            if self._file_lines + 1 >= self.max_items * QUERY_CACHE_COMPACT_FACTOR:
+                rewrite_jsonl(self._path(), [{"key": k, "vector": v.tolist()} for k, v in self._items.items()])
+                self._file_lines = len(self._items)
+                return
+            self._file_lines += 1
+        append_jsonl(self._path(), {"key": key, "vector": vector.tolist()})
+
+
+_query_cache = QueryEmbeddingCache()
+
+
+def embed_documents(texts: list[str], on_progress=None) -> np.ndarray:
+    """
+    Gera os embeddings dos chunks da base de conhecimento em lotes, com retentativas
+    em caso de limite de quota. 'on_progress(feitos, total)' é chamado a cada lote.
+    """
+    configure_default_client()
+    vectors = []
+    for i in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+        batch = texts[i:i + EMBEDDING_BATCH_SIZE]
+        result = call_with_retry(
+            lambda: genai.embed_content(model=EMBEDDING_MODEL, content=batch, task_type="RETRIEVAL_DOCUMENT"),
+            EMBEDDING_KEY_NAME
+        )
+        vectors.extend(result['embedding'])
+        if on_progress:
+            on_progress(min(i + EMBEDDING_BATCH_SIZE, len(texts)), len(texts))
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def embed_query(text: str) -> np.ndarray:
+    """Embedding de uma consulta de busca semântica. Consultas repetidas vêm do cache, sem chamada à API."""
+    cached = _query_cache.get(EMBEDDING_MODEL, text)
+    if cached is not None:
+        return cached
+    configure_default_client()
+    result = call_with_retry(
+        lambda: genai.embed_content(model=EMBEDDING_MODEL, content=text, task_type="RETRIEVAL_QUERY"),
+        EMBEDDING_KEY_NAME
+    )
+    vector = np.asarray(result['embedding'], dtype=np.float32)
+    _query_cache.put(EMBEDDING_MODEL, text, vector)
+    return vector
@@ -0,0 +1,126 @@
+import ast
+import json
+import logging
+import re
+
+_FENCE_RE = re.compile(r'```(?:json|JSON)?\s*(.*?)\s*```', re.DOTALL)
+_SMART_QUOTES = str.maketrans({'“': '"', '”': '"', '„': '"'})
+_PY_LITERALS = {'True': 'true', 'False': 'false', 'None': 'null'}
+_CLOSERS = {'{': '}', '[': ']'}
+
+
+def _strip_fences(text: str) -> str:
+    match = _FENCE_RE.search(text)
+    return match.group(1) if match else text
+
+
+def _extract_json_block(text: str, expected: type | None) -> str | None:
+    """Recorta do texto o primeiro objeto/array JSON (ou o do tipo esperado)."""
+    openers = '{' if expected is dict else '[' if expected is list else '{['
+    starts = [i for i in (text.find(c) for c in openers) if i != -1]
+    if not starts:
+        return None
+    return text[min(starts):]
+
+
+def repair_json(text: str) -> str:
+    """
+    Corrige os defeitos mais comuns das respostas do modelo: vírgulas sobrando antes
+    de '}'/']', literais do Python (True/False/None), aspas tipográficas, texto após
+    o fim do JSON e respostas truncadas (fecha strings, objetos e arrays abertos).
+    """
+    text = text.translate(_SMART_QUOTES)
+    out = []
+    stack = []
+    in_string = False
+    escape = False
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if in_string:
+            out.append(char)
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+            i += 1
+            continue
+
+        if char == '"':
+            in_string = True
+            out.append(char)
+        elif char in _CLOSERS:
+            stack.append(_CLOSERS[char])
+            out.append(char)
+        elif char in '}]':
+            while out and (out[-1].isspace() or out[-1] == ','):
+                out.pop()
+            if stack and stack[-1] == char:
+                stack.pop()
+            out.append(char)
+            if not stack:
+                break  # Ignora qualquer texto depois do fim do JSON
+        elif char.isalpha():
+            word = re.match(r'\w+', text[i:]).group(0)
+            out.append(_PY_LITERALS.get(word, word))
+            i += len(word)
+            continue
+        else:
+            out.append(char)
+        i += 1
+
+    if in_string:
+        out.append('"')
+    while stack:
+        while out and (out[-1].isspace() or out[-1] in ',:'):
+            out.pop()
+        out.append(stack.pop())
+    return ''.join(out)
+
+
+def parse_json_response(text: str | None, expected: type | None = None):
+    """
+    Converte a resposta do modelo em objeto Python, tentando primeiro o JSON puro e,
+    em seguida, a recuperação local (sem nova chamada à IA).
+
+    Args:
+        text: Resposta bruta do modelo.
+        expected: dict ou list para validar/procurar o tipo do JSON esperado.
+
+    Returns:
+        O objeto decodificado, ou None se não foi possível recuperá-lo.
+    """
+    if not text or not isinstance(text, str):
+        return None
+
+    candidates = [text.strip()]
+    unfenced = _strip_fences(text).strip()
+    block = _extract_json_block(unfenced, expected)
+    if block:
+        candidates.append(block)
+        try:
+            candidates.append(repair_json(block))
+        except Exception as e:
+            logging.warning(f"Falha na recuperação local do JSON: {e}")
+
+    for candidate in candidates:
+        try:
+            data = json.loads(candidate, strict=False)
+        except (json.JSONDecodeError, ValueError):
+            continue
+        if expected is None or isinstance(data, expected):
+            return data
+
+    if block:
+        # Último recurso: JSON com aspas simples no estilo de dicionário Python.
+        try:
+            data = ast.literal_eval(block[:block.rfind('}' if block[0] == '{' else ']') + 1])
+            if expected is None or isinstance(data, expected):
+                return data
+        except Exception:
+            pass
+
+    logging.warning("Não foi possível recuperar um JSON válido da resposta do modelo.")
+    return None
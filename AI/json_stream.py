@@ -0,0 +1,114 @@
+"""
+Leitura incremental de respostas JSON recebidas em streaming.
+
+O parser acompanha o texto acumulado e extrai cada campo de nível superior do
+objeto assim que o seu valor termina de chegar, sem esperar o fechamento do JSON.
+Para um array ainda em recebimento (ex.: 'pontos_de_nao_conformidade'), os itens já
+completos ficam disponíveis em pending_items(). O resultado final continua sendo
+lido por AI.json_repair.parse_json_response.
+"""
+import json
+
+_WHITESPACE = ' \t\r\n'
+
+
+def _skip(text: str, pos: int, chars: str = _WHITESPACE) -> int:
+    while pos < len(text) and text[pos] in chars:
+        pos += 1
+    return pos
+
+
+class IncrementalJSONParser:
+    """Campos completos de um objeto JSON parcial, atualizados a cada feed()."""
+
+    def __init__(self):
+        self.text = ""
+        self.fields = {}
+        self.done = False
+        self._decoder = json.JSONDecoder(strict=False)
+        self._pos = None  # Posição logo após o último campo completo
+
+    def reset(self):
+        self.__init__()
+
+    def feed(self, chunk: str) -> dict:
+        """Acrescenta um trecho da resposta e retorna os campos que ficaram completos com ele."""
+        self.text += chunk
+        return self._advance()
+
+    def update(self, text: str) -> dict:
+        """
+        Recebe o texto acumulado até agora. Se ele não continua o anterior (nova
+        tentativa ou escalonamento de modelo), a leitura recomeça do zero.
+        """
+        if not text.startswith(self.text):
+            self.reset()
+        return self.feed(text[len(self.text):])
+
+    def _read_member(self, pos: int):
+        """(chave, posição do valor) do próximo campo, ou None se ainda estiver incompleto."""
+        key, pos = self._decoder.raw_decode(self.text, pos)
+        if not isinstance(key, str):
+            raise ValueError("Chave JSON inválida.")
+        pos = _skip(self.text, pos)
+        if pos >= len(self.text):
+            return None
+        if self.text[pos] != ':':
+            raise ValueError("Separador ':' ausente.")
+        return key, _skip(self.text, pos + 1)
+
+    def _advance(self) -> dict:
+        completed = {}
+        if self._pos is None:
+            start = self.text.find('{')
+            if start == -1:
+                return completed
+            self._pos = start + 1
+        while not self.done:
+            pos = _skip(self.text, self._pos, _WHITESPACE + ',')
+            if pos >= len(self.text):
+                break
+            if self.text[pos] == '}':
+                self.done = True
+                break
+            try:
+                member = self._read_member(pos)
+                if member is None:
+                    break
+                key, value_pos = member
+                value, end = self._decoder.raw_decode(self.text, value_pos)
+            except json.JSONDecodeError:
+                break  # Valor ainda incompleto
+            except ValueError:
+                self.done = True  # Não é JSON: o resultado final fica com parse_json_response
+                break
+            # Um número no fim do buffer pode ainda ganhar dígitos.
+            if end >= len(self.text):
+                break
+            self.fields[key] = value
+            completed[key] = value
+            self._pos = end
+        return completed
+
+    def pending_items(self) -> tuple[str | None, list]:
+        """(chave, itens completos) do array que está sendo recebido, ou (None, [])."""
+        if self.done or self._pos is None:
+            return None, []
+        try:
+            member = self._read_member(_skip(self.text, self._pos, _WHITESPACE + ','))
+        except ValueError:
+            return None, []
+        if member is None:
+            return None, []
+        key, pos = member
+        if pos >= len(self.text) or self.text[pos] != '[':
+            return None, []
+        items = []
+        pos += 1
+        while True:
+            pos = _skip(self.text, pos, _WHITESPACE + ',')
+            try:
+                item, pos = self._decoder.raw_decode(self.text, pos)
+            except (json.JSONDecodeError, ValueError):
+                return key, items
+            items.append(item)
@@ -0,0 +1,70 @@
+import json
+import logging
+import os
+import threading
+
+import streamlit as st
+
+DEFAULT_DATA_DIR = ".segsisone_data"
+
+_append_lock = threading.Lock()
+
+
+def get_local_data_dir() -> str:
+    """
+    Diretório local onde ficam os artefatos gerados pela aplicação (telemetria,
+    caches e índices). Configurável em [app_settings] 'local_data_dir'.
+    """
+    try:
+        data_dir = st.secrets.app_settings.get("local_data_dir", DEFAULT_DATA_DIR)
+    except Exception:
+        data_dir = DEFAULT_DATA_DIR
+    os.makedirs(data_dir, exist_ok=True)
+    return data_dir
+
+
+def get_local_path(*parts: str) -> str:
+    """Caminho dentro do diretório local de dados, criando as subpastas necessárias."""
+    path = os.path.join(get_local_data_dir(), *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def append_jsonl(path: str, record: dict):
+    """Acrescenta um registro (uma linha JSON) ao arquivo. Nunca reescreve o conteúdo existente."""
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    try:
+        with _append_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except OSError as e:
+        logging.warning(f"Não foi possível gravar em '{path}': {e}")
+
+
+def rewrite_jsonl(path: str, records: list[dict]):
+    """Substitui o conteúdo do arquivo pelos registros, via arquivo temporário e os.replace."""
+    tmp_path = f"{path}.tmp"
+    try:
+        with _append_lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            os.replace(tmp_path, path)
+    except OSError as e:
+        logging.warning(f"Não foi possível reescrever '{path}': {e}")
+
+
+def read_jsonl(path: str) -> list[dict]:
+    """Lê todos os registros do arquivo, ignorando linhas corrompidas (ex.: escrita interrompida)."""
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
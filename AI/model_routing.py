@@ -0,0 +1,75 @@
+"""
+Roteamento de modelos por faixa ("tier"): documentos simples vão para um modelo
+mais leve e barato, auditorias de documentos extensos para um modelo mais robusto.
+Quando a resposta não passa na validação do schema, a chamada é repetida no
+tier seguinte (escalonamento).
+"""
+import streamlit as st
+
+from AI.api_load import EXTRACTION_MODEL_NAME, AUDIT_MODEL_NAME
+
+DEFAULT_TIER = 'standard'
+
+TIER_ORDER = ['lite', 'standard', 'pro']
+
+TIER_MODEL_NAMES = {
+    'lite': 'gemini-2.5-flash-lite',
+    'pro': 'gemini-2.5-pro',
+}
+
+# Regras avaliadas em ordem; a primeira que casar define o tier.
+# 'doc_types', 'min_pages' e 'max_pages' são opcionais.
+ROUTING_RULES = [
+    {'task_type': 'extraction', 'doc_types': ['EPI'], 'tier': 'lite'},
+    {'task_type': 'extraction', 'doc_types': ['ASO', 'Treinamento'], 'max_pages': 2, 'tier': 'lite'},
+    {'task_type': 'audit', 'doc_types': ['PGR', 'PCMSO'], 'tier': 'pro'},
+    {'task_type': 'audit', 'min_pages': 30, 'tier': 'pro'},
+]
+
+
+def _routing_enabled() -> bool:
+    try:
+        return bool(st.secrets.app_settings.get("model_routing", True))
+    except Exception:
+        return True
+
+
+def _rule_matches(rule: dict, task_type: str, doc_type: str | None, pages: int | None) -> bool:
+    if rule['task_type'] != task_type:
+        return False
+    if 'doc_types' in rule and doc_type not in rule['doc_types']:
+        return False
+    if 'max_pages' in rule and (pages is None or pages > rule['max_pages']):
+        return False
+    if 'min_pages' in rule and (pages is None or pages < rule['min_pages']):
+        return False
+    return True
+
+
+def choose_tier(task_type: str, doc_type: str | None = None, pages: int | None = None) -> str:
+    """Escolhe o tier do modelo pela tarefa, tipo de documento e número de páginas."""
+    if not _routing_enabled():
+        return DEFAULT_TIER
+    for rule in ROUTING_RULES:
+        if _rule_matches(rule, task_type, doc_type, pages):
+            return rule['tier']
+    return DEFAULT_TIER
+
+
+def next_tier(tier: str) -> str | None:
+    """Tier usado no escalonamento, ou None se já estamos no mais robusto."""
+    index = TIER_ORDER.index(tier)
+    return TIER_ORDER[index + 1] if index + 1 < len(TIER_ORDER) else None
+
+
+def get_model_name(task_type: str, tier: str) -> str:
+    """
+    Nome do modelo de um tier. O tier 'standard' usa os modelos carregados em api_load;
+    os demais podem ser trocados em [app_settings] 'model_lite' / 'model_pro'.
+    """
+    if tier == DEFAULT_TIER:
+        return AUDIT_MODEL_NAME if task_type == 'audit' else EXTRACTION_MODEL_NAME
+    try:
+        return st.secrets.app_settings.get(f"model_{tier}", TIER_MODEL_NAMES[tier])
+    except Exception:
+        return TIER_MODEL_NAMES[tier]
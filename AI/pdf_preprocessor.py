@@ -0,0 +1,227 @@
+import io
+import logging
+import re
+import unicodedata
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:  # pypdf é opcional: sem ele o PDF segue inteiro para o modelo
+    PdfReader = None
+    PdfWriter = None
+
+# Documentos com até este número de páginas são enviados inteiros.
+MIN_PAGES_FOR_SELECTION = 8
+
+# Abaixo desta média de caracteres por página consideramos que o PDF é escaneado
+# (sem camada de texto) e a seleção local não é confiável.
+MIN_CHARS_PER_PAGE = 40
+
+# Palavras-chave (sem acento, minúsculas) que identificam cada seção de interesse.
+SECTION_KEYWORDS = {
+    'identificacao': [
+        'programa de gerenciamento de riscos', 'programa de controle medico',
+        'pgr', 'pcmso', 'ppr', 'pca', 'data de emissao', 'data de elaboracao',
+        'vigencia', 'validade', 'revisao', 'elaborado em',
+    ],
+    'inventario_riscos': [
+        'inventario de riscos', 'inventario de perigos', 'avaliacao de riscos',
+        'nivel de risco', 'severidade', 'probabilidade', 'matriz de risco',
+        'agente de risco', 'perigos e riscos',
+    ],
+    'plano_acao': [
+        'plano de acao', 'cronograma', 'medidas de prevencao', 'medidas de controle',
+        'prazo', 'responsavel pela acao',
+    ],
+    'emergencia': [
+        'emergencia', 'resposta a emergencias', 'plano de atendimento',
+        'primeiros socorros', 'brigada',
+    ],
+    'exames': [
+        'exames complementares', 'exame clinico', 'periodicidade dos exames',
+        'medico responsavel', 'medico coordenador', 'relatorio analitico',
+    ],
+    'assinaturas': [
+        'assinatura', 'responsavel tecnico', 'elaborado por', 'aprovado por',
+        'crea', 'crm', 'engenheiro de seguranca', 'medico do trabalho',
+    ],
+}
+
+# Perfis de seleção: quais seções interessam a cada tarefa e o limite de páginas.
+SELECTION_PROFILES = {
+    'identificacao': {'sections': ['identificacao'], 'max_pages': 4},
+    'PGR': {'sections': ['inventario_riscos', 'plano_acao', 'emergencia', 'assinaturas'], 'max_pages': 25},
+    'PCMSO': {'sections': ['exames', 'plano_acao', 'emergencia', 'assinaturas'], 'max_pages': 25},
+    'default': {'sections': ['identificacao', 'assinaturas'], 'max_pages': 12},
+}
+
+COVER_PAGES = 2
+
+# Auditoria por seção: limite de páginas enviadas para cada seção.
+SECTION_MAX_PAGES = 8
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r'\s+', ' ', text).lower()
+
+
+def extract_page_texts(pdf_bytes: bytes) -> list[str] | None:
+    """
+    Lê a camada de texto do PDF e retorna o texto de cada página.
+    Retorna None se o pypdf não estiver instalado ou se o PDF não puder ser lido.
+    """
+    if PdfReader is None or not pdf_bytes:
+        return None
+    try:
+        reader = PdfReader(io.BytesIO(pdf_bytes))
+        return [page.extract_text() or '' for page in reader.pages]
+    except Exception as e:
+        logging.warning(f"Não foi possível ler a camada de texto do PDF: {e}")
+        return None
+
+
+def count_pages(pdf_bytes: bytes) -> int | None:
+    """Número de páginas do PDF, ou None se não for possível lê-lo."""
+    if PdfReader is None or not pdf_bytes:
+        return None
+    try:
+        return len(PdfReader(io.BytesIO(pdf_bytes)).pages)
+    except Exception:
+        return None
+
+
+def _has_text_layer(page_texts: list[str]) -> bool:
+    if not page_texts:
+        return False
+    total_chars = sum(len(t.strip()) for t in page_texts)
+    return total_chars / len(page_texts) >= MIN_CHARS_PER_PAGE
+
+
+def _score_pages(page_texts: list[str], sections: list[str]) -> dict[str, list[tuple[int, int]]]:
+    """Para cada seção, retorna a lista de (página, acertos) ordenada por relevância."""
+    normalized = [_normalize(t) for t in page_texts]
+    scores = {}
+    for section in sections:
+        keywords = SECTION_KEYWORDS.get(section, [])
+        hits = []
+        for index, text in enumerate(normalized):
+            count = sum(text.count(kw) for kw in keywords)
+            if count:
+                hits.append((index, count))
+        scores[section] = sorted(hits, key=lambda h: h[1], reverse=True)
+    return scores
+
+
+def choose_pages(page_texts: list[str], profile: str = 'default') -> list[int]:
+    """
+    Escolhe os índices (base 0) das páginas relevantes para o perfil informado:
+    sempre a capa e a última página (assinaturas), mais as páginas com maior
+    densidade de palavras-chave de cada seção e a página seguinte a cada uma
+    (tabelas de inventário e cronogramas costumam continuar na próxima página).
+    """
+    config = SELECTION_PROFILES.get(profile, SELECTION_PROFILES['default'])
+    total = len(page_texts)
+    max_pages = config['max_pages']
+
+    selected = set(range(min(COVER_PAGES, total)))
+    selected.add(total - 1)
+
+    scores = _score_pages(page_texts, config['sections'])
+    # Distribui o orçamento de páginas entre as seções, em rodízio, para que
+    # uma seção muito extensa não esgote o limite sozinha.
+    ranked = [list(hits) for hits in scores.values()]
+    while len(selected) < max_pages and any(ranked):
+        for hits in ranked:
+            if not hits or len(selected) >= max_pages:
+                continue
+            page_index, _ = hits.pop(0)
+            selected.add(page_index)
+            if page_index + 1 < total and len(selected) < max_pages:
+                selected.add(page_index + 1)
+
+    return sorted(selected)
+
+
+def split_sections(page_texts: list[str], sections: list[str], max_pages: int = SECTION_MAX_PAGES) -> dict[str, list[int]]:
+    """
+    Índices (base 0) das páginas de cada seção, para auditar as seções separadamente.
+    Cada seção leva as páginas com mais palavras-chave e a página seguinte a cada uma;
+    'assinaturas' também leva a capa e a última página (datas de emissão e assinaturas).
+    Seções sem nenhuma página identificada ficam com a lista vazia.
+    """
+    total = len(page_texts)
+    scores = _score_pages(page_texts, sections)
+    split = {}
+    for section in sections:
+        selected = set()
+        if section == 'assinaturas' and total:
+            selected.update(range(min(COVER_PAGES, total)))
+            selected.add(total - 1)
+        for page_index, _ in scores[section]:
+            if len(selected) >= max_pages:
+                break
+            selected.add(page_index)
+            if page_index + 1 < total and len(selected) < max_pages:
+                selected.add(page_index + 1)
+        split[section] = sorted(selected) if scores[section] or section == 'assinaturas' else []
+    return split
+
+
+def _write_pages(pdf_bytes: bytes, page_indices: list[int]) -> bytes:
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    writer = PdfWriter()
+    for index in page_indices:
+        writer.add_page(reader.pages[index])
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def select_relevant_pages(pdf_bytes: bytes, profile: str = 'default') -> tuple[bytes, dict]:
+    """
+    Reduz um PDF longo às páginas relevantes para o perfil (ex: 'identificacao', 'PGR',
+    'PCMSO'), usando apenas a camada de texto local. Documentos curtos, escaneados
+    ou ilegíveis são devolvidos sem alteração.
+
+    Returns:
+        tuple: (pdf_bytes, stats) onde stats contém 'total_pages', 'selected_pages'
+               (números de página base 1), 'original_bytes' e 'reduced_bytes'.
+    """
+    stats = {
+        'profile': profile,
+        'total_pages': None,
+        'selected_pages': None,
+        'original_bytes': len(pdf_bytes),
+        'reduced_bytes': len(pdf_bytes),
+    }
+
+    page_texts = extract_page_texts(pdf_bytes)
+    if page_texts is None:
+        return pdf_bytes, stats
+
+    stats['total_pages'] = len(page_texts)
+    if len(page_texts) <= MIN_PAGES_FOR_SELECTION or not _has_text_layer(page_texts):
+        return pdf_bytes, stats
+
+    page_indices = choose_pages(page_texts, profile)
+    if len(page_indices) >= len(page_texts):
+        return pdf_bytes, stats
+
+    try:
+        reduced = _write_pages(pdf_bytes, page_indices)
+    except Exception as e:
+        logging.warning(f"Falha ao gerar o PDF reduzido, enviando o documento completo: {e}")
+        return pdf_bytes, stats
+
+    if len(reduced) >= len(pdf_bytes):
+        return pdf_bytes, stats
+
+    stats['selected_pages'] = [i + 1 for i in page_indices]
+    stats['reduced_bytes'] = len(reduced)
+    saving = 1 - (stats['reduced_bytes'] / stats['original_bytes']) if stats['original_bytes'] else 0
+    logging.info(
+        f"Seleção de páginas ({profile}): {len(page_indices)}/{len(page_texts)} páginas, "
+        f"{stats['original_bytes']} -> {stats['reduced_bytes']} bytes ({saving:.0%} de economia)."
+    )
+    return reduced, stats
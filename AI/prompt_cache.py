@@ -0,0 +1,207 @@
+"""
+Cache de prefixos de prompt.
+
+As instruções fixas da auditoria (persona, checklist da norma e contexto RAG do tipo
+de documento) se repetem em todas as chamadas. Com o backend 'gemini', o prefixo é
+registrado uma vez na API (CachedContent) e as chamadas seguintes enviam apenas os
+PDFs e a parte variável do prompt, cobrando os tokens do prefixo com desconto.
+
+O backend 'local' mantém os prefixos em memória e os reenvia junto com a pergunta:
+não economiza tokens, mas permite exercitar o mesmo fluxo sem a API de cache (testes
+e ambientes sem suporte). Configurável em [app_settings] 'prompt_cache' ('gemini',
+'local' ou 'off'), 'prompt_cache_ttl_s' e 'prompt_cache_min_tokens'.
+"""
+import hashlib
+import logging
+import threading
+import time
+
+import streamlit as st
+import google.generativeai as genai
+from google.api_core import exceptions as api_exceptions
+
+from AI.resilience import is_retryable, retry_after_seconds
+
+BACKEND_GEMINI = 'gemini'
+BACKEND_LOCAL = 'local'
+BACKEND_OFF = 'off'
+
+DEFAULT_TTL_S = 3600
+# Margem para recriar o cache antes de ele expirar no servidor durante uma chamada.
+EXPIRY_MARGIN_S = 120
+# A API recusa caches menores que o mínimo do modelo (1024 tokens no Gemini 2.5 Flash).
+DEFAULT_MIN_TOKENS = 1024
+CHARS_PER_TOKEN = 4
+# Após uma falha transitória (cota, indisponibilidade), o prefixo vai no prompt completo
+# por este tempo antes de uma nova tentativa de criar o cache.
+TRANSIENT_RETRY_S = 60.0
+# Erros que indicam que o prefixo ou o modelo não aceitam cache (ex.: prefixo pequeno demais).
+PERMANENT_ERRORS = (api_exceptions.InvalidArgument, api_exceptions.FailedPrecondition, api_exceptions.NotFound)
+_PERMANENT_HINTS = ('too small', 'not supported', 'unsupported', 'minimum')
+
+
+def get_prompt_cache_settings() -> tuple[str, int, int]:
+    """(backend, ttl em segundos, tamanho mínimo do prefixo em tokens)."""
+    backend, ttl, min_tokens = BACKEND_GEMINI, DEFAULT_TTL_S, DEFAULT_MIN_TOKENS
+    try:
+        app_settings = st.secrets.app_settings
+        backend = str(app_settings.get("prompt_cache", BACKEND_GEMINI)).lower()
+        ttl = int(app_settings.get("prompt_cache_ttl_s", DEFAULT_TTL_S))
+        min_tokens = int(app_settings.get("prompt_cache_min_tokens", DEFAULT_MIN_TOKENS))
+    except Exception:
+        pass
+    if backend not in (BACKEND_GEMINI, BACKEND_LOCAL):
+        backend = BACKEND_OFF
+    return backend, max(ttl, 2 * EXPIRY_MARGIN_S), min_tokens
+
+
+def is_permanent_cache_error(error: Exception) -> bool:
+    """Se a falha ao criar o cache vai se repetir para o mesmo prefixo (e não é cota ou rede)."""
+    if is_retryable(error):
+        return False
+    message = str(error).lower()
+    return isinstance(error, PERMANENT_ERRORS) or any(hint in message for hint in _PERMANENT_HINTS)
+
+
+def prefix_key(model_name: str, prefix: str) -> str:
+    return hashlib.sha1(f"{model_name}\n{prefix}".encode("utf-8")).hexdigest()
+
+
+class PrefixedModel:
+    """
+    Modelo que antepõe um prefixo de texto ao conteúdo de cada chamada. É o modelo
+    devolvido pelo LocalPromptCache, com a mesma interface usada pelo PDFQA.
+    """
+
+    def __init__(self, model, prefix: str):
+        self._model = model
+        self.prefix = prefix
+        self.model_name = getattr(model, 'model_name', None)
+
+    def _contents(self, contents):
+        return [{"text": self.prefix}] + list(contents)
+
+    def generate_content(self, contents, **kwargs):
+        return self._model.generate_content(self._contents(contents), **kwargs)
+
+    async def generate_content_async(self, contents, **kwargs):
+        return await self._model.generate_content_async(self._contents(contents), **kwargs)
+
+
+class LocalPromptCache:
+    """Registro de prefixos em memória; os prefixos são reenviados a cada chamada."""
+
+    def __init__(self):
+        self._prefixes = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_model(self, model, key_name: str, model_name: str, prefix: str):
+        key = prefix_key(model_name, prefix)
+        with self._lock:
+            if key in self._prefixes:
+                self.hits += 1
+            else:
+                self.misses += 1
+                self._prefixes[key] = prefix
+        return PrefixedModel(model, prefix)
+
+    def clear(self):
+        with self._lock:
+            self._prefixes.clear()
+
+
+class GeminiPromptCache:
+    """
+    Prefixos registrados como CachedContent na API Gemini. A criação usa o cliente
+    global (ver AI.api_load.configure_default_client), então o cache só é usado para a
+    chave configurada nele; para as demais, get_model retorna None e o prefixo segue
+    no próprio prompt. Falhas na criação também desviam para o prompt completo: as
+    permanentes para sempre, as transitórias por TRANSIENT_RETRY_S. A criação roda fora
+    do lock, e só uma thread por prefixo cria o cache enquanto as demais aguardam.
+    """
+
+    def __init__(self, ttl_s: int = DEFAULT_TTL_S, min_tokens: int = DEFAULT_MIN_TOKENS):
+        self.ttl_s = ttl_s
+        self.min_tokens = min_tokens
+        self._entries = {}
+        self._rejected = set()
+        self._retry_at = {}
+        self._creating = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _create(self, model_name: str, prefix: str):
+        return genai.caching.CachedContent.create(
+            model=model_name, contents=[{"role": "user", "parts": [{"text": prefix}]}], ttl=self.ttl_s
+        )
+
+    def _cached_content(self, model_name: str, prefix: str):
+        key = prefix_key(model_name, prefix)
+        while True:
+            with self._lock:
+                if key in self._rejected or self._retry_at.get(key, 0) > time.monotonic():
+                    return None
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] > time.monotonic():
+                    self.hits += 1
+                    return entry[0]
+                creating = self._creating.get(key)
+                if creating is None:
+                    self.misses += 1
+                    creating = self._creating[key] = threading.Event()
+                    break
+            creating.wait()  # Outra thread está criando o cache deste prefixo
+
+        try:
+            cached_content = self._create(model_name, prefix)
+        except Exception as e:
+            permanent = is_permanent_cache_error(e)
+            with self._lock:
+                if permanent:
+                    self._rejected.add(key)
+                else:
+                    self._retry_at[key] = time.monotonic() + max(TRANSIENT_RETRY_S, retry_after_seconds(e) or 0)
+                self._creating.pop(key).set()
+            kind = "recusado" if permanent else "indisponível no momento"
+            logging.warning(f"Cache de prompt {kind} para {model_name}; usando o prompt completo. Erro: {e}")
+            return None
+        with self._lock:
+            self._entries[key] = (cached_content, time.monotonic() + self.ttl_s - EXPIRY_MARGIN_S)
+            self._retry_at.pop(key, None)
+            self._creating.pop(key).set()
+        logging.info(f"Prefixo de prompt registrado em cache ({model_name}, ~{len(prefix) // CHARS_PER_TOKEN} tokens).")
+        return cached_content
+
+    def get_model(self, model, key_name: str, model_name: str, prefix: str):
+        from AI.api_load import default_client_key
+
+        if key_name != default_client_key() or len(prefix) // CHARS_PER_TOKEN < self.min_tokens:
+            return None
+        cached_content = self._cached_content(model_name, prefix)
+        if cached_content is None:
+            return None
+        cached_model = genai.GenerativeModel.from_cached_content(cached_content)
+        # Mesmo cliente (síncrono ou do event loop atual) do modelo base.
+        cached_model._client = getattr(model, '_client', None)
+        cached_model._async_client = getattr(model, '_async_client', None)
+        return cached_model
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._rejected.clear()
+            self._retry_at.clear()
+
+
+@st.cache_resource
+def get_prompt_cache():
+    """Cache de prefixos compartilhado pelo processo, ou None se desativado."""
+    backend, ttl_s, min_tokens = get_prompt_cache_settings()
+    if backend == BACKEND_GEMINI:
+        return GeminiPromptCache(ttl_s, min_tokens)
+    if backend == BACKEND_LOCAL:
+        return LocalPromptCache()
+    return None
@@ -0,0 +1,219 @@
+"""
+Retentativas com backoff exponencial + jitter e circuit breaker por chave de API
+para as chamadas ao Gemini. Erros transitórios (429/5xx/timeouts) são repetidos;
+após falhas seguidas o circuito abre e as chamadas seguintes aguardam a
+reabertura em vez de insistir na API.
+"""
+import asyncio
+import logging
+import random
+import re
+import threading
+import time
+
+import streamlit as st
+from google.api_core import exceptions as api_exceptions
+
+DEFAULT_MAX_RETRIES = 4
+BASE_DELAY_S = 1.0
+MAX_DELAY_S = 30.0
+MAX_RETRY_AFTER_S = 90.0
+
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT_S = 60.0
+MAX_CIRCUIT_WAIT_S = 120.0
+
+RETRYABLE_EXCEPTIONS = (
+    api_exceptions.ResourceExhausted,
+    api_exceptions.TooManyRequests,
+    api_exceptions.ServiceUnavailable,
+    api_exceptions.InternalServerError,
+    api_exceptions.BadGateway,
+    api_exceptions.GatewayTimeout,
+    api_exceptions.DeadlineExceeded,
+    ConnectionError,
+    TimeoutError,
+)
+
+_RETRY_IN_RE = re.compile(r'retry in (\d+(?:\.\d+)?)\s*s', re.IGNORECASE)
+_RETRY_DELAY_RE = re.compile(r'retry_delay\s*\{\s*seconds:\s*(\d+)', re.IGNORECASE)
+
+
+class CircuitOpenError(Exception):
+    """O circuito da chave continua aberto após o tempo máximo de espera."""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker simples e thread-safe. Fechado: chamadas passam. Aberto: chamadas
+    aguardam até 'reset_timeout'. Meio-aberto: uma única chamada de teste passa; se
+    falhar o circuito reabre, se tiver sucesso ele fecha.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT_S):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return 'fechado'
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return 'aberto'
+            return 'meio-aberto'
+
+    def wait_time(self) -> float:
+        """Segundos que a chamada deve aguardar antes de seguir (0 = pode seguir agora)."""
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                return remaining
+            if self._probe_in_flight:
+                return 1.0
+            self._probe_in_flight = True
+            return 0.0
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logging.info(f"Circuito da chave '{self.name}' fechado novamente.")
+            self._failures = 0
+            self._opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            probe_failed = self._probe_in_flight
+            self._probe_in_flight = False
+            if probe_failed or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                logging.warning(
+                    f"Circuito da chave '{self.name}' aberto após {self._failures} falha(s); "
+                    f"novas chamadas aguardam {self.reset_timeout:.0f}s."
+                )
+
+
+_breakers_lock = threading.Lock()
+_breakers = {}
+
+
+def get_circuit_breaker(key_name: str) -> CircuitBreaker:
+    """Circuit breaker compartilhado pelo processo para a chave de API."""
+    with _breakers_lock:
+        if key_name not in _breakers:
+            _breakers[key_name] = CircuitBreaker(key_name)
+        return _breakers[key_name]
+
+
+def get_max_retries() -> int:
+    """Número de retentativas, configurável em [app_settings] 'gemini_max_retries'."""
+    try:
+        return max(0, int(st.secrets.app_settings.get("gemini_max_retries", DEFAULT_MAX_RETRIES)))
+    except Exception:
+        return DEFAULT_MAX_RETRIES
+
+
+def is_retryable(error: Exception) -> bool:
+    return isinstance(error, RETRYABLE_EXCEPTIONS)
+
+
+def retry_after_seconds(error: Exception) -> float | None:
+    """Extrai a dica de espera do erro (header Retry-After, RetryInfo ou mensagem da API)."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    if headers.get('Retry-After'):
+        try:
+            return float(headers['Retry-After'])
+        except ValueError:
+            pass
+
+    for detail in getattr(error, 'details', None) or []:
+        retry_delay = getattr(detail, 'retry_delay', None)
+        if retry_delay is not None:
+            return retry_delay.seconds + retry_delay.nanos / 1e9
+
+    message = str(error)
+    match = _RETRY_IN_RE.search(message) or _RETRY_DELAY_RE.search(message)
+    return float(match.group(1)) if match else None
+
+
+def backoff_delay(attempt: int, error: Exception | None = None) -> float:
+    """Backoff exponencial com 'full jitter', respeitando a dica de espera da API quando houver."""
+    delay = random.uniform(0, min(MAX_DELAY_S, BASE_DELAY_S * 2 ** attempt))
+    hint = retry_after_seconds(error) if error is not None else None
+    if hint:
+        delay = max(delay, min(hint, MAX_RETRY_AFTER_S))
+    return delay
+
+
+def _circuit_wait_or_raise(breaker: CircuitBreaker, waited: float) -> float:
+    wait = breaker.wait_time()
+    if wait and waited + wait > MAX_CIRCUIT_WAIT_S:
+        raise CircuitOpenError(f"API Gemini indisponível (circuito '{breaker.name}' aberto).")
+    return min(wait, 5.0)
+
+
+def _handle_error(breaker: CircuitBreaker, error: Exception, attempt: int, max_retries: int, on_retry) -> float:
+    """Registra a falha e retorna a espera até a próxima tentativa; relança se não houver nova tentativa."""
+    if not is_retryable(error):
+        breaker.record_success()  # A API respondeu: o erro é da requisição, não do serviço
+        raise error
+    breaker.record_failure()
+    if attempt >= max_retries:
+        raise error
+    delay = backoff_delay(attempt, error)
+    logging.warning(f"Erro transitório na API Gemini ({type(error).__name__}); nova tentativa {attempt + 1}/{max_retries} em {delay:.1f}s.")
+    if on_retry:
+        on_retry(attempt + 1, delay, error)
+    return delay
+
+
+def call_with_retry(fn, key_name: str, on_retry=None):
+    """Executa 'fn()' com retentativas e circuit breaker da chave 'key_name'."""
+    breaker = get_circuit_breaker(key_name)
+    max_retries = get_max_retries()
+    attempt, waited = 0, 0.0
+    while True:
+        wait = _circuit_wait_or_raise(breaker, waited)
+        if wait:
+            time.sleep(wait)
+            waited += wait
+            continue
+        try:
+            result = fn()
+        except Exception as e:
+            time.sleep(_handle_error(breaker, e, attempt, max_retries, on_retry))
+            attempt += 1
+            continue
+        breaker.record_success()
+        return result
+
+
+async def call_with_retry_async(fn, key_name: str, on_retry=None):
+    """Equivalente assíncrono de call_with_retry; 'fn()' deve retornar um awaitable."""
+    breaker = get_circuit_breaker(key_name)
+    max_retries = get_max_retries()
+    attempt, waited = 0, 0.0
+    while True:
+        wait = _circuit_wait_or_raise(breaker, waited)
+        if wait:
+            await asyncio.sleep(wait)
+            waited += wait
+            continue
+        try:
+            result = await fn()
+        except Exception as e:
+            await asyncio.sleep(_handle_error(breaker, e, attempt, max_retries, on_retry))
+            attempt += 1
+            continue
+        breaker.record_success()
+        return result
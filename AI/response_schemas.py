@@ -0,0 +1,144 @@
+"""
+Schemas de resposta (subconjunto OpenAPI aceito pelo Gemini) de cada tarefa.
+Passados ao PDFQA como 'response_schema', fazem o modelo devolver JSON já no
+formato esperado pelos parsers.
+"""
+
+_NULLABLE_STRING = {"type": "string", "nullable": True}
+
+TRAINING_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "norma": _NULLABLE_STRING,
+        "modulo": _NULLABLE_STRING,
+        "data_realizacao": _NULLABLE_STRING,
+        "tipo_treinamento": {"type": "string", "enum": ["formação", "reciclagem"]},
+        "carga_horaria": {"type": "integer", "nullable": True}
+    },
+    "required": ["norma", "modulo", "data_realizacao", "tipo_treinamento", "carga_horaria"]
+}
+
+ASO_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "data_aso": _NULLABLE_STRING,
+        "vencimento_aso": _NULLABLE_STRING,
+        "riscos": _NULLABLE_STRING,
+        "cargo": _NULLABLE_STRING,
+        "tipo_aso": {
+            "type": "string",
+            "nullable": True,
+            "enum": ["Admissional", "Periódico", "Demissional", "Mudança de Risco", "Retorno ao Trabalho", "Monitoramento Pontual"]
+        }
+    },
+    "required": ["data_aso", "vencimento_aso", "riscos", "cargo", "tipo_aso"]
+}
+
+EPI_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "nome_funcionario": _NULLABLE_STRING,
+        "itens_epi": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "item_numero": _NULLABLE_STRING,
+                    "descricao": {"type": "string"},
+                    "data_entrega": _NULLABLE_STRING,
+                    "ca": _NULLABLE_STRING
+                },
+                "required": ["descricao", "data_entrega", "ca"]
+            }
+        }
+    },
+    "required": ["nome_funcionario", "itens_epi"]
+}
+
+COMPANY_DOC_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "tipo_documento": {"type": "string", "enum": ["PGR", "PCMSO", "PPR", "PCA", "Outro"]},
+        "data_emissao": _NULLABLE_STRING
+    },
+    "required": ["tipo_documento", "data_emissao"]
+}
+
+_AUDIT_ITEM = {
+    "type": "object",
+    "properties": {
+        "item": {"type": "string"},
+        "referencia_normativa": {"type": "string"},
+        "observacao": {"type": "string"}
+    },
+    "required": ["item", "referencia_normativa", "observacao"]
+}
+
+AUDIT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "parecer_final": {"type": "string", "enum": ["Conforme", "Não Conforme", "Conforme com Ressalvas"]},
+        "resumo_executivo": {"type": "string"},
+        "pontos_de_nao_conformidade": {"type": "array", "items": _AUDIT_ITEM},
+        "pontos_de_ressalva": {"type": "array", "items": _AUDIT_ITEM}
+    },
+    "required": ["parecer_final", "resumo_executivo", "pontos_de_nao_conformidade"]
+}
+
+TRAINING_MATRIX_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "funcao": {"type": "string"},
+            "normas_obrigatorias": {"type": "array", "items": {"type": "string"}}
+        },
+        "required": ["funcao", "normas_obrigatorias"]
+    }
+}
+
+TRAINING_RECOMMENDATIONS_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "treinamento_recomendado": {"type": "string"},
+            "justificativa_normativa": {"type": "string"}
+        },
+        "required": ["treinamento_recomendado", "justificativa_normativa"]
+    }
+}
+
+
+def _matches_schema(value, schema: dict) -> bool:
+    if value is None:
+        return bool(schema.get("nullable"))
+    schema_type = schema.get("type")
+    if schema_type == "object":
+        if not isinstance(value, dict):
+            return False
+        properties = schema.get("properties", {})
+        if any(key not in value for key in schema.get("required", [])):
+            return False
+        return all(_matches_schema(value[key], sub) for key, sub in properties.items() if key in value)
+    if schema_type == "array":
+        return isinstance(value, list) and all(_matches_schema(item, schema.get("items", {})) for item in value)
+    if schema_type == "string":
+        return isinstance(value, str) and ("enum" not in schema or value in schema["enum"])
+    if schema_type == "integer":
+        return isinstance(value, int) and not isinstance(value, bool)
+    if schema_type == "number":
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    if schema_type == "boolean":
+        return isinstance(value, bool)
+    return True
+
+
+def validate_response(data, schema: dict) -> bool:
+    """Verifica se o JSON decodificado segue o schema (tipos, chaves obrigatórias e enums)."""
+    return _matches_schema(data, schema)
+
+
+def expected_json_type(schema: dict) -> type:
+    """Tipo Python da raiz do schema, usado por parse_json_response."""
+    return list if schema.get("type") == "array" else dict
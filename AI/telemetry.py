@@ -0,0 +1,98 @@
+import logging
+from datetime import datetime
+
+import pandas as pd
+
+from AI.local_store import get_local_path, append_jsonl, read_jsonl
+
+TELEMETRY_FILE = "ai_calls.jsonl"
+
+TELEMETRY_COLUMNS = [
+    'timestamp', 'task_type', 'doc_type', 'model', 'tier', 'input_bytes', 'pages',
+    'prompt_tokens', 'output_tokens', 'total_tokens', 'cached_tokens',
+    'latency_s', 'retries', 'outcome', 'cache_hit', 'error'
+]
+
+
+def get_telemetry_path() -> str:
+    return get_local_path("telemetry", TELEMETRY_FILE)
+
+
+def new_call_record(task_type: str, doc_type: str | None, model_name: str | None) -> dict:
+    """Cria o registro de uma chamada; os demais campos são preenchidos ao longo da chamada."""
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'task_type': task_type,
+        'doc_type': doc_type or 'N/A',
+        'model': model_name,
+        'tier': None,
+        'input_bytes': 0,
+        'pages': 0,
+        'prompt_tokens': 0,
+        'output_tokens': 0,
+        'total_tokens': 0,
+        'cached_tokens': 0,
+        'latency_s': 0.0,
+        'retries': 0,
+        'outcome': 'error',
+        'cache_hit': False,
+        'error': None
+    }
+
+
+def fill_usage(record: dict, response):
+    """Copia o consumo de tokens informado pela API (usage_metadata) para o registro."""
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is None:
+        return
+    record['prompt_tokens'] = getattr(usage, 'prompt_token_count', 0) or 0
+    record['output_tokens'] = getattr(usage, 'candidates_token_count', 0) or 0
+    record['total_tokens'] = getattr(usage, 'total_token_count', 0) or 0
+    record['cached_tokens'] = getattr(usage, 'cached_content_token_count', 0) or 0
+    if record['cached_tokens']:
+        record['cache_hit'] = True
+
+
+def record_call(record: dict):
+    """Grava o registro no arquivo local de telemetria (somente acréscimo)."""
+    try:
+        append_jsonl(get_telemetry_path(), record)
+    except Exception as e:
+        logging.warning(f"Falha ao registrar telemetria da chamada de IA: {e}")
+
+
+def load_telemetry(days: int | None = None) -> pd.DataFrame:
+    """Carrega os registros de telemetria, opcionalmente apenas dos últimos 'days' dias."""
+    df = pd.DataFrame(read_jsonl(get_telemetry_path()))
+    if df.empty:
+        return pd.DataFrame(columns=TELEMETRY_COLUMNS + ['date'])
+    df = df.reindex(columns=TELEMETRY_COLUMNS)
+    df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
+    df = df.dropna(subset=['timestamp'])
+    if days:
+        df = df[df['timestamp'] >= pd.Timestamp.now().normalize() - pd.Timedelta(days=days - 1)]
+    df['date'] = df['timestamp'].dt.date
+    return df
+
+
+def summarize_latency(df: pd.DataFrame, by: str = 'task_type') -> pd.DataFrame:
+    """Chamadas, p50/p95 de latência, tokens e taxas de erro/cache agrupados por 'by'."""
+    if df.empty:
+        return pd.DataFrame()
+    grouped = df.groupby(by)
+    summary = pd.DataFrame({
+        'chamadas': grouped.size(),
+        'p50_s': grouped['latency_s'].quantile(0.5),
+        'p95_s': grouped['latency_s'].quantile(0.95),
+        'tokens_total': grouped['total_tokens'].sum(),
+        'taxa_erro_%': grouped['outcome'].apply(lambda s: (s != 'ok').mean() * 100),
+        'taxa_cache_%': grouped['cache_hit'].apply(lambda s: s.fillna(False).astype(bool).mean() * 100)
+    })
+    return summary.round(2).sort_values('chamadas', ascending=False)
+
+
+def daily_tokens_by_doc_type(df: pd.DataFrame) -> pd.DataFrame:
+    """Tabela dia x tipo de documento com o total de tokens consumidos."""
+    if df.empty:
+        return pd.DataFrame()
+    return df.pivot_table(index='date', columns='doc_type', values='total_tokens', aggfunc='sum', fill_value=0)
@@ -0,0 +1,157 @@
+"""
+Arquivo local do texto extraído dos PDFs.
+
+Cada documento salvo tem o texto de cada página (e, quando o pypdf consegue, a versão
+com layout preservado, que mantém colunas e tabelas alinhadas) gravado uma única vez,
+identificado pelo hash do conteúdo do PDF. Um registro de vínculos liga o 'arquivo_id'
+das planilhas ao hash, para que reauditorias, recomendações e conferências usem
+prompts só de texto, sem reenviar nem baixar o PDF.
+
+PDFs escaneados (sem camada de texto) também são registrados, com has_text_layer
+False, para que quem consulta saiba que precisa do PDF original.
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import streamlit as st
+
+from AI.local_store import get_local_path, append_jsonl, read_jsonl
+from AI.pdf_preprocessor import PdfReader, _has_text_layer
+
+LINKS_FILE = "links.jsonl"
+
+
+def pdf_content_hash(pdf_bytes: bytes) -> str:
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+def extract_pages(pdf_bytes: bytes) -> list[dict] | None:
+    """[{'page', 'text', 'layout'}] de cada página, ou None se o PDF não puder ser lido."""
+    if PdfReader is None or not pdf_bytes:
+        return None
+    try:
+        reader = PdfReader(io.BytesIO(pdf_bytes))
+    except Exception as e:
+        logging.warning(f"Não foi possível ler o PDF para o arquivo de texto: {e}")
+        return None
+    pages = []
+    for number, page in enumerate(reader.pages, start=1):
+        try:
+            text = page.extract_text() or ''
+        except Exception:
+            text = ''
+        try:
+            layout = page.extract_text(extraction_mode="layout") or None
+        except Exception:  # Modo layout indisponível ou falhou nesta página
+            layout = None
+        pages.append({'page': number, 'text': text, 'layout': layout})
+    return pages
+
+
+@dataclass
+class ArchivedDocument:
+    content_hash: str
+    pages: list[dict] = field(default_factory=list)
+    has_text_layer: bool = False
+    created_at: str | None = None
+
+    @property
+    def page_texts(self) -> list[str]:
+        return [page['text'] for page in self.pages]
+
+    def to_prompt_text(self, page_numbers: list[int] | None = None, use_layout: bool = True) -> str:
+        """Texto das páginas (todas, ou as informadas, base 1) com marcadores de página."""
+        selected = set(page_numbers) if page_numbers else None
+        parts = []
+        for page in self.pages:
+            if selected is not None and page['page'] not in selected:
+                continue
+            text = (page.get('layout') if use_layout else None) or page['text']
+            parts.append(f"--- Página {page['page']} ---\n{text.strip()}")
+        return "\n\n".join(parts)
+
+
+class TextArchive:
+    """Textos por hash de conteúdo e vínculos arquivo_id -> hash, em disco."""
+
+    def __init__(self, directory: str | None = None):
+        self.directory = directory or os.path.dirname(get_local_path("text_archive", LINKS_FILE))
+        os.makedirs(self.directory, exist_ok=True)
+        self.links_path = os.path.join(self.directory, LINKS_FILE)
+        self._lock = threading.Lock()
+        self._links = {record['arquivo_id']: record['hash'] for record in read_jsonl(self.links_path)
+                       if record.get('arquivo_id') and record.get('hash')}
+
+    def _document_path(self, content_hash: str) -> str:
+        return os.path.join(self.directory, "docs", content_hash[:2], f"{content_hash}.json")
+
+    def get(self, content_hash: str) -> ArchivedDocument | None:
+        path = self._document_path(content_hash)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.warning(f"Texto arquivado ilegível ({content_hash[:12]}): {e}")
+            return None
+        return ArchivedDocument(content_hash, data.get('pages', []), data.get('has_text_layer', False), data.get('created_at'))
+
+    def archive(self, pdf_bytes: bytes) -> ArchivedDocument | None:
+        """Extrai e grava o texto do PDF, se ainda não estiver arquivado. None se o PDF for ilegível."""
+        content_hash = pdf_content_hash(pdf_bytes)
+        existing = self.get(content_hash)
+        if existing is not None:
+            return existing
+        pages = extract_pages(pdf_bytes)
+        if pages is None:
+            return None
+        document = ArchivedDocument(
+            content_hash, pages, _has_text_layer([page['text'] for page in pages]),
+            datetime.now().isoformat(timespec='seconds')
+        )
+        path = self._document_path(content_hash)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({'pages': document.pages, 'has_text_layer': document.has_text_layer,
+                       'created_at': document.created_at}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return document
+
+    def link(self, arquivo_id: str, content_hash: str):
+        with self._lock:
+            if self._links.get(arquivo_id) == content_hash:
+                return
+            self._links[arquivo_id] = content_hash
+        append_jsonl(self.links_path, {'arquivo_id': arquivo_id, 'hash': content_hash,
+                                       'linked_at': datetime.now().isoformat(timespec='seconds')})
+
+    def archive_file(self, arquivo_id: str, pdf_bytes: bytes) -> ArchivedDocument | None:
+        """Arquiva o texto do PDF salvo e o vincula ao arquivo_id. Falhas só são registradas no log."""
+        try:
+            document = self.archive(pdf_bytes)
+            if document is not None and arquivo_id:
+                self.link(str(arquivo_id), document.content_hash)
+            return document
+        except Exception as e:
+            logging.warning(f"Falha ao arquivar o texto do PDF '{arquivo_id}': {e}")
+            return None
+
+    def hash_for_file(self, arquivo_id: str) -> str | None:
+        return self._links.get(str(arquivo_id))
+
+    def get_for_file(self, arquivo_id: str) -> ArchivedDocument | None:
+        content_hash = self.hash_for_file(arquivo_id)
+        return self.get(content_hash) if content_hash else None
+
+
+@st.cache_resource
+def get_text_archive() -> TextArchive:
+    return TextArchive()
@@ -0,0 +1,163 @@
+"""
+Índice aproximado (IVF) para bases de conhecimento grandes.
+
+Os vetores são agrupados em 'n_lists' centróides (k-means esférico). Na busca,
+somente as listas dos 'n_probe' centróides mais próximos da consulta são
+pontuadas: mais sondas = mais recall e mais custo. Os centróides e a lista de
+cada chunk (por hash de conteúdo) ficam ao lado do armazenamento de embeddings,
+então uma nova versão da base só atribui os chunks novos; o treino é refeito
+apenas quando a base cresce muito desde o último treino.
+"""
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+from analysis.vector_index import VectorIndex, normalize_rows
+
+CENTROIDS_FILE = "ivf_centroids.npy"
+MANIFEST_FILE = "ivf_manifest.json"
+
+DEFAULT_N_PROBE = 8
+KMEANS_ITERATIONS = 10
+TRAIN_SAMPLE_PER_LIST = 32
+MAX_TRAIN_SAMPLE = 30_000
+ASSIGN_BLOCK = 8192
+
+# Retreina quando a base passa a ter o dobro de chunks do último treino.
+RETRAIN_GROWTH = 2.0
+
+
+def default_n_lists(size: int) -> int:
+    return max(1, int(4 * np.sqrt(size)))
+
+
+def assign_to_centroids(index: VectorIndex, positions: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Centróide mais próximo de cada linha, calculado em blocos para limitar a memória."""
+    assignments = np.empty(len(positions), dtype=np.int32)
+    for start in range(0, len(positions), ASSIGN_BLOCK):
+        block = positions[start:start + ASSIGN_BLOCK]
+        assignments[start:start + len(block)] = np.argmax(index.rows(block) @ centroids.T, axis=1)
+    return assignments
+
+
+def train_centroids(index: VectorIndex, n_lists: int, iterations: int = KMEANS_ITERATIONS, seed: int = 0) -> np.ndarray:
+    """K-means esférico sobre uma amostra das linhas do índice."""
+    rng = np.random.default_rng(seed)
+    n_lists = min(n_lists, len(index))
+    sample_size = min(len(index), max(n_lists * TRAIN_SAMPLE_PER_LIST, n_lists), MAX_TRAIN_SAMPLE)
+    sample = index.rows(np.sort(rng.choice(len(index), sample_size, replace=False)))
+    centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        labels = np.argmax(sample @ centroids.T, axis=1)
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=n_lists)
+        empty = counts == 0
+        sums = np.zeros_like(centroids)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        sums[~empty] = np.add.reduceat(sample[order], starts[~empty], axis=0)
+        sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+class IVFIndex:
+    """Listas invertidas de posições do VectorIndex, uma por centróide."""
+
+    def __init__(self, centroids: np.ndarray, lists: list[np.ndarray], n_probe: int = DEFAULT_N_PROBE):
+        self.centroids = centroids
+        self.lists = lists
+        self.n_probe = n_probe
+
+    @classmethod
+    def from_assignments(cls, centroids: np.ndarray, assignments: np.ndarray, n_probe: int = DEFAULT_N_PROBE) -> "IVFIndex":
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(len(centroids) + 1))
+        lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(centroids))]
+        return cls(centroids, lists, n_probe)
+
+    def candidates(self, query: np.ndarray, n_probe: int | None = None) -> np.ndarray:
+        n_probe = min(n_probe or self.n_probe, len(self.centroids))
+        centroid_scores = self.centroids @ normalize_rows(query.reshape(1, -1))[0]
+        probes = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]
+        # Posições ordenadas deixam o acesso ao arquivo mapeado sequencial.
+        return np.sort(np.concatenate([self.lists[p] for p in probes]))
+
+    def search(self, index: VectorIndex, query: np.ndarray, top_k: int = 5, n_probe: int | None = None,
+               allowed: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k aproximado, opcionalmente restrito às posições 'allowed' (pré-filtro). Se as
+        listas sondadas tiverem menos de top_k chunks, a busca é exata.
+        """
+        candidates = self.candidates(query, n_probe)
+        if allowed is not None:
+            candidates = np.intersect1d(candidates, allowed, assume_unique=True)
+        if len(candidates) < top_k:
+            return index.search(query, top_k, candidates=allowed)
+        return index.search(query, top_k, candidates=candidates)
+
+
+class IVFStore:
+    """Centróides e atribuições (hash do chunk -> lista) persistidos ao lado dos embeddings."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.centroids_path = os.path.join(directory, CENTROIDS_FILE)
+        self.manifest_path = os.path.join(directory, MANIFEST_FILE)
+        self._lock = threading.Lock()
+
+    def _load(self, dim: int):
+        if not (os.path.exists(self.manifest_path) and os.path.exists(self.centroids_path)):
+            return None, {}, 0, None
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            centroids = np.load(self.centroids_path)
+        except (OSError, ValueError, json.JSONDecodeError) as e:
+            logging.warning(f"Índice IVF ilegível, será recriado: {e}")
+            return None, {}, 0, None
+        if centroids.ndim != 2 or centroids.shape[1] != dim:
+            return None, {}, 0, None
+        return centroids, manifest.get("assignments", {}), manifest.get("trained_size", 0), manifest.get("n_lists")
+
+    def _save(self, centroids: np.ndarray, assignments: dict, trained_size: int, n_lists: int):
+        np.save(self.centroids_path + ".tmp.npy", centroids)
+        os.replace(self.centroids_path + ".tmp.npy", self.centroids_path)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"n_lists": n_lists, "trained_size": trained_size, "assignments": assignments}, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def sync(self, hashes: list[str], index: VectorIndex, n_lists: int | None = None, n_probe: int = DEFAULT_N_PROBE) -> IVFIndex:
+        """
+        Retorna o IVF da base atual ('hashes' na ordem das linhas do índice). Só os chunks
+        ainda sem lista são atribuídos; o k-means roda no primeiro uso, quando 'n_lists'
+        muda ou quando a base cresceu RETRAIN_GROWTH vezes desde o último treino. Sem
+        'n_lists', usa o valor do último treino (ou ~4*sqrt(chunks) ao treinar).
+        """
+        with self._lock:
+            centroids, stored, trained_size, stored_n_lists = self._load(index.dim)
+            if (centroids is None or (n_lists and n_lists != stored_n_lists)
+                    or len(hashes) > trained_size * RETRAIN_GROWTH):
+                n_lists = n_lists or default_n_lists(len(hashes))
+                logging.info(f"Treinando índice IVF com {n_lists} listas para {len(hashes)} chunks.")
+                centroids = train_centroids(index, n_lists)
+                stored, trained_size = {}, len(hashes)
+            else:
+                n_lists = stored_n_lists
+
+            pending = np.array([i for i, h in enumerate(hashes) if h not in stored], dtype=np.int64)
+            if len(pending):
+                for position, list_id in zip(pending, assign_to_centroids(index, pending, centroids)):
+                    stored[hashes[position]] = int(list_id)
+            live = set(hashes)
+            changed = len(pending) > 0 or len(stored) != len(live)
+            stored = {h: list_id for h, list_id in stored.items() if h in live}
+            if changed:
+                self._save(centroids, stored, trained_size, n_lists)
+
+            assignments = np.fromiter((stored[h] for h in hashes), dtype=np.int32, count=len(hashes))
+            return IVFIndex.from_assignments(centroids, assignments, n_probe)
@@ -0,0 +1,84 @@
+"""
+Compara a busca do VectorIndex com o caminho anterior (cosine_similarity do
+scikit-learn + argsort completo) usando vetores sintéticos.
+
+Com --ivf-probe, inclui também o índice aproximado IVF (analysis.ann_index).
+
+Uso: python -m analysis.benchmark_vector_index [--chunks 5000] [--dim 3072] [--queries 50] [--top-k 7] [--ivf-probe 8]
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+from analysis.vector_index import VectorIndex
+from analysis.ann_index import IVFStore
+
+
+def legacy_search(embeddings: np.ndarray, query: np.ndarray, top_k: int) -> np.ndarray:
+    similarities = cosine_similarity(query.reshape(1, -1), embeddings)[0]
+    return similarities.argsort()[-top_k:][::-1]
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def recall(reference: np.ndarray, found: np.ndarray) -> float:
+    return np.mean([len(set(r) & set(f)) / len(r) for r, f in zip(reference, found)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=7)
+    parser.add_argument("--ivf-probe", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    # Vetores agrupados em tópicos, como os chunks de uma mesma NR. O caminho anterior
+    # recebia os embeddings como float64, sem normalização.
+    topics = rng.standard_normal((max(1, args.chunks // 100), args.dim))
+    embeddings = topics[rng.integers(0, len(topics), args.chunks)] + 0.6 * rng.standard_normal((args.chunks, args.dim))
+    queries = (embeddings[rng.integers(0, args.chunks, args.queries)] + 0.3 * rng.standard_normal((args.queries, args.dim))).astype(np.float32)
+
+    index = VectorIndex.build(embeddings)
+    index_int8 = VectorIndex.build(embeddings, quantize=True)
+    reference = np.array([legacy_search(embeddings, q, args.top_k) for q in queries])
+
+    results = {
+        "sklearn + argsort (float64)": timed(lambda: [legacy_search(embeddings, q, args.top_k) for q in queries], 1),
+        "VectorIndex float32": timed(lambda: [index.search(q, args.top_k) for q in queries], 1),
+        "VectorIndex int8": timed(lambda: [index_int8.search(q, args.top_k) for q in queries], 1),
+        "VectorIndex float32 (lote)": timed(lambda: index.search_batch(queries, args.top_k), 1),
+    }
+    found = {
+        "VectorIndex float32": index.search_batch(queries, args.top_k)[0],
+        "VectorIndex int8": index_int8.search_batch(queries, args.top_k)[0],
+    }
+
+    if args.ivf_probe:
+        with tempfile.TemporaryDirectory() as directory:
+            ivf = IVFStore(directory).sync([str(i) for i in range(args.chunks)], index, n_probe=args.ivf_probe)
+        name = f"IVF float32 (probe {args.ivf_probe})"
+        results[name] = timed(lambda: [ivf.search(index, q, args.top_k) for q in queries], 1)
+        found[name] = np.array([ivf.search(index, q, args.top_k)[0] for q in queries])
+
+    print(f"{args.chunks} chunks x {args.dim} dimensões, {args.queries} consultas, top-{args.top_k}")
+    print(f"Memória: float64 {embeddings.nbytes / 2**20:.1f} MiB | float32 {index.vectors.nbytes / 2**20:.1f} MiB | int8 {index_int8.vectors.nbytes / 2**20:.1f} MiB")
+    for name, total_ms in results.items():
+        line = f"{name:<30} {total_ms / args.queries:8.3f} ms/consulta"
+        if name in found:
+            line += f"  recall@{args.top_k} {recall(reference, found[name]):.3f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
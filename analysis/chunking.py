@@ -0,0 +1,101 @@
+"""
+Divisão de textos normativos (NR, NBR, ITs, procedimentos) em chunks para a base RAG.
+
+O texto é primeiro separado nas seções da própria norma (itens numerados como
+"33.3.2", anexos, capítulos). Seções curtas e consecutivas são agrupadas até o
+tamanho máximo; seções longas são divididas em janelas com sobreposição, para
+que um requisito cortado na borda continue legível no chunk seguinte.
+"""
+import re
+
+DEFAULT_MAX_CHARS = 1500
+DEFAULT_OVERLAP_CHARS = 200
+
+SECTION_RE = re.compile(
+    r'^[ \t]*((?:NR|NBR)[ \t]*-?[ \t]*\d+|\d+(?:\.\d+)+|ANEXO[ \t]+[IVXLC\d]+|CAP[IÍ]TULO[ \t]+[IVXLC\d]+)\b',
+    re.IGNORECASE | re.MULTILINE
+)
+_SENTENCE_END_RE = re.compile(r'(?<=[.;:])\s+')
+
+
+def clean_text(text: str) -> str:
+    """Remove hifenização de quebra de linha, espaços repetidos e linhas vazias em excesso."""
+    text = re.sub(r'-\n(?=[a-zà-ú])', '', text)
+    text = re.sub(r'[ \t]+', ' ', text)
+    return re.sub(r'\n{3,}', '\n\n', text).strip()
+
+
+def split_sections(text: str) -> list[tuple[str, str]]:
+    """Lista de (rótulo da seção, texto). O trecho antes da primeira seção tem rótulo vazio."""
+    matches = list(SECTION_RE.finditer(text))
+    if not matches:
+        return [("", text)] if text.strip() else []
+    sections = []
+    if text[:matches[0].start()].strip():
+        sections.append(("", text[:matches[0].start()].strip()))
+    for match, following in zip(matches, matches[1:] + [None]):
+        body = text[match.start():following.start() if following else len(text)].strip()
+        if body:
+            sections.append((re.sub(r'\s+', ' ', match.group(1)).upper(), body))
+    return sections
+
+
+def _overlap_tail(text: str, overlap: int) -> str:
+    """Últimos 'overlap' caracteres, começando em uma fronteira de palavra."""
+    if overlap <= 0 or len(text) <= overlap:
+        return text if overlap > 0 else ""
+    tail = text[-overlap:]
+    space = tail.find(' ')
+    return tail[space + 1:] if space != -1 else tail
+
+
+def split_long_section(text: str, max_chars: int, overlap: int) -> list[str]:
+    """Janelas de até max_chars quebradas em fim de frase, cada uma repetindo o final da anterior."""
+    pieces = [p for p in _SENTENCE_END_RE.split(text) if p]
+    windows, current = [], ""
+    for piece in pieces:
+        while len(piece) > max_chars:  # Frase maior que a janela: corte em espaço
+            room = max(max_chars - len(current) - 1, max_chars // 2)
+            cut = piece.rfind(' ', 0, room)
+            if cut <= 0:
+                cut = room
+            head, piece = piece[:cut], piece[cut:].lstrip()
+            windows.append(f"{current} {head}".strip())
+            current = _overlap_tail(windows[-1], overlap)
+        candidate = f"{current} {piece}".strip() if current else piece
+        if len(candidate) > max_chars and current:
+            windows.append(current)
+            current = f"{_overlap_tail(current, overlap)} {piece}".strip()
+        else:
+            current = candidate
+    if current and (not windows or current != _overlap_tail(windows[-1], overlap)):
+        windows.append(current)
+    return windows
+
+
+def chunk_text(text: str, max_chars: int = DEFAULT_MAX_CHARS, overlap: int = DEFAULT_OVERLAP_CHARS) -> list[dict]:
+    """
+    Chunks do texto como dicionários {'text', 'section'}, onde 'section' é o rótulo da
+    primeira seção contida no chunk (ex.: '33.3.2').
+    """
+    chunks, buffer, buffer_section = [], "", None
+
+    def flush():
+        nonlocal buffer, buffer_section
+        if buffer.strip():
+            chunks.append({"text": buffer.strip(), "section": buffer_section or ""})
+        buffer, buffer_section = "", None
+
+    for label, body in split_sections(clean_text(text)):
+        if len(body) > max_chars:
+            flush()
+            for window in split_long_section(body, max_chars, overlap):
+                chunks.append({"text": window, "section": label})
+            continue
+        if buffer and len(buffer) + len(body) + 2 > max_chars:
+            flush()
+        buffer = f"{buffer}\n\n{body}" if buffer else body
+        if buffer_section is None:
+            buffer_section = label
+    flush()
+    return chunks
@@ -0,0 +1,104 @@
+"""
+Montagem do contexto RAG enviado nos prompts.
+
+Em vez de sempre injetar os top_k chunks, mantém só os que estão próximos do
+melhor resultado (top-k adaptativo), descarta quase duplicatas e para ao
+atingir o orçamento de tokens. O tamanho antes e depois é registrado no log.
+"""
+import logging
+
+import numpy as np
+import streamlit as st
+
+from analysis.lexical_index import tokenize
+
+CHUNK_SEPARATOR = "\n\n---\n\n"
+
+# Similaridade mínima absoluta e distância máxima para o melhor chunk.
+DEFAULT_MIN_SIMILARITY = 0.5
+DEFAULT_SIMILARITY_MARGIN = 0.15
+# Acima desta similaridade entre dois chunks, o segundo é considerado duplicata.
+DEFAULT_DEDUP_THRESHOLD = 0.95
+DEFAULT_TOKEN_BUDGET = 3000
+MIN_CHUNKS = 2
+
+# Estimativa de tokens sem chamar a API: ~4 caracteres por token em português.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def get_context_settings() -> dict:
+    """
+    Parâmetros da montagem, configuráveis em [app_settings]: 'rag_min_similarity',
+    'rag_similarity_margin', 'rag_dedup_threshold' e 'rag_context_token_budget'.
+    """
+    settings = {
+        "min_similarity": DEFAULT_MIN_SIMILARITY,
+        "similarity_margin": DEFAULT_SIMILARITY_MARGIN,
+        "dedup_threshold": DEFAULT_DEDUP_THRESHOLD,
+        "token_budget": DEFAULT_TOKEN_BUDGET,
+    }
+    try:
+        app_settings = st.secrets.app_settings
+        settings["min_similarity"] = float(app_settings.get("rag_min_similarity", DEFAULT_MIN_SIMILARITY))
+        settings["similarity_margin"] = float(app_settings.get("rag_similarity_margin", DEFAULT_SIMILARITY_MARGIN))
+        settings["dedup_threshold"] = float(app_settings.get("rag_dedup_threshold", DEFAULT_DEDUP_THRESHOLD))
+        settings["token_budget"] = int(app_settings.get("rag_context_token_budget", DEFAULT_TOKEN_BUDGET))
+    except Exception:
+        pass
+    return settings
+
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def select_chunks(chunks: list[str], similarities: np.ndarray | None = None, vectors: np.ndarray | None = None,
+                  min_similarity: float = DEFAULT_MIN_SIMILARITY, similarity_margin: float = DEFAULT_SIMILARITY_MARGIN,
+                  dedup_threshold: float = DEFAULT_DEDUP_THRESHOLD, token_budget: int = DEFAULT_TOKEN_BUDGET) -> list[int]:
+    """
+    Posições (em 'chunks', já ordenados por relevância) que entram no contexto. Os
+    MIN_CHUNKS primeiros são mantidos; os demais precisam de similaridade acima do mínimo
+    e próxima da melhor. Sem 'similarities' (busca só lexical), esse corte não se aplica;
+    sem 'vectors', as duplicatas são detectadas pela sobreposição de termos.
+    """
+    if not chunks:
+        return []
+    cutoff = None
+    if similarities is not None and len(similarities):
+        cutoff = max(min_similarity, float(np.max(similarities)) - similarity_margin)
+
+    selected, used_tokens, term_sets = [], 0, []
+    for position, chunk in enumerate(chunks):
+        if cutoff is not None and len(selected) >= MIN_CHUNKS and similarities[position] < cutoff:
+            continue
+        if vectors is not None:
+            if selected and float(np.max(vectors[selected] @ vectors[position])) >= dedup_threshold:
+                continue
+        else:
+            terms = set(tokenize(chunk))
+            if any(_jaccard(terms, other) >= dedup_threshold for other in term_sets):
+                continue
+            term_sets.append(terms)
+        tokens = estimate_tokens(chunk)
+        if selected and used_tokens + tokens > token_budget:
+            break
+        selected.append(position)
+        used_tokens += tokens
+    return selected
+
+
+def assemble_context(chunks: list[str], similarities: np.ndarray | None = None, vectors: np.ndarray | None = None,
+                     label: str = "", **settings) -> str:
+    """Junta os chunks selecionados por select_chunks e registra o tamanho antes/depois."""
+    selected = select_chunks(chunks, similarities, vectors, **settings)
+    context = CHUNK_SEPARATOR.join(chunks[i] for i in selected)
+    before = estimate_tokens(CHUNK_SEPARATOR.join(chunks))
+    logging.info(
+        f"Contexto RAG{f' ({label})' if label else ''}: {len(chunks)} chunks/~{before} tokens -> "
+        f"{len(selected)} chunks/~{estimate_tokens(context)} tokens."
+    )
+    return context
@@ -0,0 +1,149 @@
+"""
+Pipeline local de ingestão do corpus normativo (NR, NBR, ITs, procedimentos).
+
+Lê PDFs e textos de uma pasta, divide em chunks por seção (analysis.chunking),
+gera embeddings apenas dos chunks novos ou alterados (EmbeddingStore) e publica
+uma versão da base em disco. Com [app_settings] rag_source = "local", o
+NRAnalyzer carrega a versão publicada diretamente, sem ler a planilha RAG.
+
+Uso: python -m analysis.corpus_ingest <pasta> [--max-chars 1500] [--overlap 200] [--no-embed]
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import re
+import sys
+from datetime import datetime
+
+import pandas as pd
+
+from AI.local_store import get_local_path
+from AI.pdf_preprocessor import extract_page_texts
+from analysis.chunking import chunk_text, DEFAULT_MAX_CHARS, DEFAULT_OVERLAP_CHARS
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.txt', '.md')
+CURRENT_FILE = "current.json"
+
+# Versões publicadas mantidas em disco (a atual e as anteriores, para rollback).
+KEEP_VERSIONS = 3
+
+_NORMA_RE = re.compile(r'\b(NR|NBR|IT)[\s_-]*0*(\d+)\b', re.IGNORECASE)
+
+
+def _corpus_path(*parts: str) -> str:
+    return get_local_path("rag", "corpus", *parts)
+
+
+def read_document(path: str) -> str | None:
+    """Texto do arquivo (camada de texto do PDF ou arquivo de texto UTF-8)."""
+    if path.lower().endswith('.pdf'):
+        with open(path, "rb") as f:
+            pages = extract_page_texts(f.read())
+        return "\n\n".join(pages) if pages else None
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def detect_norma(filename: str, text: str) -> str:
+    """Norma do documento pelo nome do arquivo ou, se não houver, pelo início do texto."""
+    match = _NORMA_RE.search(os.path.basename(filename)) or _NORMA_RE.search(text[:2000])
+    return f"{match.group(1).upper()}-{int(match.group(2)):02d}" if match else ""
+
+
+def build_corpus(folder: str, max_chars: int = DEFAULT_MAX_CHARS, overlap: int = DEFAULT_OVERLAP_CHARS) -> pd.DataFrame:
+    """Chunks de todos os documentos da pasta (recursivo), com as colunas da planilha RAG."""
+    rows = []
+    paths = sorted(p for p in glob.glob(os.path.join(folder, "**", "*"), recursive=True)
+                   if p.lower().endswith(SUPPORTED_EXTENSIONS))
+    for path in paths:
+        text = read_document(path)
+        if not text or not text.strip():
+            logging.warning(f"Sem texto extraível (PDF digitalizado?): {path}")
+            continue
+        norma = detect_norma(path, text)
+        source = os.path.relpath(path, folder)
+        for chunk in chunk_text(text, max_chars, overlap):
+            body = chunk["text"]
+            # O prefixo com a norma ajuda a busca lexical e a vetorial em chunks sem o número da NR.
+            if norma and norma.replace("-", "").lower() not in re.sub(r'[\s-]', '', body[:200]).lower():
+                body = f"[{norma}] {body}"
+            rows.append({"Answer_Chunk": body, "Norma": norma, "Secao": chunk["section"], "Fonte": source})
+    return pd.DataFrame(rows, columns=["Answer_Chunk", "Norma", "Secao", "Fonte"])
+
+
+def load_published_corpus() -> pd.DataFrame:
+    """Chunks da versão publicada atual. Levanta FileNotFoundError se nada foi publicado."""
+    current_path = _corpus_path(CURRENT_FILE)
+    if not os.path.exists(current_path):
+        raise FileNotFoundError("Nenhuma base local publicada. Execute: python -m analysis.corpus_ingest <pasta>")
+    with open(current_path, encoding="utf-8") as f:
+        current = json.load(f)
+    df = pd.read_json(_corpus_path("versions", f"{current['version']}.jsonl"), lines=True, dtype=False)
+    if df.empty or "Answer_Chunk" not in df.columns:
+        raise ValueError(f"A versão publicada {current['version']} está vazia.")
+    return df.fillna("")
+
+
+def publish_corpus(df: pd.DataFrame, embed: bool = True, on_progress=None) -> str:
+    """
+    Gera os embeddings pendentes e o índice vetorial da nova versão e só então a marca
+    como atual, para que o aplicativo nunca carregue uma versão sem índice pronto.
+    """
+    from analysis.rag_index_builder import RagKnowledgeBase
+    from analysis.embedding_store import EmbeddingStore
+    from AI.embeddings import EMBEDDING_MODEL, embed_documents
+
+    knowledge_base = RagKnowledgeBase.lexical(df)
+    version = knowledge_base.version
+    if embed:
+        chunks = df["Answer_Chunk"].astype(str).tolist()
+        store = EmbeddingStore(EMBEDDING_MODEL)
+        embeddings = store.get_embeddings(chunks, lambda texts: embed_documents(texts, on_progress=on_progress))
+        knowledge_base.with_vectors(embeddings)
+
+    versions_dir = os.path.dirname(_corpus_path("versions", f"{version}.jsonl"))
+    df.to_json(os.path.join(versions_dir, f"{version}.jsonl"), orient="records", lines=True, force_ascii=False)
+
+    current_path = _corpus_path(CURRENT_FILE)
+    tmp_path = current_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "version": version,
+            "published_at": datetime.now().isoformat(timespec="seconds"),
+            "chunks": len(df),
+            "sources": sorted(df["Fonte"].unique().tolist()) if "Fonte" in df.columns else [],
+        }, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, current_path)
+
+    published = sorted(glob.glob(os.path.join(versions_dir, "*.jsonl")), key=os.path.getmtime, reverse=True)
+    for old_path in published[KEEP_VERSIONS:]:
+        os.remove(old_path)
+    return version
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingere NRs/NBRs de uma pasta local e publica a base RAG.")
+    parser.add_argument("folder", help="Pasta com os arquivos .pdf, .txt ou .md")
+    parser.add_argument("--max-chars", type=int, default=DEFAULT_MAX_CHARS, help="Tamanho máximo de cada chunk")
+    parser.add_argument("--overlap", type=int, default=DEFAULT_OVERLAP_CHARS, help="Sobreposição entre janelas de uma seção longa")
+    parser.add_argument("--no-embed", action="store_true", help="Publica sem gerar embeddings (o aplicativo os gera ao carregar a base)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    df = build_corpus(args.folder, args.max_chars, args.overlap)
+    if df.empty:
+        print(f"Nenhum texto encontrado em '{args.folder}'.")
+        sys.exit(1)
+    print(f"{len(df)} chunks de {df['Fonte'].nunique()} documento(s).")
+
+    def on_progress(done, total):
+        print(f"  embeddings: {done}/{total}", end="\r")
+
+    version = publish_corpus(df, embed=not args.no_embed, on_progress=on_progress)
+    print(f"\nBase publicada: versão {version}.")
+
+
+if __name__ == "__main__":
+    main()
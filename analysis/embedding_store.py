@@ -0,0 +1,138 @@
+"""
+Armazenamento local e incremental dos embeddings da base de conhecimento (RAG).
+
+Os vetores ficam em um arquivo float32 mapeável em memória (np.memmap) e cada
+linha é identificada pelo hash do conteúdo do chunk. Ao recarregar a base, só
+os chunks novos ou alterados são enviados para a API de embeddings.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+from AI.local_store import get_local_path
+
+VECTORS_FILE = "vectors.f32"
+MANIFEST_FILE = "manifest.json"
+
+# Compacta o arquivo quando mais da metade das linhas não pertence mais à base.
+COMPACT_RATIO = 0.5
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(str(text).strip().encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """Vetores por hash de conteúdo, persistidos em disco e acrescentados incrementalmente."""
+
+    def __init__(self, model: str, directory: str | None = None):
+        self.model = model
+        self.directory = directory or os.path.dirname(get_local_path("rag", "embeddings", MANIFEST_FILE))
+        os.makedirs(self.directory, exist_ok=True)
+        self.vectors_path = os.path.join(self.directory, VECTORS_FILE)
+        self.manifest_path = os.path.join(self.directory, MANIFEST_FILE)
+        self._lock = threading.Lock()
+        self._load_manifest()
+
+    def _load_manifest(self):
+        self.dim = None
+        self.hashes = []
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, encoding="utf-8") as f:
+                    manifest = json.load(f)
+                if manifest.get("model") == self.model:
+                    self.dim = manifest.get("dim")
+                    self.hashes = manifest.get("hashes", [])
+                else:
+                    logging.info("Modelo de embeddings alterado; o armazenamento local será recriado.")
+            except (OSError, json.JSONDecodeError) as e:
+                logging.warning(f"Manifesto de embeddings ilegível, recriando: {e}")
+        expected_size = len(self.hashes) * (self.dim or 0) * 4
+        if not self.hashes or not os.path.exists(self.vectors_path) or os.path.getsize(self.vectors_path) < expected_size:
+            self.dim, self.hashes = None, []
+            if os.path.exists(self.vectors_path):
+                os.remove(self.vectors_path)
+        elif os.path.getsize(self.vectors_path) > expected_size:
+            # Vetores gravados sem o manifesto correspondente (processo interrompido no meio de _append).
+            logging.warning("Linhas de embeddings sem registro no manifesto descartadas.")
+            os.truncate(self.vectors_path, expected_size)
+        self.positions = {h: i for i, h in enumerate(self.hashes)}
+
+    def _write_manifest(self):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"model": self.model, "dim": self.dim, "hashes": self.hashes}, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _open_vectors(self) -> np.ndarray:
+        if not self.hashes:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        return np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(len(self.hashes), self.dim))
+
+    def _append(self, hashes: list[str], vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        # Grava na posição da próxima linha do manifesto, não no fim do arquivo: sobras de uma
+        # gravação interrompida são sobrescritas em vez de deslocar as linhas seguintes.
+        offset = len(self.hashes) * self.dim * 4
+        with open(self.vectors_path, "r+b" if os.path.exists(self.vectors_path) else "wb") as f:
+            f.seek(offset)
+            f.write(vectors.tobytes())
+            f.truncate()
+        for h in hashes:
+            self.positions[h] = len(self.hashes)
+            self.hashes.append(h)
+        # O manifesto é gravado depois dos vetores: um leitor nunca vê linhas incompletas.
+        self._write_manifest()
+
+    def _compact(self, live_hashes: set):
+        vectors = self._open_vectors()
+        keep = [h for h in self.hashes if h in live_hashes]
+        data = np.asarray(vectors[[self.positions[h] for h in keep]]) if keep else np.empty((0, self.dim), dtype=np.float32)
+        del vectors
+        tmp_path = self.vectors_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(np.ascontiguousarray(data, dtype=np.float32).tobytes())
+        os.replace(tmp_path, self.vectors_path)
+        self.hashes = keep
+        self.positions = {h: i for i, h in enumerate(keep)}
+        self._write_manifest()
+        logging.info(f"Armazenamento de embeddings compactado para {len(keep)} vetores.")
+
+    def missing(self, texts: list[str]) -> list[int]:
+        """Índices dos textos que ainda não têm embedding armazenado."""
+        return [i for i, text in enumerate(texts) if content_hash(text) not in self.positions]
+
+    def get_embeddings(self, texts: list[str], embed_fn) -> np.ndarray:
+        """
+        Retorna a matriz (len(texts), dim) de embeddings, chamando 'embed_fn(lista_de_textos)'
+        apenas para os chunks ainda não armazenados. Quando a base não mudou, retorna
+        diretamente o arquivo mapeado em memória, sem cópia.
+        """
+        with self._lock:
+            hashes = [content_hash(t) for t in texts]
+            missing_idx, seen = [], set()
+            for i, h in enumerate(hashes):
+                if h not in self.positions and h not in seen:
+                    missing_idx.append(i)
+                    seen.add(h)
+
+            if missing_idx:
+                logging.info(f"Gerando embeddings de {len(missing_idx)} de {len(texts)} chunks (novos ou alterados).")
+                new_vectors = embed_fn([texts[i] for i in missing_idx])
+                self._append([hashes[i] for i in missing_idx], new_vectors)
+
+            live = set(hashes)
+            if self.hashes and len(live) < len(self.hashes) * (1 - COMPACT_RATIO):
+                self._compact(live)
+
+            vectors = self._open_vectors()
+            if hashes == self.hashes:
+                return vectors
+            return np.asarray(vectors[[self.positions[h] for h in hashes]])
@@ -0,0 +1,115 @@
+"""
+Índice lexical BM25 local sobre os chunks da base de conhecimento.
+
+Complementa a busca vetorial: identificadores exatos ("NR-33", "item 1.5.4.4.2")
+são encontrados por correspondência de termos, sem chamada à API, e a busca
+continua funcionando quando o serviço de embeddings está lento ou fora do ar.
+"""
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+import numpy as np
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Constante da Reciprocal Rank Fusion: valores maiores suavizam a diferença entre posições.
+RRF_K = 60
+
+_NR_RE = re.compile(r'\b(nr|nbr|it)\s*[-‐–]?\s*(\d+)\b')
+_ITEM_RE = re.compile(r'\b\d+(?:\.\d+)+\b')
+_WORD_RE = re.compile(r'\b[a-z0-9]{2,}\b')
+
+STOPWORDS = {
+    'de', 'da', 'do', 'das', 'dos', 'em', 'no', 'na', 'nos', 'nas', 'um', 'uma', 'uns', 'umas',
+    'para', 'por', 'com', 'sem', 'que', 'os', 'as', 'ao', 'aos', 'se', 'ou', 'e', 'o', 'a',
+    'quais', 'qual', 'sao', 'ser', 'sua', 'seu', 'suas', 'seus', 'pelo', 'pela', 'pelos', 'pelas',
+    'este', 'esta', 'esse', 'essa', 'isso', 'mais', 'como', 'deve', 'devem',
+}
+
+
+def normalize_text(text: str) -> str:
+    """Minúsculas e sem acentos, para que 'Exposição' e 'exposicao' coincidam."""
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Termos do texto. Normas viram um termo único ('NR 33', 'NR-33' -> 'nr-33') e
+    numerações de itens são mantidas inteiras ('1.5.4.4.2').
+    """
+    text = normalize_text(text)
+    tokens = [f"{kind}-{int(number)}" for kind, number in _NR_RE.findall(text)]
+    text = _NR_RE.sub(" ", text)
+    tokens.extend(_ITEM_RE.findall(text))
+    text = _ITEM_RE.sub(" ", text)
+    tokens.extend(t for t in _WORD_RE.findall(text) if t not in STOPWORDS)
+    return tokens
+
+
+class BM25Index:
+    """Índice invertido (termo -> documentos e frequências) com pontuação BM25."""
+
+    def __init__(self, texts: list[str], k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.size = len(texts)
+        postings = defaultdict(lambda: ([], []))
+        doc_lengths = np.zeros(self.size, dtype=np.float32)
+        for doc_id, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_lengths[doc_id] = sum(counts.values())
+            for term, tf in counts.items():
+                postings[term][0].append(doc_id)
+                postings[term][1].append(tf)
+        avg_length = float(doc_lengths.mean()) if self.size else 0.0
+        self._length_norm = k1 * (1 - b + b * doc_lengths / (avg_length or 1.0))
+        self.postings = {
+            term: (np.asarray(ids, dtype=np.int64), np.asarray(tfs, dtype=np.float32))
+            for term, (ids, tfs) in postings.items()
+        }
+        self.idf = {
+            term: math.log(1 + (self.size - len(ids) + 0.5) / (len(ids) + 0.5))
+            for term, (ids, _) in self.postings.items()
+        }
+
+    def __len__(self) -> int:
+        return self.size
+
+    def scores(self, query: str) -> np.ndarray:
+        """Pontuação BM25 de todos os documentos para a consulta (0 para quem não tem nenhum termo)."""
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            ids, tfs = self.postings[term]
+            scores[ids] += self.idf[term] * tfs * (self.k1 + 1) / (tfs + self._length_norm[ids])
+        return scores
+
+    def search(self, query: str, top_k: int = 5, candidates: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """Top-k por BM25, apenas entre documentos com ao menos um termo da consulta."""
+        scores = self.scores(query)
+        if candidates is not None:
+            mask = np.zeros(self.size, dtype=bool)
+            mask[candidates] = True
+            scores[~mask] = 0
+        matched = np.flatnonzero(scores > 0)
+        top_k = min(top_k, len(matched))
+        if top_k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        top = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        top = top[np.argsort(-scores[top])]
+        return top, scores[top]
+
+
+def reciprocal_rank_fusion(rankings: list[np.ndarray], top_k: int, k: int = RRF_K) -> np.ndarray:
+    """Combina listas ordenadas de índices somando 1/(k + posição) de cada lista."""
+    fused = defaultdict(float)
+    for ranking in rankings:
+        for position, doc_id in enumerate(ranking):
+            fused[int(doc_id)] += 1.0 / (k + position + 1)
+    ordered = sorted(fused, key=fused.get, reverse=True)
+    return np.asarray(ordered[:top_k], dtype=np.int64)
@@ -0,0 +1,95 @@
+"""
+Pré-filtro por metadados dos chunks da base de conhecimento.
+
+A planilha RAG pode ter colunas opcionais de norma, tópico e tipo de documento.
+Quando presentes, a busca considera apenas os chunks da norma/tipo auditado e
+os chunks gerais (célula vazia), reduzindo o custo da pontuação e o ruído no prompt.
+Uma célula pode listar vários valores separados por vírgula, ponto e vírgula ou barra.
+"""
+import hashlib
+import re
+
+import numpy as np
+import pandas as pd
+
+from analysis.lexical_index import normalize_text
+
+# Campo -> nomes de coluna aceitos na planilha RAG.
+METADATA_COLUMNS = {
+    'norma': ('Norma', 'norma', 'NR'),
+    'topic': ('Topico', 'Tópico', 'Topic'),
+    'doc_type': ('Tipo_Documento', 'Tipo Documento', 'Doc_Type'),
+}
+
+_NORMA_RE = re.compile(r'^(nr|nbr|it)\s*[-‐–]?\s*0*(\d+)')
+_SPLIT_RE = re.compile(r'[,;/]')
+
+
+def normalize_value(field: str, value) -> str:
+    """Forma canônica para comparação ('NR 01', 'nr-1' e 'NR-01' -> 'nr-1')."""
+    text = normalize_text(value).strip()
+    if field == 'norma':
+        match = _NORMA_RE.match(text)
+        if match:
+            return f"{match.group(1)}-{int(match.group(2))}"
+    return re.sub(r'\s+', ' ', text)
+
+
+def split_values(field: str, cell) -> list[str]:
+    if cell is None or (isinstance(cell, float) and pd.isna(cell)):
+        return []
+    return [v for v in (normalize_value(field, part) for part in _SPLIT_RE.split(str(cell))) if v]
+
+
+class MetadataFilter:
+    """Posições dos chunks por valor de cada metadado presente na base."""
+
+    def __init__(self, df: pd.DataFrame):
+        self.size = len(df)
+        self.fields = {}
+        self.general = {}
+        for field, names in METADATA_COLUMNS.items():
+            column = next((name for name in names if name in df.columns), None)
+            if column is None:
+                continue
+            positions, general = {}, []
+            for position, cell in enumerate(df[column].tolist()):
+                values = split_values(field, cell)
+                if not values:
+                    general.append(position)
+                for value in values:
+                    positions.setdefault(value, []).append(position)
+            self.fields[field] = {value: np.asarray(rows, dtype=np.int64) for value, rows in positions.items()}
+            self.general[field] = np.asarray(general, dtype=np.int64)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.fields)
+
+    def signature(self) -> str:
+        """Hash dos metadados, para compor a versão da base."""
+        digest = hashlib.sha1()
+        for field in sorted(self.fields):
+            for value in sorted(self.fields[field]):
+                digest.update(f"{field}={value}:{self.fields[field][value].tolist()}".encode("utf-8"))
+        return digest.hexdigest()[:12]
+
+    def candidates(self, **criteria) -> np.ndarray | None:
+        """
+        Posições que atendem a todos os critérios informados (ex.: norma='NR-33',
+        doc_type='Treinamento'). Critérios vazios ou sem coluna correspondente são
+        ignorados, assim como um critério que não casa com nenhum chunk específico.
+        Retorna None quando não há filtro a aplicar.
+        """
+        selected = None
+        for field, value in criteria.items():
+            if not value or field not in self.fields:
+                continue
+            rows = self.fields[field].get(normalize_value(field, value))
+            if rows is None:
+                continue
+            allowed = np.union1d(rows, self.general[field])
+            selected = allowed if selected is None else np.intersect1d(selected, allowed)
+        if selected is None or len(selected) == 0 or len(selected) == self.size:
+            return None
+        return selected
@@ -2,74 +2,109 @@ import streamlit as st
 import pandas as pd
 import tempfile
 import os
-import re
 import json
 import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
 import google.generativeai as genai
 import random
-import gspread
+import threading
+import logging
 from AI.api_Operation import PDFQA
-from gdrive.config import get_credentials_dict
+from AI.pdf_preprocessor import (
+    select_relevant_pages, choose_pages, extract_page_texts, split_sections, _has_text_layer, _write_pages,
+    MIN_PAGES_FOR_SELECTION
+)
+from AI.text_archive import ArchivedDocument
+from AI.json_repair import parse_json_response
+from AI.response_schemas import AUDIT_SCHEMA
+from AI.embeddings import embed_query
+from analysis.retrieval_cache import retrieval_cache, compute_rag_version
+from analysis.lexical_index import reciprocal_rank_fusion
+from analysis.context_assembly import assemble_context, get_context_settings, estimate_tokens
+from analysis.rag_index_builder import RagKnowledgeBase, get_rag_builder, get_rag_source, RAG_SOURCE_LOCAL
 from operations.action_plan import ActionPlanManager
-from google.oauth2.service_account import Credentials
 from datetime import datetime
 
+AUDIT_QUERY_TEMPLATE = "Quais são os principais requisitos de conformidade para um {doc_type} da norma {norma}?"
+AUDIT_TOP_K = 7
+# Parte variável do prompt de auditoria; as instruções vão no prefixo (ver AI.prompt_cache).
+AUDIT_REQUEST = "Audite o documento PDF anexado seguindo a tarefa e o checklist acima e responda somente com o JSON."
+# Auditoria só de texto (AI.text_archive): o PDF não é enviado, então assinaturas não são visíveis.
+TEXT_SIGNATURE_CAVEAT = (
+    "Assinaturas e carimbos não aparecem no texto extraído: considere-os presentes apenas se houver "
+    "indicação textual (assinatura digital, nome do signatário junto à linha de assinatura) e, caso "
+    "contrário, registre a limitação na observação."
+)
+AUDIT_TEXT_REQUEST = (
+    "Audite o documento abaixo (texto extraído do PDF, com a numeração original das páginas) seguindo a "
+    f"tarefa e o checklist acima e responda somente com o JSON. {TEXT_SIGNATURE_CAVEAT}"
+)
 
+# Auditoria por seção (PGR/PCMSO longos): cada seção do checklist vai numa chamada menor,
+# todas em paralelo, e os achados são combinados no formato de _parse_advanced_audit_result.
+SECTION_AUDIT_MIN_PAGES = 20
+AUDIT_SECTION_REQUEST = "Audite a seção indicada acima no conteúdo a seguir e responda somente com o JSON."
+AUDIT_SECTION_TEXT_REQUEST = (
+    "Audite a seção indicada acima no documento abaixo (texto extraído do PDF, com a numeração original das "
+    f"páginas) e responda somente com o JSON. {TEXT_SIGNATURE_CAVEAT}"
+)
+SECTION_AUDIT_CHECKLISTS = {
+    'PGR': [
+        ('inventario_riscos', "Inventário de Riscos", """
+            *   NÃO BASTA TER A SEÇÃO. O inventário deve, para cada risco, apresentar uma **avaliação**, indicando o **nível de risco** (ex: baixo, médio, alto) baseado em critérios de **severidade e probabilidade** (NR 01, item 1.5.4.4.2).
+            *   Verifique se os riscos são específicos para as funções/atividades da empresa e não genéricos.
+            *   **REGRA:** Se houver apenas uma lista de riscos sem classificação clara de nível de risco, aponte **'Inventário de Riscos incompleto'** como 'Não Conforme'.
+            """),
+        ('plano_acao', "Plano de Ação", """
+            *   NÃO BASTA TER A SEÇÃO. O plano de ação deve conter um **cronograma** com datas ou prazos definidos e **responsáveis** pelas ações (NR 01, item 1.5.5.2.2).
+            *   As ações devem ser específicas para os riscos identificados, e não itens genéricos como "Atualização anual do PGR".
+            *   **REGRA:** Se o plano for uma lista de tópicos sem cronograma e responsáveis, aponte **'Plano de Ação não estruturado'** como 'Não Conforme'.
+            """),
+        ('emergencia', "Procedimentos de Emergência", """
+            *   Verifique se o documento descreve, mesmo que minimamente, os procedimentos de resposta a emergências (NR 01, item 1.5.6.1).
+            *   **REGRA:** Se não houver menção a como responder a emergências, aponte **'Ausência de plano de emergência'** como 'Não Conforme'.
+            """),
+        ('assinaturas', "Vigência e Assinaturas", """
+            *   Verifique se o documento tem data de emissão e assinatura do responsável.
+            *   A data de emissão/aprovação NÃO PODE ser futura em relação à data da auditoria.
+            """),
+    ],
+    'PCMSO': [
+        ('exames', "Planejamento dos Exames", """
+            *   Verifique se os exames clínicos e complementares estão definidos por função ou grupo de exposição, de acordo com os riscos identificados, com a **periodicidade** de cada exame.
+            *   **REGRA:** Se os exames forem genéricos (iguais para todos, sem relação com os riscos) ou sem periodicidade, aponte como 'Não Conforme'.
+            """),
+        ('emergencia', "Primeiros Socorros e Emergências", """
+            *   Verifique se o programa prevê os recursos de primeiros socorros e o atendimento a emergências médicas.
+            *   **REGRA:** Se não houver menção a primeiros socorros ou emergências, aponte como 'Não Conforme'.
+            """),
+        ('assinaturas', "Vigência e Médico Responsável", """
+            *   Verifique se o documento identifica o médico responsável (nome e CRM) e se está assinado e datado.
+            *   A data de emissão/aprovação NÃO PODE ser futura em relação à data da auditoria.
+            """),
+    ],
+}
 
-@st.cache_data(ttl=3600)
-def load_and_embed_rag_base(sheet_id: str) -> tuple[pd.DataFrame, np.ndarray | None]:
-    """
-    Carrega a planilha RAG e gera embeddings em lotes para respeitar os limites da API.
-    """
-    try:
-        # Carrega os dados da planilha (código existente, está correto)
-        scopes = ['https://www.googleapis.com/auth/spreadsheets']
-        creds_dict = get_credentials_dict()
-        creds = Credentials.from_service_account_info(creds_dict, scopes=scopes)
-        gc = gspread.authorize(creds)
-        spreadsheet = gc.open_by_key(sheet_id)
-        worksheet = spreadsheet.sheet1
-        df = pd.DataFrame(worksheet.get_all_records())
-
-        if df.empty or "Answer_Chunk" not in df.columns:
-            st.error("A planilha RAG está vazia ou não contém a coluna 'Answer_Chunk'.")
-            return pd.DataFrame(), None
-
-        # --- 2. LÓGICA DE BATCHING APLICADA AQUI ---
-        all_embeddings = []
-        chunks_to_embed = df["Answer_Chunk"].tolist()
-        batch_size = 90
-        
-        progress_bar = st.progress(0, text=f"Indexando a base de conhecimento ({len(chunks_to_embed)} itens)...")
-        
-        for i in range(0, len(chunks_to_embed), batch_size):
-            batch = chunks_to_embed[i:i + batch_size]
-            
-            # Atualiza a barra de progresso
-            progress_bar.progress(i / len(chunks_to_embed), text=f"Processando lote {i//batch_size + 1}...")
-            
-            # Faz a chamada para o lote atual
-            result = genai.embed_content(
-                model='models/gemini-embedding-001',
-                content=batch
-            )
-            all_embeddings.extend(result['embedding'])
-            time.sleep(1)
-            
-            # Pausa de 1 segundo entre os lotes para não exceder o limite de 15 RPM
-            time.sleep(1)
+KB_UNAVAILABLE_MESSAGE = "Base de conhecimento indisponível."
+SEARCH_ERROR_MESSAGE = "Erro ao buscar chunks relevantes."
 
-        progress_bar.empty()
-        embeddings = np.array(all_embeddings)
-        
-        st.success("Base de conhecimento indexada e pronta para uso!")
-        return df, embeddings
+# Cada busca traz mais candidatos que o top_k para que a fusão tenha o que combinar.
+FUSION_DEPTH = 30
+
+# Tipos auditados sem norma específica; os treinamentos entram com cada norma conhecida.
+WARMUP_DOC_TYPES = ['ASO', 'Doc. Empresa']
+
+def get_section_audit_settings() -> tuple[bool, int]:
+    """(auditoria por seção ativa, número mínimo de páginas), de [app_settings] 'section_audit' e 'section_audit_min_pages'."""
+    enabled, min_pages = True, SECTION_AUDIT_MIN_PAGES
+    try:
+        app_settings = st.secrets.app_settings
+        enabled = bool(app_settings.get("section_audit", True))
+        min_pages = int(app_settings.get("section_audit_min_pages", SECTION_AUDIT_MIN_PAGES))
+    except Exception:
+        pass
+    return enabled, min_pages
 
-    except Exception as e:
-        st.error(f"Falha ao carregar e gerar embeddings para a base RAG: {e}")
-        st.warning("Verifique sua chave de API e os limites de quota. Se o erro persistir, considere habilitar o faturamento no seu projeto Google Cloud.")
-        return pd.DataFrame(), None
 
 class NRAnalyzer:
     def __init__(self):
@@ -79,18 +114,49 @@ class NRAnalyzer:
         self.action_plan_manager = ActionPlanManager()
 
         self.rag_sheet_id = None
-        self.rag_df = pd.DataFrame()
-        self.rag_embeddings = np.array([])
+        self.rag_builder = None
         
         try:
-            self.rag_sheet_id = st.secrets.app_settings.get("rag_sheet_id")
-            if not self.rag_sheet_id:
-                st.error("ID da planilha RAG ('rag_sheet_id') não encontrado nos secrets.")
+            if get_rag_source() == RAG_SOURCE_LOCAL:
+                # Base publicada por analysis.corpus_ingest, sem leitura da planilha.
+                self.rag_builder = get_rag_builder(None)
             else:
-                self.rag_df, self.rag_embeddings = load_and_embed_rag_base(self.rag_sheet_id)
+                self.rag_sheet_id = st.secrets.app_settings.get("rag_sheet_id")
+                if not self.rag_sheet_id:
+                    st.error("ID da planilha RAG ('rag_sheet_id') não encontrado nos secrets.")
+                else:
+                    self.rag_builder = get_rag_builder(self.rag_sheet_id)
+            # A base é indexada em segundo plano; até ficar pronta, a busca é lexical/cache.
+            if self.rag_builder is not None:
+                self.rag_builder.ensure_started()
         except (AttributeError, KeyError):
             st.error("Seção [app_settings] com 'rag_sheet_id' não encontrada no secrets.toml.")
 
+    @property
+    def knowledge_base(self) -> RagKnowledgeBase:
+        """Estado atual da base (pode mudar quando a construção em segundo plano avança)."""
+        if self.rag_builder is None:
+            return RagKnowledgeBase.empty()
+        self.rag_builder.ensure_started()
+        return self.rag_builder.knowledge_base
+
+    @property
+    def is_rag_ready(self) -> bool:
+        return self.rag_builder is not None and self.rag_builder.ready
+
+    @property
+    def rag_df(self) -> pd.DataFrame:
+        return self.knowledge_base.df
+
+    @property
+    def rag_embeddings(self) -> np.ndarray:
+        return self.knowledge_base.embeddings
+
+    @property
+    def rag_version(self) -> str | None:
+        """Versão dos contextos em cache: versão da base + parâmetros da consulta de auditoria."""
+        return self._context_version(self.knowledge_base)
+
     def _find_semantically_relevant_chunks(self, query_text: str, top_k: int = 5) -> str:
         if self.rag_df.empty or self.rag_embeddings is None or self.rag_embeddings.size == 0:
             return "Base de conhecimento indisponível ou não indexada."
@@ -298,48 +364,311 @@ class NRAnalyzer:
         ```
         """
 
-    def _find_semantically_relevant_chunks(self, query_text: str, top_k: int = 5) -> str:
-        if self.rag_df.empty or self.rag_embeddings is None or self.rag_embeddings.size == 0:
-            return "Base de conhecimento indisponível."
-        try:
-            query_embedding_result = genai.embed_content(
-                model='models/text-embedding-004',
-                content=[query_text],
-                task_type="RETRIEVAL_QUERY"
-            )
-            query_embedding = np.array(query_embedding_result['embedding'])
-            similarities = cosine_similarity(query_embedding, self.rag_embeddings)[0]
-            top_k_indices = similarities.argsort()[-top_k:][::-1]
-            relevant_chunks = self.rag_df.iloc[top_k_indices]
-            return "\n\n---\n\n".join(relevant_chunks['Answer_Chunk'].tolist())
-        except Exception as e:
-            st.warning(f"Erro durante a busca semântica: {e}")
-            return "Erro ao buscar chunks relevantes."
+    def _find_semantically_relevant_chunks(self, query_text: str, top_k: int = 5, **filters) -> str:
+        """
+        Contexto da base de conhecimento para a consulta: até 'top_k' chunks, reduzidos pela
+        montagem adaptativa (similaridade, duplicatas e orçamento de tokens).
+        """
+        kb = self.knowledge_base
+        indices, degraded, similarities = self._retrieve_chunk_indices(kb, query_text, top_k, **filters)
+        if indices is None:
+            return KB_UNAVAILABLE_MESSAGE if kb.df.empty else SEARCH_ERROR_MESSAGE
+        return self._assemble_context(kb, indices, similarities, label=query_text[:60])
 
-    def perform_initial_audit(self, doc_info: dict, file_content: bytes) -> dict | None:
+    @staticmethod
+    def _assemble_context(kb: RagKnowledgeBase, indices, similarities, label: str = "") -> str:
+        chunks = kb.df['Answer_Chunk'].iloc[indices].astype(str).tolist()
+        vectors = kb.vector_index.rows(indices) if kb.vector_index is not None else None
+        return assemble_context(chunks, similarities, vectors, label=label, **get_context_settings())
+
+    @staticmethod
+    def _context_version(kb: RagKnowledgeBase) -> str | None:
+        if not kb.version:
+            return None
+        settings = sorted(get_context_settings().items())
+        return compute_rag_version([kb.version], AUDIT_QUERY_TEMPLATE, AUDIT_TOP_K, settings)
+
+    def _retrieve_chunk_indices(self, kb: RagKnowledgeBase, query_text: str, top_k: int,
+                                **filters) -> tuple[np.ndarray | None, bool, np.ndarray | None]:
+        """
+        Índices dos chunks mais relevantes, se o resultado é degradado (só lexical: índice
+        vetorial ainda em construção ou busca vetorial com erro) e a similaridade de cosseno
+        de cada chunk com a consulta (None quando degradado). Com a busca híbrida, as listas
+        BM25 e vetorial são combinadas por Reciprocal Rank Fusion; retorna (None, True, None)
+        se nenhuma busca foi possível. 'filters' (norma, topic, doc_type) restringe os
+        candidatos quando a base tem essas colunas.
+        """
+        if kb.df.empty:
+            return None, True, None
+        candidates = kb.metadata.candidates(**filters) if kb.metadata and filters else None
+        fuse = kb.hybrid and kb.lexical_index is not None
+        depth = max(top_k, FUSION_DEPTH) if fuse else top_k
+
+        vector_ranking = vector_scores = None
+        if kb.vector_index is not None:
+            try:
+                query_embedding = embed_query(query_text)
+                if kb.ann_index is not None:
+                    vector_ranking, vector_scores = kb.ann_index.search(kb.vector_index, query_embedding, depth, allowed=candidates)
+                else:
+                    vector_ranking, vector_scores = kb.vector_index.search(query_embedding, depth, candidates=candidates)
+            except Exception as e:
+                if kb.lexical_index is None:
+                    st.warning(f"Erro durante a busca semântica: {e}")
+                    return None, True, None
+                logging.warning(f"Busca semântica indisponível, usando apenas a busca lexical: {e}")
+
+        if vector_ranking is not None and not fuse:
+            return vector_ranking[:top_k], False, vector_scores[:top_k]
+        if kb.lexical_index is None:
+            return None, True, None
+        lexical_ranking, _ = kb.lexical_index.search(query_text, depth, candidates=candidates)
+        if vector_ranking is None:
+            return lexical_ranking[:top_k], True, None
+        fused = reciprocal_rank_fusion([vector_ranking, lexical_ranking], top_k)
+        return fused, False, kb.vector_index.scores(query_embedding, candidates=fused)[0]
+
+    def get_audit_context(self, doc_type: str, norma: str) -> str:
+        """
+        Trechos da base de conhecimento para auditar um (doc_type, norma). O resultado é
+        reaproveitado enquanto a versão da base não mudar, sem nova busca semântica.
+        """
+        kb = self.knowledge_base
+        version = self._context_version(kb)
+        if version:
+            cached = retrieval_cache.get(version, doc_type, norma)
+            if cached is not None:
+                return cached
+        query = AUDIT_QUERY_TEMPLATE.format(doc_type=doc_type, norma=norma)
+        indices, degraded, similarities = self._retrieve_chunk_indices(kb, query, AUDIT_TOP_K, norma=norma, doc_type=doc_type)
+        if indices is None:
+            return KB_UNAVAILABLE_MESSAGE if kb.df.empty else SEARCH_ERROR_MESSAGE
+        context = self._assemble_context(kb, indices, similarities, label=f"{doc_type} {norma}".strip())
+        # Resultados só lexicais (índice em construção ou API fora do ar) não ficam no cache.
+        if version and not degraded:
+            retrieval_cache.put(version, doc_type, norma, context)
+        return context
+
+    def warm_retrieval_cache(self, normas=()):
+        """
+        Pré-calcula em segundo plano os contextos dos tipos de documento conhecidos e de
+        cada norma de treinamento (ex.: EmployeeManager.nr_config). Aguarda o índice vetorial
+        ficar pronto e roda uma vez por versão da base.
+        """
+        if self.rag_builder is None:
+            return
+        targets = [(doc_type, "") for doc_type in WARMUP_DOC_TYPES] + [("Treinamento", norma) for norma in normas]
+
+        def warm():
+            if not self.rag_builder.wait_until_ready():
+                return
+            version = self.rag_version
+            if not version or not retrieval_cache.claim_warmup(version):
+                return
+            for doc_type, norma in targets:
+                try:
+                    self.get_audit_context(doc_type, norma)
+                except Exception as e:
+                    logging.warning(f"Falha ao pré-calcular o contexto de '{doc_type} {norma}': {e}")
+            logging.info(f"Cache de contextos aquecido para {len(targets)} combinações (base {version}).")
+
+        threading.Thread(target=warm, name="rag-context-warmup", daemon=True).start()
+
+    def perform_initial_audit(self, doc_info: dict, file_content: bytes | None, on_partial=None,
+                              archived: ArchivedDocument | None = None) -> dict | None:
+        """
+        Auditoria do PDF pelo checklist do tipo; 'on_partial' recebe a resposta em streaming.
+        Com 'archived' (texto do AI.text_archive de um PDF com camada de texto), o prompt leva
+        só o texto extraído e 'file_content' pode ser None. PGRs e PCMSOs longos são auditados
+        por seção, em paralelo (sem streaming).
+        """
         doc_type = doc_info.get("type", "documento")
         norma = doc_info.get("norma", "")
-        query = f"Quais são os principais requisitos de conformidade para um {doc_type} da norma {norma}?"
-        relevant_knowledge = self._find_semantically_relevant_chunks(query, top_k=7)
-        prompt = self._get_advanced_audit_prompt(doc_info, relevant_knowledge)
-        
+        relevant_knowledge = self.get_audit_context(doc_type, norma)
+        profile = doc_info.get("tipo_documento", doc_type)
+
+        sections = self._split_for_section_audit(profile, file_content, archived)
+        if sections:
+            return self._perform_section_audit(doc_info, profile, relevant_knowledge, sections, file_content, archived)
+
+        # Instruções e contexto RAG só mudam com o tipo/norma (e a data): vão como prefixo
+        # cacheável, e a pergunta leva apenas o que é específico deste PDF.
+        prompt_prefix = self._get_advanced_audit_prompt(doc_info, relevant_knowledge)
+        prompt = AUDIT_REQUEST
+        logging.info(
+            f"Prompt de auditoria ({doc_type} {norma}): ~{estimate_tokens(prompt_prefix)} tokens, "
+            f"dos quais ~{estimate_tokens(relevant_knowledge)} de contexto RAG."
+        )
+
+        if archived is not None and archived.has_text_layer:
+            return self._perform_text_audit(archived, profile, prompt_prefix, on_partial)
+        if file_content is None:
+            logging.error(f"Auditoria de '{doc_type}' sem PDF nem texto arquivado.")
+            return None
+
+        # PGRs e PCMSOs longos: envia apenas as páginas das seções auditadas.
+        file_content, page_stats = select_relevant_pages(file_content, profile=profile)
+        if page_stats.get("selected_pages"):
+            paginas = ", ".join(str(p) for p in page_stats["selected_pages"])
+            prompt += (
+                f"\n**Observação:** O PDF anexado contém apenas as páginas {paginas} do documento original "
+                f"({page_stats['total_pages']} páginas). Ao citar evidências, use a numeração original das páginas.\n"
+            )
+
         temp_path = None
         try:
             with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
                 temp_file.write(file_content)
                 temp_path = temp_file.name
-            analysis_result, _ = self.pdf_analyzer.answer_question([temp_path], prompt, task_type='audit')
+            analysis_result, _ = self.pdf_analyzer.answer_question(
+                [temp_path], prompt, task_type='audit', response_schema=AUDIT_SCHEMA, doc_type=profile,
+                prompt_prefix=prompt_prefix, on_partial=on_partial
+            )
             return self._parse_advanced_audit_result(analysis_result) if analysis_result else None
         finally:
             if temp_path and os.path.exists(temp_path):
                 os.unlink(temp_path)
 
+    def _perform_text_audit(self, archived: ArchivedDocument, profile: str, prompt_prefix: str, on_partial=None) -> dict | None:
+        """Auditoria sobre o texto arquivado; documentos longos levam só as páginas das seções auditadas."""
+        page_numbers = None
+        if len(archived.pages) > MIN_PAGES_FOR_SELECTION:
+            page_numbers = [index + 1 for index in choose_pages(archived.page_texts, profile)]
+        prompt = f"{AUDIT_TEXT_REQUEST}\n\n{archived.to_prompt_text(page_numbers)}"
+        analysis_result, _ = self.pdf_analyzer.answer_question(
+            [], prompt, task_type='audit', response_schema=AUDIT_SCHEMA, doc_type=profile,
+            prompt_prefix=prompt_prefix, on_partial=on_partial
+        )
+        return self._parse_advanced_audit_result(analysis_result) if analysis_result else None
+
+    def _split_for_section_audit(self, profile: str, file_content: bytes | None,
+                                 archived: ArchivedDocument | None) -> list[tuple] | None:
+        """
+        [(seção, título, checklist, índices das páginas)] se o documento deve ser auditado por
+        seção, ou None: tipo sem checklist por seção, documento curto ou escaneado, ou alguma
+        seção não localizada (nesse caso a auditoria completa decide se ela falta).
+        """
+        enabled, min_pages = get_section_audit_settings()
+        checklist = SECTION_AUDIT_CHECKLISTS.get(profile)
+        if not enabled or not checklist:
+            return None
+        if archived is not None and archived.has_text_layer:
+            page_texts = archived.page_texts
+        else:
+            page_texts = extract_page_texts(file_content) if file_content else None
+            if page_texts and not _has_text_layer(page_texts):
+                return None
+        if not page_texts or len(page_texts) < min_pages:
+            return None
+
+        pages = split_sections(page_texts, [section for section, _, _ in checklist])
+        missing = [title for section, title, _ in checklist if not pages[section]]
+        if missing:
+            logging.info(f"Auditoria por seção não aplicada ({profile}): seções não localizadas: {', '.join(missing)}.")
+            return None
+        return [(section, title, text, pages[section]) for section, title, text in checklist]
+
+    def _get_section_audit_prompt(self, doc_info: dict, profile: str, title: str, checklist: str,
+                                  relevant_knowledge: str) -> str:
+        norma = doc_info.get("norma", "normas aplicáveis")
+        data_atual = datetime.now().strftime('%d/%m/%Y')
+        return f"""
+        **Persona:** Você é um Auditor Líder de SST. Audite **apenas a seção "{title}"** de um {profile} ({norma}); as demais seções são auditadas separadamente, então não aponte falhas de outras seções.
+
+        **Contexto Crítico:** A data de hoje é **{data_atual}**. Você recebe somente as páginas relacionadas a esta seção.
+
+        **Base de Conhecimento Normativa (Fonte da Verdade):**
+        USE ESTA FONTE para preencher a chave "referencia_normativa" no JSON.
+        ---
+        {relevant_knowledge}
+        ---
+
+        **Checklist da Seção "{title}":**
+            {checklist}
+
+        **Regras:** Para cada não conformidade, a 'observacao' deve citar a página e a evidência. A "referencia_normativa" DEVE vir da Base de Conhecimento acima; **NUNCA cite o checklist como referência.**
+
+        **Estrutura JSON de Saída Obrigatória:**
+        ```json
+        {{
+          "parecer_final": "Conforme | Não Conforme | Conforme com Ressalvas",
+          "resumo_executivo": "Conclusão sobre esta seção em uma ou duas frases.",
+          "pontos_de_nao_conformidade": [
+            {{"item": "...", "referencia_normativa": "...", "observacao": "Na página X, ..."}}
+          ]
+        }}
+        ```
+        """
+
+    def _perform_section_audit(self, doc_info: dict, profile: str, relevant_knowledge: str, sections: list[tuple],
+                               file_content: bytes | None, archived: ArchivedDocument | None) -> dict | None:
+        """Audita as seções em chamadas concorrentes e combina os achados num único resultado."""
+        use_text = archived is not None and archived.has_text_layer
+        temp_paths, jobs = [], []
+        try:
+            for section, title, checklist, page_indices in sections:
+                prompt_prefix = self._get_section_audit_prompt(doc_info, profile, title, checklist, relevant_knowledge)
+                page_numbers = [index + 1 for index in page_indices]
+                if use_text:
+                    jobs.append(([], f"{AUDIT_SECTION_TEXT_REQUEST}\n\n{archived.to_prompt_text(page_numbers)}",
+                                 'audit', AUDIT_SCHEMA, profile, prompt_prefix))
+                    continue
+                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
+                    temp_file.write(_write_pages(file_content, page_indices))
+                    temp_paths.append(temp_file.name)
+                paginas = ", ".join(str(p) for p in page_numbers)
+                question = (
+                    f"{AUDIT_SECTION_REQUEST}\n**Observação:** O PDF anexado contém apenas as páginas {paginas} do "
+                    f"documento original. Ao citar evidências, use a numeração original das páginas."
+                )
+                jobs.append(([temp_file.name], question, 'audit', AUDIT_SCHEMA, profile, prompt_prefix))
+
+            logging.info(f"Auditoria por seção ({profile}): {len(jobs)} seções em paralelo.")
+            answers = self.pdf_analyzer.answer_questions(jobs)
+        finally:
+            for temp_path in temp_paths:
+                if os.path.exists(temp_path):
+                    os.unlink(temp_path)
+
+        return self._merge_section_results([title for _, title, _, _ in sections], [answer for answer, _ in answers])
+
+    def _merge_section_results(self, titles: list[str], answers: list[str | None]) -> dict | None:
+        """
+        Combina as respostas das seções no JSON de auditoria completa: o parecer mais grave,
+        o resumo de cada seção e todos os pontos. Seções sem resposta válida viram ressalvas.
+        """
+        severity = ["Conforme", "Conforme com Ressalvas", "Não Conforme"]
+        merged = {"parecer_final": "Conforme", "resumo_executivo": "", "pontos_de_nao_conformidade": [], "pontos_de_ressalva": []}
+        summaries, audited = [], 0
+        for title, answer in zip(titles, answers):
+            data = parse_json_response(answer, expected=dict) if answer else None
+            if data is None:
+                merged["pontos_de_ressalva"].append({
+                    "item": f"Seção '{title}' não auditada",
+                    "referencia_normativa": "N/A",
+                    "observacao": "A IA não retornou uma resposta válida para esta seção; reexecute a auditoria ou verifique-a manualmente."
+                })
+                parecer = "Conforme com Ressalvas"
+            else:
+                audited += 1
+                parecer = data.get("parecer_final", "Indefinido")
+                if parecer not in severity:
+                    parecer = "Conforme com Ressalvas"
+                summaries.append(f"{title}: {data.get('resumo_executivo', '')}".strip())
+                merged["pontos_de_nao_conformidade"].extend(data.get("pontos_de_nao_conformidade", []))
+                merged["pontos_de_ressalva"].extend(data.get("pontos_de_ressalva", []))
+            if severity.index(parecer) > severity.index(merged["parecer_final"]):
+                merged["parecer_final"] = parecer
+        if not audited:
+            return None
+        merged["resumo_executivo"] = "\n".join(summaries)
+        return self._parse_advanced_audit_result(json.dumps(merged, ensure_ascii=False))
+
     def _parse_advanced_audit_result(self, json_string: str) -> dict:
         try:
-            match = re.search(r'\{.*\}', json_string, re.DOTALL)
-            if not match:
+            data = parse_json_response(json_string, expected=dict)
+            if data is None:
                 return {"summary": "Falha na Análise", "details": [{"item_verificacao": "Resposta Bruta da IA", "observacao": json_string, "status": "Não Conforme"}]}
-            data = json.loads(match.group(0))
             summary = data.get("parecer_final", "Indefinido")
             details = []
             
@@ -362,14 +691,18 @@ class NRAnalyzer:
         except (json.JSONDecodeError, AttributeError):
             return {"summary": "Falha na Análise (Erro de JSON)", "details": [{"item_verificacao": "Resposta Bruta da IA", "observacao": json_string, "status": "Não Conforme"}]}
 
-    def create_action_plan_from_audit(self, audit_result: dict, company_id: str, doc_id: str, employee_id: str | None = None):
+    def get_actionable_items(self, audit_result: dict) -> list:
+        """Itens 'Não Conforme' de uma auditoria que devem virar itens do plano de ação."""
         if "não conforme" not in audit_result.get("summary", "").lower():
-            return 0
-        actionable_items = [
+            return []
+        return [
             item for item in audit_result.get("details", []) 
             if item.get("status", "").lower() == "não conforme" 
             and "resumo executivo" not in item.get("item_verificacao", "").lower()
         ]
+
+    def create_action_plan_from_audit(self, audit_result: dict, company_id: str, doc_id: str, employee_id: str | None = None):
+        actionable_items = self.get_actionable_items(audit_result)
         if not actionable_items: return 0
         audit_run_id = f"audit_{doc_id}_{random.randint(1000, 9999)}"
         created_count = 0
@@ -0,0 +1,242 @@
+"""
+Construção em segundo plano da base de conhecimento (RAG).
+
+A planilha é carregada e indexada em uma thread, sem bloquear uploads nem a
+renderização das páginas. A construção tem duas etapas: primeiro a base fica
+disponível para busca lexical (BM25) e para os contextos já em cache; depois,
+com os embeddings prontos, a busca vetorial/híbrida passa a ser usada. Cada
+etapa publica um novo RagKnowledgeBase imutável, então as buscas em andamento
+nunca veem um índice pela metade.
+"""
+import logging
+import os
+import threading
+import time
+
+import gspread
+import numpy as np
+import pandas as pd
+import streamlit as st
+from google.oauth2.service_account import Credentials
+
+from AI.embeddings import EMBEDDING_MODEL, embed_documents
+from AI.local_store import get_local_path
+from analysis.ann_index import IVFStore, DEFAULT_N_PROBE
+from analysis.corpus_ingest import load_published_corpus, CURRENT_FILE
+from analysis.embedding_store import EmbeddingStore, content_hash
+from analysis.lexical_index import BM25Index
+from analysis.metadata_filter import MetadataFilter
+from analysis.retrieval_cache import compute_rag_version
+from analysis.vector_index import load_or_build_index
+from gdrive.config import get_credentials_dict
+
+# Intervalo para recarregar a planilha RAG; a base anterior continua em uso durante a recarga.
+RAG_REFRESH_S = 3600
+# Após uma falha, nova tentativa no máximo a cada RAG_RETRY_S.
+RAG_RETRY_S = 60
+
+# Abaixo deste tamanho a busca exata já é rápida e o índice aproximado não compensa.
+DEFAULT_ANN_MIN_CHUNKS = 50_000
+
+RAG_SOURCE_SHEET = 'sheet'
+RAG_SOURCE_LOCAL = 'local'
+
+STATUS_PENDING = 'pendente'
+STATUS_LEXICAL = 'lexical'
+STATUS_READY = 'pronta'
+STATUS_ERROR = 'erro'
+
+
+def get_rag_source() -> str:
+    """
+    Origem da base: 'sheet' (planilha 'rag_sheet_id') ou 'local' (versão publicada por
+    analysis.corpus_ingest). Configurável em [app_settings] 'rag_source'.
+    """
+    try:
+        source = str(st.secrets.app_settings.get("rag_source", RAG_SOURCE_SHEET)).lower()
+    except Exception:
+        source = RAG_SOURCE_SHEET
+    return RAG_SOURCE_LOCAL if source == RAG_SOURCE_LOCAL else RAG_SOURCE_SHEET
+
+
+def use_int8_index() -> bool:
+    """Quantização int8 do índice vetorial, configurável em [app_settings] 'rag_index_int8'."""
+    try:
+        return bool(st.secrets.app_settings.get("rag_index_int8", False))
+    except Exception:
+        return False
+
+
+def get_ann_settings(size: int) -> tuple[int, int] | None:
+    """
+    (n_lists, n_probe) do índice aproximado, ou None para busca exata. Configurável em
+    [app_settings]: 'rag_ann_enabled', 'rag_ann_min_chunks', 'rag_ann_lists' (0 = automático)
+    e 'rag_ann_probe' (mais sondas = mais recall, busca mais lenta).
+    """
+    try:
+        settings = st.secrets.app_settings
+        if not settings.get("rag_ann_enabled", False) or size < int(settings.get("rag_ann_min_chunks", DEFAULT_ANN_MIN_CHUNKS)):
+            return None
+        return int(settings.get("rag_ann_lists", 0)), max(1, int(settings.get("rag_ann_probe", DEFAULT_N_PROBE)))
+    except Exception:
+        return None
+
+
+def use_hybrid_search() -> bool:
+    """Busca híbrida (BM25 local + vetorial), configurável em [app_settings] 'rag_hybrid_search'."""
+    try:
+        return bool(st.secrets.app_settings.get("rag_hybrid_search", True))
+    except Exception:
+        return True
+
+
+def load_rag_sheet(sheet_id: str) -> pd.DataFrame:
+    """Lê a planilha RAG (primeira aba). Levanta ValueError se não houver a coluna 'Answer_Chunk'."""
+    scopes = ['https://www.googleapis.com/auth/spreadsheets']
+    creds = Credentials.from_service_account_info(get_credentials_dict(), scopes=scopes)
+    worksheet = gspread.authorize(creds).open_by_key(sheet_id).sheet1
+    df = pd.DataFrame(worksheet.get_all_records())
+    if df.empty or "Answer_Chunk" not in df.columns:
+        raise ValueError("A planilha RAG está vazia ou não contém a coluna 'Answer_Chunk'.")
+    return df
+
+
+class RagKnowledgeBase:
+    """Estado imutável da base: chunks, versão e índices disponíveis até o momento."""
+
+    def __init__(self, df: pd.DataFrame, version: str | None = None, lexical_index: BM25Index | None = None,
+                 metadata: MetadataFilter | None = None, hybrid: bool = True, embeddings: np.ndarray | None = None,
+                 vector_index=None, ann_index=None):
+        self.df = df
+        self.version = version
+        self.lexical_index = lexical_index
+        self.metadata = metadata
+        self.hybrid = hybrid
+        self.embeddings = embeddings if embeddings is not None else np.array([])
+        self.vector_index = vector_index
+        self.ann_index = ann_index
+
+    @classmethod
+    def empty(cls) -> "RagKnowledgeBase":
+        return cls(pd.DataFrame())
+
+    @classmethod
+    def lexical(cls, df: pd.DataFrame) -> "RagKnowledgeBase":
+        """Primeira etapa: BM25 e metadados, que não dependem da API de embeddings."""
+        chunks = df['Answer_Chunk'].astype(str).tolist()
+        hashes = [content_hash(chunk) for chunk in chunks]
+        metadata = MetadataFilter(df)
+        hybrid = use_hybrid_search()
+        version = compute_rag_version(
+            hashes, EMBEDDING_MODEL, use_int8_index(), get_ann_settings(len(df)), hybrid,
+            metadata.signature() if metadata.enabled else None
+        )
+        return cls(df, version, BM25Index(chunks), metadata if metadata.enabled else None, hybrid)
+
+    def with_vectors(self, embeddings: np.ndarray) -> "RagKnowledgeBase":
+        """Segunda etapa: índice vetorial (e IVF, se configurado) a partir dos embeddings."""
+        vector_index = load_or_build_index(embeddings, get_local_path("rag", "index", self.version), quantize=use_int8_index())
+        ann_index = None
+        ann_settings = get_ann_settings(len(self.df))
+        if ann_settings:
+            n_lists, n_probe = ann_settings
+            hashes = [content_hash(chunk) for chunk in self.df['Answer_Chunk'].astype(str)]
+            store = IVFStore(os.path.dirname(get_local_path("rag", "embeddings", "ivf")))
+            ann_index = store.sync(hashes, vector_index, n_lists=n_lists or None, n_probe=n_probe)
+        return RagKnowledgeBase(self.df, self.version, self.lexical_index, self.metadata, self.hybrid,
+                                embeddings, vector_index, ann_index)
+
+    @property
+    def ready(self) -> bool:
+        return self.vector_index is not None
+
+
+class RagIndexBuilder:
+    """
+    Constrói e recarrega a base em uma thread, compartilhada pelo processo. Sem 'sheet_id',
+    usa a versão local publicada e recarrega assim que uma nova versão é publicada.
+    """
+
+    def __init__(self, sheet_id: str | None):
+        self.sheet_id = sheet_id
+        self.knowledge_base = RagKnowledgeBase.empty()
+        self.status = STATUS_PENDING
+        self.error = None
+        self.progress = (0, 0)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._built_at = None
+        self._source_stamp = None
+        self._finished = threading.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self.knowledge_base.ready
+
+    def ensure_started(self):
+        """Inicia a construção (ou a recarga periódica) se não houver uma em andamento. Não bloqueia."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            stamp = self._current_source_stamp()
+            fresh = self._built_at is not None and time.monotonic() - self._built_at < RAG_REFRESH_S
+            if fresh and stamp == self._source_stamp:
+                return
+            self._built_at = time.monotonic()
+            self._source_stamp = stamp
+            self._finished.clear()
+            self._thread = threading.Thread(target=self._run, name="rag-index-build", daemon=True)
+            self._thread.start()
+
+    def _current_source_stamp(self) -> float | None:
+        """Data de modificação do ponteiro da versão local publicada (None para a planilha)."""
+        if self.sheet_id:
+            return None
+        try:
+            return os.path.getmtime(get_local_path("rag", "corpus", CURRENT_FILE))
+        except OSError:
+            return None
+
+    def _load_df(self) -> pd.DataFrame:
+        return load_rag_sheet(self.sheet_id) if self.sheet_id else load_published_corpus()
+
+    def wait_until_ready(self, timeout: float | None = None) -> bool:
+        """Aguarda o fim da construção em andamento; retorna se a busca vetorial está disponível."""
+        self._finished.wait(timeout)
+        return self.ready
+
+    def _on_progress(self, done: int, total: int):
+        self.progress = (done, total)
+
+    def _run(self):
+        start = time.monotonic()
+        try:
+            df = self._load_df()
+            knowledge_base = RagKnowledgeBase.lexical(df)
+            if not self.ready or self.knowledge_base.version != knowledge_base.version:
+                # Numa recarga, a base anterior (com vetores) segue em uso até a nova ficar pronta.
+                if not self.ready:
+                    self.knowledge_base = knowledge_base
+                    self.status = STATUS_LEXICAL
+
+                chunks = df['Answer_Chunk'].astype(str).tolist()
+                store = EmbeddingStore(EMBEDDING_MODEL)
+                self.progress = (0, len(store.missing(chunks)))
+                embeddings = store.get_embeddings(chunks, lambda texts: embed_documents(texts, on_progress=self._on_progress))
+                self.knowledge_base = knowledge_base.with_vectors(embeddings)
+            self.status = STATUS_READY
+            self.error = None
+            logging.info(f"Base de conhecimento pronta ({len(df)} chunks, versão {self.knowledge_base.version}) em {time.monotonic() - start:.1f}s.")
+        except Exception as e:
+            self.error = str(e)
+            if not self.ready:
+                self.status = STATUS_LEXICAL if self.knowledge_base.lexical_index is not None else STATUS_ERROR
+            self._built_at = time.monotonic() - RAG_REFRESH_S + RAG_RETRY_S
+            logging.error(f"Falha ao construir a base de conhecimento RAG: {e}")
+        finally:
+            self._finished.set()
+
+
+@st.cache_resource
+def get_rag_builder(sheet_id: str | None) -> RagIndexBuilder:
+    return RagIndexBuilder(sheet_id)
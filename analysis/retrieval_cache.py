@@ -0,0 +1,91 @@
+"""
+Cache dos contextos recuperados da base de conhecimento para cada (doc_type, norma).
+
+As auditorias de um mesmo tipo de documento e norma sempre buscam os mesmos
+trechos enquanto a base não muda. O cache é identificado pela versão da base
+(hash dos chunks), então qualquer alteração na planilha RAG o invalida.
+"""
+import glob
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from AI.local_store import get_local_path
+
+
+def compute_rag_version(chunk_hashes: list[str], *settings) -> str:
+    """Versão da base: hash dos chunks e dos parâmetros que afetam a recuperação."""
+    digest = hashlib.sha1()
+    for value in settings:
+        digest.update(str(value).encode("utf-8"))
+    for h in sorted(chunk_hashes):
+        digest.update(h.encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class RetrievalContextCache:
+    """Contextos por (doc_type, norma) em memória, persistidos em um arquivo por versão da base."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._contexts = {}
+        self._warmed_versions = set()
+
+    @staticmethod
+    def _key(doc_type: str, norma: str) -> str:
+        return f"{doc_type}|{norma or ''}"
+
+    def _path(self, version: str) -> str:
+        return get_local_path("rag", "contexts", f"{version}.json")
+
+    def _activate(self, version: str):
+        """Troca para a versão informada, carregando do disco e removendo arquivos de versões antigas."""
+        if version == self._version:
+            return
+        self._version = version
+        self._contexts = {}
+        path = self._path(version)
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self._contexts = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                self._contexts = {}
+        for old_path in glob.glob(os.path.join(os.path.dirname(path), "*.json")):
+            if old_path != path:
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+
+    def get(self, version: str, doc_type: str, norma: str) -> str | None:
+        with self._lock:
+            self._activate(version)
+            return self._contexts.get(self._key(doc_type, norma))
+
+    def put(self, version: str, doc_type: str, norma: str, context: str):
+        with self._lock:
+            self._activate(version)
+            self._contexts[self._key(doc_type, norma)] = context
+            path = self._path(version)
+            tmp_path = path + ".tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self._contexts, f, ensure_ascii=False)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logging.warning(f"Não foi possível salvar o cache de contextos: {e}")
+
+    def claim_warmup(self, version: str) -> bool:
+        """Retorna True apenas para o primeiro pedido de aquecimento de cada versão no processo."""
+        with self._lock:
+            if version in self._warmed_versions:
+                return False
+            self._warmed_versions.add(version)
+            return True
+
+
+retrieval_cache = RetrievalContextCache()
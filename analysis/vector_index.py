@@ -0,0 +1,153 @@
+"""
+Índice vetorial compacto para a busca semântica da base de conhecimento.
+
+Os vetores são normalizados uma única vez e guardados em float32 (ou int8 com
+escala por linha), de modo que a similaridade de cosseno vira um único produto
+matriz-vetor. O top-k usa argpartition em vez de ordenar todos os scores. O
+arquivo salvo pode ser aberto com memmap e compartilhado entre processos.
+"""
+import glob
+import json
+import os
+import shutil
+
+import numpy as np
+
+VECTORS_FILE = "vectors.npy"
+SCALES_FILE = "scales.npy"
+META_FILE = "index.json"
+# Linhas convertidas para float32 por vez no índice int8: evita uma cópia float32 da
+# matriz inteira a cada consulta (o que anularia a economia da quantização e do memmap).
+SCORE_BLOCK_ROWS = 4096
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class VectorIndex:
+    """Busca por similaridade de cosseno em vetores pré-normalizados."""
+
+    def __init__(self, vectors: np.ndarray, scales: np.ndarray | None = None):
+        """
+        Use VectorIndex.build() ou VectorIndex.load(). 'vectors' já deve estar normalizado
+        (float32) ou quantizado (int8, com 'scales' por linha).
+        """
+        self.vectors = vectors
+        self.scales = scales
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, quantize: bool = False) -> "VectorIndex":
+        """Normaliza os embeddings e, opcionalmente, quantiza em int8 (4x menos memória)."""
+        normalized = normalize_rows(embeddings)
+        if not quantize:
+            return cls(normalized)
+        scales = np.abs(normalized).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.round(normalized / scales[:, None]).astype(np.int8)
+        return cls(quantized, scales.astype(np.float32))
+
+    @property
+    def quantized(self) -> bool:
+        return self.scales is not None
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1] if self.vectors.ndim == 2 else 0
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, VECTORS_FILE), np.ascontiguousarray(self.vectors))
+        if self.quantized:
+            np.save(os.path.join(directory, SCALES_FILE), self.scales)
+        with open(os.path.join(directory, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"size": len(self), "dim": self.dim, "quantized": self.quantized}, f)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "VectorIndex | None":
+        """Abre um índice salvo; com mmap=True os vetores ficam no cache de páginas do SO."""
+        meta_path = os.path.join(directory, META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        vectors = np.load(os.path.join(directory, VECTORS_FILE), mmap_mode="r" if mmap else None)
+        scales = np.load(os.path.join(directory, SCALES_FILE)) if meta.get("quantized") else None
+        return cls(vectors, scales)
+
+    def rows(self, indices) -> np.ndarray:
+        """Vetores normalizados (float32) das linhas informadas, desfazendo a quantização."""
+        rows = np.asarray(self.vectors[indices], dtype=np.float32)
+        if self.quantized:
+            rows = rows * self.scales[indices][:, None]
+        return rows
+
+    def scores(self, queries: np.ndarray, candidates: np.ndarray | None = None) -> np.ndarray:
+        """
+        Similaridade de cosseno entre as consultas (m, dim) e os vetores do índice.
+        'candidates' restringe o cálculo a um subconjunto de linhas.
+        """
+        queries = normalize_rows(np.atleast_2d(queries))
+        vectors = self.vectors if candidates is None else self.vectors[candidates]
+        if self.quantized:
+            scales = self.scales if candidates is None else self.scales[candidates]
+            scores = np.empty((queries.shape[0], vectors.shape[0]), dtype=np.float32)
+            for start in range(0, vectors.shape[0], SCORE_BLOCK_ROWS):
+                end = start + SCORE_BLOCK_ROWS
+                block = np.asarray(vectors[start:end], dtype=np.float32)
+                scores[:, start:end] = (queries @ block.T) * scales[start:end]
+            return scores
+        return queries @ vectors.T
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, top_k: int) -> tuple[np.ndarray, np.ndarray]:
+        top_k = min(top_k, scores.shape[1])
+        if top_k <= 0:
+            empty = np.empty((scores.shape[0], 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+        part = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+        part_scores = np.take_along_axis(scores, part, axis=1)
+        order = np.argsort(-part_scores, axis=1)
+        return np.take_along_axis(part, order, axis=1), np.take_along_axis(part_scores, order, axis=1)
+
+    def search_batch(self, queries: np.ndarray, top_k: int = 5, candidates: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """Top-k de várias consultas de uma vez. Retorna (índices, scores), ambos (m, k)."""
+        scores = self.scores(queries, candidates)
+        indices, top_scores = self._top_k(scores, top_k)
+        if candidates is not None:
+            indices = np.asarray(candidates)[indices]
+        return indices, top_scores
+
+    def search(self, query: np.ndarray, top_k: int = 5, candidates: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """Top-k de uma consulta. Retorna (índices, scores) em ordem decrescente de similaridade."""
+        indices, scores = self.search_batch(np.atleast_2d(query), top_k, candidates)
+        return indices[0], scores[0]
+
+
+def load_or_build_index(embeddings: np.ndarray, directory: str, quantize: bool = False) -> VectorIndex:
+    """
+    Abre o índice salvo em 'directory' (mapeado em memória) ou o constrói a partir dos
+    embeddings e o salva. O diretório deve identificar a versão da base.
+    """
+    index = VectorIndex.load(directory)
+    if index is not None and len(index) == len(embeddings) and index.quantized == quantize:
+        return index
+    index = VectorIndex.build(embeddings, quantize=quantize)
+    tmp_directory = f"{directory}.tmp{os.getpid()}"
+    index.save(tmp_directory)
+    shutil.rmtree(directory, ignore_errors=True)
+    try:
+        os.replace(tmp_directory, directory)
+    except OSError:
+        # Outro processo publicou o mesmo índice ao mesmo tempo.
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+    for old in glob.glob(os.path.join(os.path.dirname(directory), "*")):
+        if old != directory and not old.startswith(directory + ".tmp"):
+            shutil.rmtree(old, ignore_errors=True)
+    return VectorIndex.load(directory) or index
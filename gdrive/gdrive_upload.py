@@ -1,7 +1,9 @@
+import io
 import os
+import threading
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload, MediaIoBaseDownload
 import streamlit as st
 from gdrive.config import get_credentials_dict, GDRIVE_FOLDER_ID, GDRIVE_SHEETS_ID
 import tempfile # Importar o módulo tempfile
@@ -25,6 +27,7 @@ class GoogleDriveUploader:
             self.credentials = None
             self.drive_service = None
             self.sheets_service = None
+            self._thread_local = threading.local()
             self.initialize_services()
             self._initialized = True
 
@@ -105,6 +108,50 @@ class GoogleDriveUploader:
                 except Exception as e_remove:
                     st.error(f"Erro ao remover arquivo temporário '{temp_path}': {str(e_remove)}")
 
+    def _get_thread_drive_service(self):
+        """
+        O cliente HTTP do googleapiclient (httplib2) não é thread-safe, então cada
+        thread de trabalho recebe o seu próprio serviço do Drive.
+        """
+        service = getattr(self._thread_local, 'drive_service', None)
+        if service is None:
+            service = build('drive', 'v3', credentials=self.credentials, cache_discovery=False)
+            self._thread_local.drive_service = service
+        return service
+
+    def upload_bytes(self, file_bytes: bytes, file_name: str, mimetype: str = 'application/pdf') -> str:
+        """
+        Faz upload de um conteúdo em memória para o Google Drive. Não usa elementos de UI
+        e pode ser chamado de threads de trabalho (ex: importação em lote).
+
+        Returns:
+            str: URL de visualização do arquivo
+        """
+        file_metadata = {
+            'name': file_name,
+            'parents': [GDRIVE_FOLDER_ID]
+        }
+        media = MediaIoBaseUpload(io.BytesIO(file_bytes), mimetype=mimetype, resumable=True)
+        file = self._get_thread_drive_service().files().create(
+            body=file_metadata,
+            media_body=media,
+            fields='id,webViewLink'
+        ).execute()
+        return file.get('webViewLink')
+
+    def download_bytes(self, file_url: str) -> bytes:
+        """
+        Baixa o conteúdo de um arquivo do Drive pela URL 'webViewLink'. Não usa elementos
+        de UI e pode ser chamado de threads de trabalho (ex: reauditoria em lote).
+        """
+        file_id = file_url.split('/d/')[1].split('/')[0] if '/d/' in file_url else file_url
+        buffer = io.BytesIO()
+        downloader = MediaIoBaseDownload(buffer, self._get_thread_drive_service().files().get_media(fileId=file_id))
+        done = False
+        while not done:
+            _, done = downloader.next_chunk()
+        return buffer.getvalue()
+
     def append_data_to_sheet(self, sheet_name, data_row):
         """
         Adiciona uma nova linha de dados à planilha do Google Sheets.
@@ -47,6 +47,22 @@ class ActionPlanManager:
         Adiciona um item ao plano de ação, combinando o título e a observação
         para uma descrição completa.
         """
+        new_data = self._build_action_row(audit_run_id, company_id, doc_id, item_details)
+        return self.sheet_ops.adc_dados_aba(ACTION_PLAN_SHEET_NAME, new_data)
+
+    def add_action_items_batch(self, entries: list) -> int:
+        """
+        Adiciona vários itens ao plano de ação em uma única chamada à API.
+        'entries' é uma lista de tuplas (audit_run_id, company_id, doc_id, item_details).
+        Retorna o número de itens criados.
+        """
+        if not entries:
+            return 0
+        rows = [self._build_action_row(*entry) for entry in entries]
+        ids = self.sheet_ops.adc_dados_aba_em_lote(ACTION_PLAN_SHEET_NAME, rows)
+        return len(ids) if ids else 0
+
+    def _build_action_row(self, audit_run_id, company_id, doc_id, item_details) -> list:
         item_title = item_details.get('item_verificacao', 'Não conformidade não especificada')
         
         item_observation = item_details.get('observacao', 'Sem detalhes fornecidos.')
@@ -66,7 +82,7 @@ class ActionPlanManager:
             date.today().strftime("%d/%m/%Y"),
             ""  
         ]
-        return self.sheet_ops.adc_dados_aba(ACTION_PLAN_SHEET_NAME, new_data)
+        return new_data
 
     def update_action_item(self, item_id, updates: dict):
         if 'prazo' in updates and isinstance(updates['prazo'], date):
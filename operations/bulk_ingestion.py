@@ -0,0 +1,279 @@
+import io
+import os
+import re
+import zipfile
+import logging
+import random
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date
+
+import streamlit as st
+from fuzzywuzzy import fuzz
+
+from AI.budget import run_as_batch, BudgetExceededError
+from AI.pdf_preprocessor import extract_page_texts
+from AI.text_archive import get_text_archive
+from operations.employee import clear_analysis_error, last_analysis_error
+from gdrive.config import ASO_SHEET_NAME, TRAINING_SHEET_NAME, EPI_SHEET_NAME
+
+DEFAULT_MAX_WORKERS = 4
+MAX_WORKERS_LIMIT = 8
+EMPLOYEE_MATCH_THRESHOLD = 85
+
+BULK_DOC_TYPES = ['ASO', 'Treinamento', 'EPI']
+
+
+def get_default_max_workers() -> int:
+    """Limite de workers da importação em lote, configurável em [app_settings] 'bulk_max_workers'."""
+    try:
+        value = int(st.secrets.app_settings.get("bulk_max_workers", DEFAULT_MAX_WORKERS))
+    except Exception:
+        value = DEFAULT_MAX_WORKERS
+    return max(1, min(value, MAX_WORKERS_LIMIT))
+
+
+class InMemoryPDF(io.BytesIO):
+    """Imita o st.UploadedFile (getvalue, getbuffer, name, type) para PDFs extraídos de um ZIP."""
+
+    def __init__(self, data: bytes, name: str):
+        super().__init__(data)
+        self.name = name
+        self.type = 'application/pdf'
+
+
+def expand_uploaded_files(uploaded_files) -> list[InMemoryPDF]:
+    """Recebe os arquivos do file_uploader (PDFs e/ou ZIPs) e retorna a lista de PDFs."""
+    pdfs = []
+    for uploaded in uploaded_files or []:
+        name = uploaded.name
+        if name.lower().endswith('.zip'):
+            try:
+                with zipfile.ZipFile(io.BytesIO(uploaded.getvalue())) as archive:
+                    for entry in archive.infolist():
+                        entry_name = os.path.basename(entry.filename)
+                        if entry.is_dir() or entry.filename.startswith('__MACOSX') or not entry_name.lower().endswith('.pdf'):
+                            continue
+                        pdfs.append(InMemoryPDF(archive.read(entry), entry_name))
+            except zipfile.BadZipFile:
+                logging.warning(f"Arquivo ZIP inválido ignorado na importação em lote: {name}")
+        elif name.lower().endswith('.pdf'):
+            pdfs.append(InMemoryPDF(uploaded.getvalue(), name))
+    return pdfs
+
+
+class BulkIngestionManager:
+    """
+    Processa vários PDFs de uma vez (extração, auditoria e upload) com um pool
+    limitado de threads e grava os registros confirmados em lote na planilha.
+    """
+
+    def __init__(self, employee_manager, epi_manager, nr_analyzer, gdrive_uploader, max_workers: int | None = None):
+        self.employee_manager = employee_manager
+        self.epi_manager = epi_manager
+        self.nr_analyzer = nr_analyzer
+        self.gdrive_uploader = gdrive_uploader
+        self.max_workers = max(1, min(max_workers or get_default_max_workers(), MAX_WORKERS_LIMIT))
+
+    # ------------------------------------------------------------------ análise
+
+    def match_employee(self, employees_df, *texts) -> str | None:
+        """Associa o documento a um funcionário pelo nome no arquivo ou no conteúdo."""
+        if employees_df.empty:
+            return None
+        haystacks = [re.sub(r'[_\-.]+', ' ', str(t)).lower() for t in texts if t]
+        best_id, best_score = None, 0
+        for _, employee in employees_df.iterrows():
+            name = str(employee['nome']).lower().strip()
+            if not name:
+                continue
+            for haystack in haystacks:
+                score = fuzz.partial_ratio(name, haystack) if len(haystack) > len(name) else fuzz.token_set_ratio(name, haystack)
+                if score > best_score:
+                    best_id, best_score = employee['id'], score
+        return best_id if best_score >= EMPLOYEE_MATCH_THRESHOLD else None
+
+    def _process_file(self, pdf: InMemoryPDF, doc_type: str, employees_df) -> dict:
+        """
+        Executado nas threads de trabalho: não deve depender de elementos de UI. Os erros
+        das análises (exibidos com st.error, sem efeito nestas threads) vêm de last_analysis_error().
+        """
+        result = {
+            'arquivo': pdf.name,
+            'file': pdf,
+            'doc_type': doc_type,
+            'info': None,
+            'audit_result': None,
+            'funcionario_id': None,
+            'status': 'Erro',
+            'mensagem': ''
+        }
+        try:
+            clear_analysis_error()
+            if doc_type == 'EPI':
+                info = self.epi_manager.analyze_epi_pdf(pdf)
+            elif doc_type == 'ASO':
+                info = self.employee_manager.analyze_aso_pdf(pdf)
+            else:
+                info = self.employee_manager.analyze_training_pdf(pdf)
+
+            if not info:
+                result['mensagem'] = last_analysis_error() or "Não foi possível extrair as informações do documento."
+                return result
+            result['info'] = info
+
+            page_texts = extract_page_texts(pdf.getvalue()) or []
+            first_pages = " ".join(page_texts[:2])
+            result['funcionario_id'] = self.match_employee(
+                employees_df, info.get('nome_funcionario') if doc_type == 'EPI' else None, pdf.name, first_pages
+            )
+
+            if doc_type == 'Treinamento':
+                info['vencimento'] = self.employee_manager.calcular_vencimento_treinamento(
+                    data=info.get('data'), norma=info.get('norma'),
+                    modulo=info.get('modulo'), tipo_treinamento=info.get('tipo_treinamento')
+                )
+                if not info['vencimento']:
+                    result['mensagem'] = f"Sem regra de vencimento para a norma '{info.get('norma')}'."
+                    return result
+
+            if doc_type != 'EPI':
+                info['type'] = doc_type
+                audit_result = self.nr_analyzer.perform_initial_audit(info, pdf.getvalue())
+                result['audit_result'] = audit_result or {"summary": "Falha na Auditoria", "details": []}
+
+            result['status'] = 'Pronto'
+            if not result['funcionario_id']:
+                result['mensagem'] = "Funcionário não identificado; selecione manualmente."
+        except BudgetExceededError as e:
+            result['mensagem'] = str(e)
+        except Exception as e:
+            logging.error(f"Erro na importação em lote do arquivo '{pdf.name}': {e}", exc_info=True)
+            result['mensagem'] = f"Erro inesperado: {e}"
+        return result
+
+    def analyze_files(self, pdfs: list, doc_type: str, employees_df, on_result=None) -> list[dict]:
+        """
+        Analisa os PDFs em paralelo. 'on_result(result, done, total)' é chamado na thread
+        do script a cada arquivo concluído, permitindo atualizar a tabela ao vivo.
+        """
+        # Cria o PDFQA na thread do script, antes do pool, para as threads compartilharem o mesmo.
+        manager = self.epi_manager if doc_type == 'EPI' else self.employee_manager
+        _ = manager.pdf_analyzer
+
+        results = [None] * len(pdfs)
+        done = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # Importação em lote cede o orçamento diário de IA aos uploads interativos.
+            futures = {
+                executor.submit(run_as_batch, self._process_file, pdf, doc_type, employees_df): i
+                for i, pdf in enumerate(pdfs)
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                results[index] = future.result()
+                done += 1
+                if on_result:
+                    on_result(results[index], done, len(pdfs))
+        return results
+
+    # --------------------------------------------------------------- gravação
+
+    def _upload_name(self, result: dict) -> str:
+        info = result['info']
+        employee_name = self.employee_manager.get_employee_name(result['funcionario_id'])
+        if result['doc_type'] == 'ASO':
+            return f"ASO_{employee_name}_{info['data_aso'].strftime('%Y%m%d')}"
+        if result['doc_type'] == 'Treinamento':
+            return f"TRAINING_{employee_name}_{info['norma']}_{info['data'].strftime('%Y%m%d')}"
+        return f"EPI_{employee_name}_{date.today().strftime('%Y-%m-%d')}"
+
+    def _upload_all(self, results: list) -> dict:
+        """Faz o upload concorrente dos anexos. Retorna {índice: url}."""
+        urls = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self.gdrive_uploader.upload_bytes, r['file'].getvalue(), self._upload_name(r)): i
+                for i, r in enumerate(results)
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    urls[index] = future.result()
+                except Exception as e:
+                    logging.error(f"Falha no upload de '{results[index]['arquivo']}': {e}")
+        return urls
+
+    def commit(self, results: list, company_id: str) -> dict:
+        """
+        Grava os resultados confirmados: uploads concorrentes no Drive, uma chamada
+        de append em lote por aba e um lote único de itens do plano de ação.
+        """
+        summary = {'saved': 0, 'failed': 0, 'action_items': 0}
+        if not results:
+            return summary
+
+        urls = self._upload_all(results)
+        summary['failed'] += len(results) - len(urls)
+        archive = get_text_archive()
+
+        rows_by_sheet = {ASO_SHEET_NAME: [], TRAINING_SHEET_NAME: [], EPI_SHEET_NAME: []}
+        owners_by_sheet = {ASO_SHEET_NAME: [], TRAINING_SHEET_NAME: [], EPI_SHEET_NAME: []}
+        for index, result in enumerate(results):
+            if index not in urls:
+                continue
+            info, arquivo_id = result['info'], urls[index]
+            archive.archive_file(arquivo_id, result['file'].getvalue())
+            if result['doc_type'] == 'ASO':
+                row = self.employee_manager.build_aso_row({**info, 'funcionario_id': result['funcionario_id'], 'arquivo_id': arquivo_id})
+                rows, sheet = ([row] if row else []), ASO_SHEET_NAME
+            elif result['doc_type'] == 'Treinamento':
+                row = self.employee_manager.build_training_row({
+                    'funcionario_id': result['funcionario_id'],
+                    'data': info.get('data'),
+                    'vencimento': info.get('vencimento'),
+                    'norma': info.get('norma'),
+                    'modulo': info.get('modulo'),
+                    'status': "Válido",
+                    'anexo': arquivo_id,
+                    'tipo_treinamento': info.get('tipo_treinamento'),
+                    'carga_horaria': info.get('carga_horaria', 0)
+                })
+                rows, sheet = ([row] if row else []), TRAINING_SHEET_NAME
+            else:
+                rows, sheet = self.epi_manager.build_epi_rows(result['funcionario_id'], arquivo_id, info.get('itens_epi', [])), EPI_SHEET_NAME
+
+            if not rows:
+                summary['failed'] += 1
+                continue
+            rows_by_sheet[sheet].extend(rows)
+            owners_by_sheet[sheet].extend([result] * len(rows))
+
+        action_entries = []
+        for sheet, rows in rows_by_sheet.items():
+            if not rows:
+                continue
+            ids = self.employee_manager.sheet_ops.adc_dados_aba_em_lote(sheet, rows)
+            if not ids:
+                summary['failed'] += len({id(r) for r in owners_by_sheet[sheet]})
+                continue
+            saved_results = {}
+            for doc_id, result in zip(ids, owners_by_sheet[sheet]):
+                saved_results.setdefault(id(result), (doc_id, result))
+            summary['saved'] += len(saved_results)
+
+            for doc_id, result in saved_results.values():
+                audit_result = result.get('audit_result')
+                if not audit_result:
+                    continue
+                items = self.nr_analyzer.get_actionable_items(audit_result)
+                audit_run_id = f"audit_{doc_id}_{random.randint(1000, 9999)}"
+                for item in items:
+                    item['employee_id'] = result['funcionario_id']
+                    action_entries.append((audit_run_id, company_id, doc_id, item))
+
+        summary['action_items'] = self.nr_analyzer.action_plan_manager.add_action_items_batch(action_entries)
+
+        st.cache_data.clear()
+        self.employee_manager.load_data()
+        self.epi_manager.load_epi_data()
+        return summary
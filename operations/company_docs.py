@@ -5,6 +5,9 @@ import re
 from operations.sheet import SheetOperations
 from gdrive.config import COMPANY_DOCS_SHEET_NAME, AUDIT_RESULTS_SHEET_NAME
 from AI.api_Operation import PDFQA
+from AI.pdf_preprocessor import select_relevant_pages
+from AI.json_repair import parse_json_response
+from AI.response_schemas import COMPANY_DOC_SCHEMA
 import tempfile
 import os
 
@@ -107,33 +110,31 @@ class CompanyDocsManager:
             except ValueError: continue
         return None
 
-    def analyze_company_doc_pdf(self, pdf_file):
+    def analyze_company_doc_pdf(self, pdf_file, on_partial=None):
         try:
+            # Para identificar tipo e data basta a capa e as páginas de vigência.
+            pdf_bytes, _ = select_relevant_pages(pdf_file.getvalue(), profile='identificacao')
             with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-                temp_file.write(pdf_file.getvalue())
+                temp_file.write(pdf_bytes)
                 temp_path = temp_file.name
             
             combined_question = """
-            Por favor, analise o documento e responda as seguintes perguntas, uma por linha:
-            1. Qual o tipo deste documento? Responda 'PGR', 'PCMSO', 'PPR', 'PCA' ou 'Outro'.
-            2. Qual a data de emissão, vigência ou elaboração do documento? Responda a data no formato DD/MM/AAAA.
+            Por favor, analise o documento e responda em JSON com as chaves:
+            - "tipo_documento": o tipo deste documento, 'PGR', 'PCMSO', 'PPR', 'PCA' ou 'Outro'.
+            - "data_emissao": a data de emissão, vigência ou elaboração do documento, no formato DD/MM/AAAA.
             """
-            answer, _ = self.pdf_analyzer.answer_question([temp_path], combined_question)
+            answer, _ = self.pdf_analyzer.answer_question(
+                [temp_path], combined_question, response_schema=COMPANY_DOC_SCHEMA, doc_type='Documento da Empresa',
+                on_partial=on_partial
+            )
             os.unlink(temp_path)
             
             if not answer: return None
             
-            lines = answer.strip().split('\n')
-            results = {}
-            for line in lines:
-                match = re.match(r'\s*\*?\s*(\d+)\s*\.?\s*(.*)', line)
-                if match:
-                    key = int(match.group(1))
-                    value = match.group(2).strip()
-                    results[key] = value
+            results = parse_json_response(answer, expected=dict) or {}
 
-            doc_type_str = results.get(1, "Outro").upper()
-            data_emissao = self._parse_flexible_date(results.get(2, ''))
+            doc_type_str = str(results.get("tipo_documento") or "Outro").upper()
+            data_emissao = self._parse_flexible_date(results.get("data_emissao") or '')
 
             if not data_emissao:
                 st.error("Não foi possível extrair a data de emissão do documento.")
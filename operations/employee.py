@@ -3,12 +3,16 @@ import streamlit as st
 from datetime import datetime, timedelta, date
 from gdrive.gdrive_upload import GoogleDriveUploader
 from AI.api_Operation import PDFQA
+from AI.pdf_preprocessor import extract_page_texts
+from AI.json_repair import parse_json_response
+from AI.response_schemas import TRAINING_SCHEMA, ASO_SCHEMA
 from operations.sheet import SheetOperations
 import tempfile
 import os
 import re
 import locale
-import json  
+import logging
+import contextvars
 from dateutil.relativedelta import relativedelta
 
 
@@ -17,6 +21,66 @@ try:
 except locale.Error:
     pass
 
+# Último erro da análise de PDF no contexto atual. Nas threads da importação em lote os
+# avisos do Streamlit não aparecem, então o erro também fica em last_analysis_error().
+_analysis_error = contextvars.ContextVar('analysis_error', default=None)
+
+
+def report_analysis_error(message: str):
+    """Exibe o erro da análise de um PDF, registra no log e guarda para last_analysis_error()."""
+    logging.error(message)
+    _analysis_error.set(message)
+    st.error(message)
+
+
+def _source_label(fonte_extracao: str) -> str:
+    return "a partir da camada de texto do PDF" if fonte_extracao == 'local' else "a partir da resposta da IA"
+
+
+def clear_analysis_error():
+    _analysis_error.set(None)
+
+
+def last_analysis_error() -> str | None:
+    return _analysis_error.get()
+
+DATE_PATTERN = r'(\d{1,2}[/\-.]\d{1,2}[/\-.]\d{2,4})|(\d{1,2} de \w+ de \d{4})|(\d{4}[/\-.]\d{1,2}[/\-.]\d{1,2})'
+
+# Palavras que, logo antes de uma data, indicam a data de realização/emissão do documento.
+TRAINING_DATE_ANCHORS = r'(realizad[oa]|conclu[íi]d[oa]|emitid[oa]|emiss[ãa]o|conclus[ãa]o|data)'
+ASO_DATE_ANCHORS = r'(data do exame|data do aso|data de emiss[ãa]o|emitido em|realizado em|data)'
+ASO_EXPIRY_ANCHORS = r'(vencimento|validade|v[áa]lido at[ée]|pr[óo]ximo exame)'
+# Datas que nunca são a data do documento (ex: nascimento e admissão no ASO).
+IGNORED_DATE_ANCHORS = r'(nascimento|admiss[ãa]o|nasc\.)'
+
+TRAINING_MODULES = [
+    'Emitente', 'Requisitante', 'Resgate Técnico Industrial', 'Operador de Empilhadeira',
+    'Munck', 'Guindauto', 'Avançado II', 'Avançado I', 'Avançado', 'Intermediário',
+    'Básico', 'Supervisor', 'Trabalhador Autorizado'
+]
+# Normas cujo módulo altera as regras de validação e não pode ser presumido localmente.
+NORMAS_QUE_EXIGEM_MODULO = ['NR-33', 'PERMISSÃO DE TRABALHO (PT)']
+# Termos de cada tipo de treinamento e o rótulo que, quando presente, decide entre eles.
+TRAINING_TYPE_TERMS = {'formação': r'forma[çc][ãa]o|inicial', 'reciclagem': r'reciclagem'}
+TRAINING_TYPE_LABEL = r'(?:tipo(?:\s+de\s+treinamento)?|modalidade)\s*:\s*'
+
+# Formas aceitas de cada norma (ex: 'NR-35', 'NR 35', 'NR - 35'), usadas tanto na busca
+# local no texto do certificado quanto em _padronizar_norma.
+NR_PATTERN = r'NR\s*-?\s*(\d+)'
+BRIGADA_PATTERN = r'BRIGADA|INC[ÊE]NDIO|\bIT\s*-?\s*17\b|\bNR\s*-?\s*23\b'
+NBR_16710_PATTERN = r'NBR\s*-?\s*16710|16710|RESGATE T[ÉE]CNICO'
+PT_PATTERN = r'PERMISS[ÃA]O|\bPT\b'
+TRAINING_NORM_PATTERN = r'NR\s*-?\s*\d{1,2}\b|NBR\s*-?\s*16710|BRIGADA|IT\s*-?\s*17\b|PERMISS[ÃA]O DE TRABALHO'
+
+ASO_TYPES = {
+    'Admissional': r'admissional',
+    'Periódico': r'peri[óo]dico',
+    'Demissional': r'demissional',
+    'Mudança de Risco': r'mudan[çc]a de (risco|fun[çc][ãa]o)',
+    'Retorno ao Trabalho': r'retorno ao trabalho',
+    'Monitoramento Pontual': r'monitoramento pontual',
+}
+
 @st.cache_resource
 def get_sheet_operations():
     return SheetOperations()
@@ -30,7 +94,7 @@ class EmployeeManager:
     def _parse_flexible_date(self, date_string: str) -> date | None:
         if not date_string or date_string.lower() == 'n/a':
             return None
-        match = re.search(r'(\d{1,2}[/\-.]\d{1,2}[/\-.]\d{2,4})|(\d{1,2} de \w+ de \d{4})|(\d{4}[/\-.]\d{1,2}[/\-.]\d{1,2})', date_string, re.IGNORECASE)
+        match = re.search(DATE_PATTERN, date_string, re.IGNORECASE)
         if not match:
             return None
         clean_date_string = match.group(0).replace('.', '/')
@@ -42,6 +106,144 @@ class EmployeeManager:
                 continue
         return None
 
+    def _find_dates(self, text: str, anchors: str | None = None) -> list[date]:
+        """
+        Retorna as datas distintas do texto, na ordem em que aparecem. Se 'anchors' for
+        informado, considera apenas as datas precedidas (na mesma linha) por uma das
+        palavras-chave. Datas de nascimento/admissão são sempre ignoradas.
+        """
+        found = []
+        for match in re.finditer(DATE_PATTERN, text, re.IGNORECASE):
+            line_start = text.rfind('\n', 0, match.start()) + 1
+            prefix = text[max(line_start, match.start() - 60):match.start()]
+            if re.search(IGNORED_DATE_ANCHORS, prefix, re.IGNORECASE):
+                continue
+            if anchors and not re.search(anchors, prefix, re.IGNORECASE):
+                continue
+            parsed = self._parse_flexible_date(match.group(0))
+            if parsed and parsed not in found:
+                found.append(parsed)
+        return found
+
+    def _read_text_layer(self, pdf_bytes: bytes) -> str | None:
+        """Texto do PDF, ou None se não houver camada de texto utilizável."""
+        page_texts = extract_page_texts(pdf_bytes)
+        if not page_texts:
+            return None
+        text = "\n".join(page_texts)
+        return text if len(text.strip()) >= 80 else None
+
+    @staticmethod
+    def _find_training_type(text: str) -> str | None:
+        """
+        Identifica se o certificado é de formação ou de reciclagem. Um rótulo ("Tipo:",
+        "Modalidade:") seguido de um único termo decide; sem rótulo, vale o único termo
+        citado no texto. Sem nenhum termo é 'formação', como na regra do prompt da IA.
+        Retorna None se o texto citar os dois tipos.
+        """
+        def tipos_citados(prefixo: str) -> set:
+            return {tipo for tipo, termo in TRAINING_TYPE_TERMS.items()
+                    if re.search(rf'{prefixo}\b(?:{termo})\b', text, re.IGNORECASE)}
+
+        rotulados = tipos_citados(TRAINING_TYPE_LABEL)
+        if len(rotulados) == 1:
+            return rotulados.pop()
+        citados = tipos_citados('')
+        if len(citados) > 1:
+            return None
+        return citados.pop() if citados else 'formação'
+
+    def _extract_training_fields_locally(self, pdf_bytes: bytes) -> dict | None:
+        """
+        Tenta extrair os campos do certificado direto da camada de texto do PDF, com as
+        mesmas regras de data e de padronização de norma usadas na resposta da IA.
+        Retorna None se algum campo obrigatório estiver ausente ou ambíguo.
+        """
+        text = self._read_text_layer(pdf_bytes)
+        if not text:
+            return None
+
+        normas = set()
+        for match in re.finditer(TRAINING_NORM_PATTERN, text, re.IGNORECASE):
+            normas.add(self._padronizar_norma(match.group(0)))
+        if len(normas) != 1:
+            return None
+        norma = normas.pop()
+
+        datas = self._find_dates(text)
+        if len(datas) > 1:
+            datas = self._find_dates(text, anchors=TRAINING_DATE_ANCHORS)
+        if len(datas) != 1:
+            return None
+
+        carga = re.search(r'carga\s+hor[áa]ria(?:\s+total)?\s*(?:de|:)?\s*(\d{1,3})', text, re.IGNORECASE)
+        if not carga:
+            cargas = set(re.findall(r'\b(\d{1,3})\s*(?:h\b|hs\b|horas\b)', text, re.IGNORECASE))
+            if len(cargas) != 1:
+                return None
+            carga_horaria = int(cargas.pop())
+        else:
+            carga_horaria = int(carga.group(1))
+
+        modulos = [m for m in TRAINING_MODULES if re.search(rf'\b{m}\b', text, re.IGNORECASE)]
+        # "Avançado" casa dentro de "Avançado I"; mantém apenas o módulo mais específico.
+        modulos = [m for m in modulos if not any(m != other and other.startswith(m) for other in modulos)]
+        if len(modulos) > 1:
+            return None
+        if not modulos and norma in NORMAS_QUE_EXIGEM_MODULO:
+            return None
+
+        tipo_treinamento = self._find_training_type(text)
+        if not tipo_treinamento:
+            return None
+
+        return {
+            'norma': norma,
+            'modulo': modulos[0] if modulos else 'N/A',
+            'data_realizacao': datas[0].strftime('%d/%m/%Y'),
+            'tipo_treinamento': tipo_treinamento,
+            'carga_horaria': carga_horaria
+        }
+
+    def _extract_aso_fields_locally(self, pdf_bytes: bytes) -> dict | None:
+        """
+        Tenta extrair os campos do ASO direto da camada de texto do PDF.
+        Retorna None se data, tipo ou cargo estiverem ausentes ou ambíguos.
+        """
+        text = self._read_text_layer(pdf_bytes)
+        if not text:
+            return None
+
+        tipos = [tipo for tipo, pattern in ASO_TYPES.items() if re.search(pattern, text, re.IGNORECASE)]
+        if len(tipos) > 1:
+            # Formulários listam todos os tipos; vale apenas o que estiver marcado, ex: "(X) Periódico".
+            tipos = [
+                tipo for tipo in tipos
+                if re.search(rf'[\(\[]\s*[xX✓]\s*[\)\]]\s*{ASO_TYPES[tipo]}', text, re.IGNORECASE)
+            ]
+        if len(tipos) != 1:
+            return None
+
+        datas = self._find_dates(text, anchors=ASO_DATE_ANCHORS)
+        vencimentos = self._find_dates(text, anchors=ASO_EXPIRY_ANCHORS)
+        datas = [d for d in datas if d not in vencimentos]
+        if len(datas) != 1 or len(vencimentos) > 1:
+            return None
+
+        cargo = re.search(r'(?:cargo|fun[çc][ãa]o)\s*:\s*([^\n]+)', text, re.IGNORECASE)
+        if not cargo or not cargo.group(1).strip():
+            return None
+
+        riscos = re.search(r'riscos(?: ocupacionais)?\s*:\s*([^\n]+)', text, re.IGNORECASE)
+
+        return {
+            'data_aso': datas[0].strftime('%d/%m/%Y'),
+            'vencimento_aso': vencimentos[0].strftime('%d/%m/%Y') if vencimentos else None,
+            'riscos': riscos.group(1).strip() if riscos else "",
+            'cargo': cargo.group(1).strip(),
+            'tipo_aso': tipos[0]
+        }
+
     def __init__(self):
         self.sheet_ops = get_sheet_operations()
         if not self.initialize_sheets():
@@ -223,10 +425,18 @@ class EmployeeManager:
         
         return latest_trainings.sort_values('data', ascending=False)
 
-    def analyze_training_pdf(self, pdf_file):
+    def analyze_training_pdf(self, pdf_file, on_partial=None):
         """
-        Analisa um PDF de certificado de treinamento usando um prompt JSON estruturado para extrair informações.
+        Analisa um PDF de certificado de treinamento. Tenta primeiro a extração local pela
+        camada de texto e só consulta a IA se algum campo estiver ausente ou ambíguo.
+        O resultado registra em 'fonte_extracao' qual caminho o produziu ('local' ou 'ia').
+        'on_partial' recebe a resposta da IA em streaming (ver PDFQA.answer_question).
         """
+        local_data = self._extract_training_fields_locally(pdf_file.getvalue())
+        if local_data:
+            st.info("Dados extraídos da camada de texto do PDF, sem consulta à IA.")
+            return self._build_training_info(local_data, fonte_extracao='local')
+
         try:
             with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
                 temp_file.write(pdf_file.getvalue())
@@ -256,62 +466,79 @@ class EmployeeManager:
             }
 
             """
-            answer, _ = self.pdf_analyzer.answer_question([temp_path], structured_prompt)
+            answer, _ = self.pdf_analyzer.answer_question(
+                [temp_path], structured_prompt, response_schema=TRAINING_SCHEMA, doc_type='Treinamento',
+                on_partial=on_partial
+            )
 
         except Exception as e:
-            st.error(f"Erro ao processar o arquivo PDF de treinamento: {str(e)}")
+            report_analysis_error(f"Erro ao processar o arquivo PDF de treinamento: {str(e)}")
             return None
         finally:
             if 'temp_path' in locals() and os.path.exists(temp_path):
                 os.unlink(temp_path)
 
         if not answer:
-            st.error("A IA não retornou nenhuma resposta para o certificado de treinamento.")
+            report_analysis_error("A IA não retornou nenhuma resposta para o certificado de treinamento.")
             return None
 
         try:
-            cleaned_answer = answer.strip().replace("```json", "").replace("```", "")
-            data = json.loads(cleaned_answer)
+            data = parse_json_response(answer, expected=dict)
+            if data is None:
+                raise ValueError("JSON inválido")
+            return self._build_training_info(data, fonte_extracao='ia', answer=answer)
 
-            data_realizacao = self._parse_flexible_date(data.get('data_realizacao'))
-            norma_bruta = data.get('norma')
-            
-            if not data_realizacao or not norma_bruta:
-                st.error("Não foi possível extrair a data de realização ou a norma do certificado a partir da resposta da IA.")
-                st.code(f"Resposta recebida da IA:\n{answer}")
-                return None
-                
-            norma_padronizada = self._padronizar_norma(norma_bruta)
-            carga_horaria = int(data.get('carga_horaria', 0)) if data.get('carga_horaria') is not None else 0
-            modulo = data.get('modulo', "N/A")
-            tipo_treinamento = str(data.get('tipo_treinamento', 'formação')).lower()
-            
-            if norma_padronizada == "NR-20" and (not modulo or modulo.lower() == 'n/a'):
-                st.info("Módulo da NR-20 não encontrado, tentando inferir pela carga horária...")
-                key_ch = 'inicial_horas' if tipo_treinamento == 'formação' else 'reciclagem_horas'
-                for mod, config in self.nr20_config.items():
-                    if carga_horaria == config.get(key_ch):
-                        modulo = mod
-                        st.success(f"Módulo inferido como '{mod}' com base na carga horária de {carga_horaria}h.")
-                        break
-            
-            return {
-                'data': data_realizacao, 
-                'norma': norma_padronizada, 
-                'modulo': modulo, 
-                'tipo_treinamento': tipo_treinamento, 
-                'carga_horaria': carga_horaria
-            }
-
-        except (json.JSONDecodeError, AttributeError, TypeError, ValueError) as e:
-            st.error(f"Erro ao processar a resposta da IA para o treinamento. A resposta pode não ser um JSON válido ou os dados estão incorretos: {e}")
+        except (AttributeError, TypeError, ValueError) as e:
+            report_analysis_error(f"Erro ao processar a resposta da IA para o treinamento. A resposta pode não ser um JSON válido ou os dados estão incorretos: {e}")
             st.code(f"Resposta recebida da IA:\n{answer}")
             return None
 
-    def analyze_aso_pdf(self, pdf_file):
+    def _build_training_info(self, data: dict, fonte_extracao: str, answer: str | None = None) -> dict | None:
+        """Valida e normaliza os campos extraídos de um certificado (pela IA ou localmente)."""
+        data_realizacao = self._parse_flexible_date(data.get('data_realizacao'))
+        norma_bruta = data.get('norma')
+        
+        if not data_realizacao or not norma_bruta:
+            report_analysis_error(f"Não foi possível extrair a data de realização ou a norma do certificado {_source_label(fonte_extracao)}.")
+            if answer:
+                st.code(f"Resposta recebida da IA:\n{answer}")
+            return None
+            
+        norma_padronizada = self._padronizar_norma(norma_bruta)
+        carga_horaria = int(data.get('carga_horaria', 0)) if data.get('carga_horaria') is not None else 0
+        modulo = data.get('modulo', "N/A")
+        tipo_treinamento = str(data.get('tipo_treinamento', 'formação')).lower()
+        
+        if norma_padronizada == "NR-20" and (not modulo or modulo.lower() == 'n/a'):
+            st.info("Módulo da NR-20 não encontrado, tentando inferir pela carga horária...")
+            key_ch = 'inicial_horas' if tipo_treinamento == 'formação' else 'reciclagem_horas'
+            for mod, config in self.nr20_config.items():
+                if carga_horaria == config.get(key_ch):
+                    modulo = mod
+                    st.success(f"Módulo inferido como '{mod}' com base na carga horária de {carga_horaria}h.")
+                    break
+        
+        return {
+            'data': data_realizacao, 
+            'norma': norma_padronizada, 
+            'modulo': modulo, 
+            'tipo_treinamento': tipo_treinamento, 
+            'carga_horaria': carga_horaria,
+            'fonte_extracao': fonte_extracao
+        }
+
+    def analyze_aso_pdf(self, pdf_file, on_partial=None):
         """
-        Analisa um PDF de ASO usando um prompt JSON estruturado para extrair informações.
+        Analisa um PDF de ASO. Tenta primeiro a extração local pela camada de texto e só
+        consulta a IA se algum campo estiver ausente ou ambíguo. O resultado registra em
+        'fonte_extracao' qual caminho o produziu ('local' ou 'ia'). 'on_partial' recebe a
+        resposta da IA em streaming (ver PDFQA.answer_question).
         """
+        local_data = self._extract_aso_fields_locally(pdf_file.getvalue())
+        if local_data:
+            st.info("Dados extraídos da camada de texto do PDF, sem consulta à IA.")
+            return self._build_aso_info(local_data, fonte_extracao='local')
+
         try:
             with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
                 temp_file.write(pdf_file.getvalue())
@@ -339,55 +566,64 @@ class EmployeeManager:
             }
 
             """
-            answer, _ = self.pdf_analyzer.answer_question([temp_path], structured_prompt)
+            answer, _ = self.pdf_analyzer.answer_question(
+                [temp_path], structured_prompt, response_schema=ASO_SCHEMA, doc_type='ASO',
+                on_partial=on_partial
+            )
         
         except Exception as e:
-            st.error(f"Erro ao processar o arquivo PDF do ASO: {str(e)}")
+            report_analysis_error(f"Erro ao processar o arquivo PDF do ASO: {str(e)}")
             return None
         finally:
             if 'temp_path' in locals() and os.path.exists(temp_path):
                 os.unlink(temp_path)
 
         if not answer:
-            st.error("A IA não retornou nenhuma resposta para o ASO.")
+            report_analysis_error("A IA não retornou nenhuma resposta para o ASO.")
             return None
 
         try:
-            cleaned_answer = answer.strip().replace("```json", "").replace("```", "")
-            data = json.loads(cleaned_answer)
+            data = parse_json_response(answer, expected=dict)
+            if data is None:
+                raise ValueError("JSON inválido")
+            return self._build_aso_info(data, fonte_extracao='ia', answer=answer)
 
-            data_aso = self._parse_flexible_date(data.get('data_aso'))
-            vencimento = self._parse_flexible_date(data.get('vencimento_aso'))
-            
-            if not data_aso:
-                st.error("Não foi possível extrair a data de emissão do ASO a partir da resposta da IA.")
+        except (AttributeError, ValueError) as e:
+            report_analysis_error(f"Erro ao processar a resposta da IA para o ASO. A resposta não era um JSON válido: {e}")
+            st.code(f"Resposta recebida da IA:\n{answer}")
+            return None
+
+    def _build_aso_info(self, data: dict, fonte_extracao: str, answer: str | None = None) -> dict | None:
+        """Valida os campos extraídos de um ASO e calcula o vencimento quando não explícito."""
+        data_aso = self._parse_flexible_date(data.get('data_aso'))
+        vencimento = self._parse_flexible_date(data.get('vencimento_aso'))
+        
+        if not data_aso:
+            report_analysis_error(f"Não foi possível extrair a data de emissão do ASO {_source_label(fonte_extracao)}.")
+            if answer:
                 st.code(f"Resposta recebida da IA:\n{answer}")
-                return None
-                
-            tipo_aso = str(data.get('tipo_aso', 'Não identificado'))
-
-            if not vencimento and tipo_aso != 'Demissional':
-                st.info(f"Vencimento não encontrado explicitamente. Calculando com base no tipo '{tipo_aso}'...")
-                if tipo_aso in ['Admissional', 'Periódico', 'Mudança de Risco', 'Retorno ao Trabalho']:
-                    vencimento = data_aso + timedelta(days=365)
-                elif tipo_aso == 'Monitoramento Pontual':
-                    vencimento = data_aso + timedelta(days=180)
-                else:
-                    vencimento = data_aso + timedelta(days=365)
-                    st.warning(f"Tipo de ASO '{tipo_aso}' não mapeado para cálculo de vencimento, assumindo validade de 1 ano.")
+            return None
             
-            return {
-                'data_aso': data_aso, 
-                'vencimento': vencimento, 
-                'riscos': data.get('riscos', ""), 
-                'cargo': data.get('cargo', ""),
-                'tipo_aso': tipo_aso
-            }
+        tipo_aso = str(data.get('tipo_aso', 'Não identificado'))
 
-        except (json.JSONDecodeError, AttributeError) as e:
-            st.error(f"Erro ao processar a resposta da IA para o ASO. A resposta não era um JSON válido: {e}")
-            st.code(f"Resposta recebida da IA:\n{answer}")
-            return None
+        if not vencimento and tipo_aso != 'Demissional':
+            st.info(f"Vencimento não encontrado explicitamente. Calculando com base no tipo '{tipo_aso}'...")
+            if tipo_aso in ['Admissional', 'Periódico', 'Mudança de Risco', 'Retorno ao Trabalho']:
+                vencimento = data_aso + timedelta(days=365)
+            elif tipo_aso == 'Monitoramento Pontual':
+                vencimento = data_aso + timedelta(days=180)
+            else:
+                vencimento = data_aso + timedelta(days=365)
+                st.warning(f"Tipo de ASO '{tipo_aso}' não mapeado para cálculo de vencimento, assumindo validade de 1 ano.")
+        
+        return {
+            'data_aso': data_aso, 
+            'vencimento': vencimento, 
+            'riscos': data.get('riscos', ""), 
+            'cargo': data.get('cargo', ""),
+            'tipo_aso': tipo_aso,
+            'fonte_extracao': fonte_extracao
+        }
 
     def add_company(self, nome, cnpj):
         from gdrive.config import EMPLOYEE_SHEET_NAME
@@ -419,13 +655,12 @@ class EmployeeManager:
         except Exception as e:
             return None, f"Erro ao adicionar funcionário: {str(e)}"
 
-    def add_aso(self, aso_data: dict):
+    def build_aso_row(self, aso_data: dict) -> list | None:
         """
-        Adiciona um novo registro de ASO à planilha a partir de um dicionário.
-        Se um campo opcional não for encontrado, insere um valor padrão como "Não identificado".
+        Monta a linha da aba de ASOs a partir de um dicionário. Se um campo opcional
+        não for encontrado, usa um valor padrão como "Não identificado".
+        Retorna None se faltarem dados críticos.
         """
-        from gdrive.config import ASO_SHEET_NAME
-    
         # 1. Extrai os dados essenciais. Se faltarem, a função para.
         funcionario_id = aso_data.get('funcionario_id')
         data_aso = aso_data.get('data_aso')
@@ -458,6 +693,18 @@ class EmployeeManager:
             cargo_str,
             tipo_aso_str
         ]
+        return new_data
+
+    def add_aso(self, aso_data: dict):
+        """
+        Adiciona um novo registro de ASO à planilha a partir de um dicionário.
+        Se um campo opcional não for encontrado, insere um valor padrão como "Não identificado".
+        """
+        from gdrive.config import ASO_SHEET_NAME
+
+        new_data = self.build_aso_row(aso_data)
+        if not new_data:
+            return None
         
         try:
             aso_id = self.sheet_ops.adc_dados_aba(ASO_SHEET_NAME, new_data)
@@ -478,18 +725,18 @@ class EmployeeManager:
     
 
         # Regra 1: Brigada de Incêndio
-        if "BRIGADA" in norma_upper or "INCÊNDIO" in norma_upper or "IT-17" in norma_upper or "IT 17" in norma_upper or "NR-23" in norma_upper or "NR 23" in norma_upper:
+        if re.search(BRIGADA_PATTERN, norma_upper):
             return "BRIGADA DE INCÊNDIO"
 
         # Regra 2: NBR 16710 (Resgate Técnico)
-        if "16710" in norma_upper or "RESGATE TÉCNICO" in norma_upper:
+        if re.search(NBR_16710_PATTERN, norma_upper):
             return "NBR-16710 RESGATE TÉCNICO"
         
-        if "PERMISSÃO" in norma_upper or re.search(r'\b(PT)\b', norma_upper): 
+        if re.search(PT_PATTERN, norma_upper): 
             return "PERMISSÃO DE TRABALHO (PT)"
             
-        # Regra 4: NRs numéricas (ex: NR-10, NR 11, NR-06)
-        match = re.search(r'NR\s?-?(\d+)', norma_upper)
+        # Regra 4: NRs numéricas (ex: NR-10, NR 11, NR - 06)
+        match = re.search(NR_PATTERN, norma_upper)
         if match:
             num = int(match.group(1))
             return f"NR-{num:02d}" # Formata com zero à esquerda (ex: NR-06)
@@ -497,13 +744,11 @@ class EmployeeManager:
         return norma_upper
 
 
-    def add_training(self, training_data: dict):
+    def build_training_row(self, training_data: dict) -> list | None:
         """
-        Adiciona um novo registro de treinamento a partir de um dicionário,
-        com validação robusta e tratamento de campos opcionais.
+        Monta a linha da aba de treinamentos a partir de um dicionário, com validação
+        dos campos críticos. Retorna None se algum deles faltar.
         """
-        from gdrive.config import TRAINING_SHEET_NAME
-    
         # 1. Extrai os dados essenciais do dicionário.
         #    Esta função agora espera um dicionário com estas chaves.
         funcionario_id = training_data.get('funcionario_id')
@@ -542,6 +787,18 @@ class EmployeeManager:
             str(tipo_treinamento) if tipo_treinamento else 'Não identificado',
             str(carga_horaria) if carga_horaria is not None else '0'
         ]
+        return new_data
+
+    def add_training(self, training_data: dict):
+        """
+        Adiciona um novo registro de treinamento a partir de um dicionário,
+        com validação robusta e tratamento de campos opcionais.
+        """
+        from gdrive.config import TRAINING_SHEET_NAME
+
+        new_data = self.build_training_row(training_data)
+        if not new_data:
+            return None
         
         try:
             # A função adc_dados_aba gera o 'id' único do registro e o retorna.
@@ -1,11 +1,12 @@
 import streamlit as st
 import pandas as pd
-import json
 import tempfile
 import os
-import re
 from operations.sheet import SheetOperations
+from operations.employee import report_analysis_error
 from AI.api_Operation import PDFQA
+from AI.json_repair import parse_json_response
+from AI.response_schemas import EPI_SCHEMA
 from gdrive.config import EPI_SHEET_NAME
 
 @st.cache_resource
@@ -113,41 +114,39 @@ class EPIManager:
             }
             ```
             """
-            answer, _ = self.pdf_analyzer.answer_question([temp_path], structured_prompt)
+            answer, _ = self.pdf_analyzer.answer_question([temp_path], structured_prompt, response_schema=EPI_SCHEMA, doc_type='EPI')
 
         except Exception as e:
-            st.error(f"Erro ao processar o PDF da Ficha de EPI: {str(e)}")
+            report_analysis_error(f"Erro ao processar o PDF da Ficha de EPI: {str(e)}")
             return None
         finally:
             if 'temp_path' in locals() and os.path.exists(temp_path):
                 os.unlink(temp_path)
 
         if not answer:
-            st.error("A IA não retornou uma resposta para a Ficha de EPI.")
+            report_analysis_error("A IA não retornou uma resposta para a Ficha de EPI.")
             return None
 
         try:
-            # Limpa qualquer texto extra que o modelo possa ter adicionado
-            cleaned_answer = re.search(r'\{.*\}', answer, re.DOTALL).group(0)
-            data = json.loads(cleaned_answer)
+            # Remove texto extra e corrige JSON malformado localmente, sem nova chamada à IA
+            data = parse_json_response(answer, expected=dict)
             
-            if 'nome_funcionario' not in data or 'itens_epi' not in data:
-                st.error("O JSON retornado pela IA não contém as chaves esperadas ('nome_funcionario', 'itens_epi').")
+            if not data or 'nome_funcionario' not in data or 'itens_epi' not in data:
+                report_analysis_error("O JSON retornado pela IA não contém as chaves esperadas ('nome_funcionario', 'itens_epi').")
                 st.code(answer)
                 return None
                 
             return data
 
-        except (json.JSONDecodeError, AttributeError, TypeError) as e:
-            st.error(f"Erro ao processar a resposta da IA para a Ficha de EPI: {e}")
+        except (AttributeError, TypeError) as e:
+            report_analysis_error(f"Erro ao processar a resposta da IA para a Ficha de EPI: {e}")
             st.code(f"Resposta recebida da IA:\n{answer}")
             return None
             
-    def add_epi_records(self, funcionario_id, arquivo_id, itens_epi):
-        """Adiciona múltiplos registros de EPI a partir de uma única ficha."""
-        saved_ids = []
-        for item in itens_epi:
-            new_data = [
+    def build_epi_rows(self, funcionario_id, arquivo_id, itens_epi) -> list:
+        """Monta as linhas da aba de EPIs para os itens de uma ficha."""
+        return [
+            [
                 str(funcionario_id),
                 str(item.get('item_numero', '')),
                 str(item.get('descricao', '')),
@@ -155,6 +154,13 @@ class EPIManager:
                 str(item.get('data_entrega', '')),
                 str(arquivo_id)
             ]
+            for item in itens_epi
+        ]
+
+    def add_epi_records(self, funcionario_id, arquivo_id, itens_epi):
+        """Adiciona múltiplos registros de EPI a partir de uma única ficha."""
+        saved_ids = []
+        for item, new_data in zip(itens_epi, self.build_epi_rows(funcionario_id, arquivo_id, itens_epi)):
             try:
                 # Note que a função adc_dados_aba adiciona o ID principal automaticamente
                 new_id = self.sheet_ops.adc_dados_aba(EPI_SHEET_NAME, new_data)
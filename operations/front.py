@@ -8,8 +8,10 @@ from operations.employee import EmployeeManager
 from operations.company_docs import CompanyDocsManager
 from operations.epi import EPIManager
 from analysis.nr_analyzer import NRAnalyzer 
+from ui.rag_status import display_rag_status
 
 from gdrive.gdrive_upload import GoogleDriveUploader
+from AI.text_archive import get_text_archive
 from auth.auth_utils import check_permission, is_user_logged_in 
 from operations.matrix_manager import MatrixManager
 from ui.ui_helpers import (
@@ -20,6 +22,7 @@ from ui.ui_helpers import (
     process_company_doc_pdf,
     process_epi_pdf
 )
+from ui.bulk_ingestion import show_bulk_ingestion
 
 
 def format_company_display(company_id, companies_df):
@@ -81,6 +84,7 @@ def front_page():
         st.session_state.epi_manager = EPIManager()
     if 'nr_analyzer' not in st.session_state:
         st.session_state.nr_analyzer = NRAnalyzer()
+        st.session_state.nr_analyzer.warm_retrieval_cache(st.session_state.employee_manager.nr_config.keys())
     if 'gdrive_uploader' not in st.session_state:
         st.session_state.gdrive_uploader = GoogleDriveUploader()
     if 'matrix_manager' not in st.session_state: 
@@ -95,6 +99,7 @@ def front_page():
     
     
     st.title("Gestão de Documentação Inteligente")
+    display_rag_status(nr_analyzer)
     
     selected_company = None
     if not employee_manager.companies_df.empty:
@@ -111,8 +116,8 @@ def front_page():
             key="company_select" # Mantém a chave, se você a usa em outro lugar
         )
     
-    tab_situacao, tab_add_doc_empresa, tab_add_aso, tab_add_treinamento, tab_add_epi = st.tabs([
-        "**Situação Geral**", "**Adicionar Documento da Empresa**", "Adicionar ASO", "Adicionar Treinamento", "Adicionar Ficha de EPI"        
+    tab_situacao, tab_add_doc_empresa, tab_add_aso, tab_add_treinamento, tab_add_epi, tab_lote = st.tabs([
+        "**Situação Geral**", "**Adicionar Documento da Empresa**", "Adicionar ASO", "Adicionar Treinamento", "Adicionar Ficha de EPI", "Importação em Lote"
     ])
 
     with tab_situacao:
@@ -333,6 +338,7 @@ def front_page():
                                         arquivo_id = gdrive_uploader.upload_file(anexo_epi, f"EPI_{nome_selecionado}_{date.today().strftime('%Y-%m-%d')}")
                                         
                                         if arquivo_id:
+                                            get_text_archive().archive_file(arquivo_id, anexo_epi.getvalue())
                                             # Adiciona os registros na planilha
                                             saved_ids = epi_manager.add_epi_records(funcionario_selecionado_id, arquivo_id, epi_info['itens_epi'])
                                             
@@ -382,6 +388,7 @@ def front_page():
                                     anexo_doc = st.session_state['Doc. Empresa_anexo_para_salvar']
                                     arquivo_id = gdrive_uploader.upload_file(anexo_doc, f"{doc_info['tipo_documento']}_{company_name}_{doc_info['data_emissao'].strftime('%Y%m%d')}")
                                     if arquivo_id:
+                                        get_text_archive().archive_file(arquivo_id, anexo_doc.getvalue())
                                         doc_id = docs_manager.add_company_document(empresa_id=selected_company, tipo_documento=doc_info['tipo_documento'], data_emissao=doc_info['data_emissao'], vencimento=doc_info['vencimento'], arquivo_id=arquivo_id)
                                         if doc_id:
                                             if audit_result and audit_result.get("summary", "").lower() == 'não conforme':
@@ -415,6 +422,7 @@ def front_page():
                                 vencimento_aso = aso_info.get('vencimento')
                                 if vencimento_aso: st.success(f"**Vencimento:** {vencimento_aso.strftime('%d/%m/%Y')}")
                                 else: st.info("**Vencimento:** N/A (Ex: Demissional)")
+                                st.caption(f"Fonte da extração: {'camada de texto do PDF' if aso_info.get('fonte_extracao') == 'local' else 'IA'}")
     
                                 display_audit_results(audit_result)
     
@@ -426,6 +434,7 @@ def front_page():
                                         arquivo_id = gdrive_uploader.upload_file(anexo_aso, f"ASO_{employee_name}_{aso_info['data_aso'].strftime('%Y%m%d')}")
                                         
                                         if arquivo_id:
+                                            get_text_archive().archive_file(arquivo_id, anexo_aso.getvalue())
                                             aso_data_to_save = aso_info.copy()
                                             aso_data_to_save.pop('type', None)
                                             aso_data_to_save.pop('audit_result', None)
@@ -509,6 +518,7 @@ def front_page():
                                 st.write(f"**Módulo:** {modulo or 'N/A'}") # Mostra o módulo final
                                 st.write(f"**Tipo:** {tipo_treinamento}")
                                 st.write(f"**Carga Horária:** {carga_horaria} horas")
+                                st.caption(f"Fonte da extração: {'camada de texto do PDF' if training_info.get('fonte_extracao') == 'local' else 'IA'}")
                                 
                                 if vencimento:
                                     st.success(f"**Vencimento Calculado:** {vencimento.strftime('%d/%m/%Y')}")
@@ -528,6 +538,7 @@ def front_page():
                                         )
                                         
                                         if arquivo_id:
+                                            get_text_archive().archive_file(arquivo_id, anexo_training.getvalue())
                                             training_data_to_save = {
                                                 'funcionario_id': selected_employee_training,
                                                 'data': training_info.get('data'),
@@ -569,3 +580,12 @@ def front_page():
         else:
             st.info("Selecione uma empresa na primeira aba para adicionar um treinamento.")
 
+    with tab_lote:
+        if selected_company:
+            if check_permission(level='editor'):
+                show_bulk_ingestion(selected_company, employee_manager, epi_manager, nr_analyzer, gdrive_uploader)
+            else:
+                st.error("Você não tem permissão para realizar esta ação.")
+        else:
+            st.info("Selecione uma empresa na primeira aba para importar documentos em lote.")
+
@@ -1,10 +1,11 @@
 import streamlit as st
 import pandas as pd
 import json
-import re
 from operations.sheet import SheetOperations
 from gdrive.config import FUNCTION_SHEET_NAME, TRAINING_MATRIX_SHEET_NAME
 from AI.api_Operation import PDFQA
+from AI.json_repair import parse_json_response
+from AI.response_schemas import TRAINING_MATRIX_SCHEMA, TRAINING_RECOMMENDATIONS_SCHEMA
 from fuzzywuzzy import process 
 
 class MatrixManager:
@@ -118,15 +119,15 @@ class MatrixManager:
         **Importante:** Responda APENAS com o bloco de código JSON.
         """
         try:
-            response_text, _ = self.pdf_analyzer.answer_question([pdf_file], prompt, task_type='extraction')
+            response_text, _ = self.pdf_analyzer.answer_question(
+                [pdf_file], prompt, task_type='extraction', response_schema=TRAINING_MATRIX_SCHEMA, doc_type='Matriz de Treinamentos'
+            )
             if not response_text:
                 return None, "A IA não retornou uma resposta."
 
-            match = re.search(r'\[.*\]', response_text, re.DOTALL)
-            if not match:
+            matrix_data = parse_json_response(response_text, expected=list)
+            if matrix_data is None:
                 return None, "A resposta da IA não estava no formato JSON esperado."
-            
-            matrix_data = json.loads(match.group(0))
             return matrix_data, "Dados extraídos com sucesso."
 
         except (json.JSONDecodeError, Exception) as e:
@@ -252,6 +253,13 @@ class MatrixManager:
         Usa a busca semântica e o modelo de auditoria para gerar recomendações,
         com o prompt e a estrutura try-except corrigidos.
         """
+        return self.get_training_recommendations_for_functions([function_name], nr_analyzer)[function_name]
+
+    def get_training_recommendations_for_functions(self, function_names: list, nr_analyzer) -> dict:
+        """
+        Gera as recomendações de várias funções com chamadas concorrentes ao modelo.
+        Retorna {nome_funcao: (recomendacoes, mensagem)}.
+        """
         prompt_template = """
         **Persona:** Você é um Engenheiro de Segurança do Trabalho Sênior, especialista em criar Matrizes de Treinamento. Sua tarefa é analisar o nome de uma função e, com base nos trechos da base de conhecimento fornecidos, recomendar os treinamentos de NR obrigatórios.
     
@@ -280,41 +288,36 @@ class MatrixManager:
         ```
         **Importante:** Responda APENAS com o bloco de código JSON. Se a função não exigir treinamentos, retorne `[]`.
         """
-        
+
+        results = {}
         try:
-            query = f"Riscos, atividades e treinamentos de segurança obrigatórios para a função de {function_name}"
-            relevant_knowledge = nr_analyzer._find_semantically_relevant_chunks(query, top_k=10)
-            
-            final_prompt = prompt_template.format(
-                function_name=function_name,
-                relevant_knowledge=relevant_knowledge
+            prompts = {}
+            for function_name in function_names:
+                query = f"Riscos, atividades e treinamentos de segurança obrigatórios para a função de {function_name}"
+                relevant_knowledge = nr_analyzer._find_semantically_relevant_chunks(query, top_k=10)
+                prompts[function_name] = prompt_template.format(
+                    function_name=function_name,
+                    relevant_knowledge=relevant_knowledge
+                )
+
+            answers = self.pdf_analyzer.answer_questions(
+                [([], prompt, 'audit', TRAINING_RECOMMENDATIONS_SCHEMA, 'Recomendação de Treinamentos') for prompt in prompts.values()]
             )
-            
-            response_text, _ = self.pdf_analyzer.answer_question([], final_prompt, task_type='audit')
-            
-            if not response_text:
-                return None, "A IA não retornou uma resposta."
-    
-            # --- ESTRUTURA TRY-EXCEPT CORRIGIDA ---
-            # O parser de JSON está no seu próprio bloco try-except,
-            # que é executado apenas se a 'response_text' não for vazia.
-            try:
-                match = re.search(r'```json\s*(\[.*\])\s*```', response_text, re.DOTALL)
-                if match:
-                    json_str = match.group(1)
-                else:
-                    match = re.search(r'(\[.*\])', response_text, re.DOTALL)
-                    if match:
-                        json_str = match.group(0) # Corrigido para group(0) para pegar o JSON inteiro
-                    else:
-                        json_str = response_text
-    
-                recommendations = json.loads(json_str)
-                return recommendations, "Recomendações geradas com sucesso."
-    
-            except json.JSONDecodeError:
-                return None, f"A resposta da IA não era um JSON válido. Resposta: '{response_text}'"
-    
         except Exception as e:
-            # Este 'except' externo captura erros na chamada da API ou na busca semântica
-            return None, f"Ocorreu um erro ao obter recomendações: {e}"
+            # Captura erros na chamada da API ou na busca semântica
+            message = f"Ocorreu um erro ao obter recomendações: {e}"
+            return {function_name: (None, message) for function_name in function_names}
+
+        for function_name, (response_text, _) in zip(prompts, answers):
+            results[function_name] = self._parse_recommendations(response_text)
+        return results
+
+    def _parse_recommendations(self, response_text):
+        """Extrai a lista de recomendações (JSON) da resposta do modelo."""
+        if not response_text:
+            return None, "A IA não retornou uma resposta."
+
+        recommendations = parse_json_response(response_text, expected=list)
+        if recommendations is None:
+            return None, f"A resposta da IA não era um JSON válido. Resposta: '{response_text}'"
+        return recommendations, "Recomendações geradas com sucesso."
@@ -0,0 +1,394 @@
+"""
+Campanhas de reauditoria dos documentos já salvos.
+
+Quando a base de conhecimento (RAG) ou os checklists mudam, uma campanha seleciona
+documentos das abas 'asos', 'treinamento' e 'documentos_empresa' por filtro e os
+reaudita com perform_initial_audit, em paralelo e com prioridade de lote no
+orçamento diário de IA (AI.budget).
+
+O progresso fica em disco (uma linha por documento em progress.jsonl): cada
+resultado é gravado assim que a auditoria termina e marcado como escrito depois que
+o lote correspondente chega à planilha. Uma campanha interrompida (erro, orçamento
+esgotado ou página fechada) retoma sem repetir auditorias já feitas nem duplicar
+linhas. Cada registro guarda a versão da base de conhecimento usada.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+
+import pandas as pd
+
+from AI.budget import run_as_batch, BudgetExceededError
+from AI.local_store import get_local_path, append_jsonl, read_jsonl
+from AI.text_archive import get_text_archive
+from gdrive.config import ASO_SHEET_NAME, TRAINING_SHEET_NAME, COMPANY_DOCS_SHEET_NAME, AUDIT_RESULTS_SHEET_NAME
+from operations.bulk_ingestion import get_default_max_workers, MAX_WORKERS_LIMIT
+
+CAMPAIGN_DOC_TYPES = {
+    'ASO': ASO_SHEET_NAME,
+    'Treinamento': TRAINING_SHEET_NAME,
+    'Doc. Empresa': COMPANY_DOCS_SHEET_NAME,
+}
+DATE_COLUMNS = {'ASO': 'data_aso', 'Treinamento': 'data', 'Doc. Empresa': 'data_emissao'}
+# Tipos cujo checklist tem as assinaturas como itens críticos: auditados sempre pelo PDF,
+# já que o texto arquivado não mostra assinaturas.
+SIGNATURE_CRITICAL_TYPES = ('ASO', 'Treinamento')
+
+# Resultados acumulados antes de cada gravação em lote na planilha.
+DEFAULT_WRITE_BATCH = 20
+# Tempo máximo de espera pela base de conhecimento completa antes de começar.
+RAG_READY_TIMEOUT_S = 600
+
+STATUS_AUDITED = 'auditado'
+# Linhas já na aba de auditorias, itens do plano de ação ainda pendentes.
+STATUS_ROWS_WRITTEN = 'acoes_pendentes'
+STATUS_WRITTEN = 'gravado'
+STATUS_FAILED = 'falhou'
+
+CAMPAIGN_FILE = "campaign.json"
+PROGRESS_FILE = "progress.jsonl"
+
+
+def _campaigns_dir() -> str:
+    return os.path.dirname(get_local_path("reaudit", "campaigns", CAMPAIGN_FILE))
+
+
+@dataclass
+class CampaignFilters:
+    doc_types: list = field(default_factory=lambda: list(CAMPAIGN_DOC_TYPES))
+    company_ids: list = field(default_factory=list)
+    date_from: str | None = None  # ISO (AAAA-MM-DD), inclusive
+    date_to: str | None = None
+    normas: list = field(default_factory=list)  # Norma do treinamento ou tipo do documento da empresa
+    skip_current_version: bool = True
+
+
+class ReauditCampaign:
+    """Configuração e checkpoint de uma campanha, em reaudit/campaigns/<id>/."""
+
+    def __init__(self, campaign_id: str, manifest: dict):
+        self.id = campaign_id
+        self.manifest = manifest
+        self.directory = os.path.join(_campaigns_dir(), campaign_id)
+        self.progress_path = os.path.join(self.directory, PROGRESS_FILE)
+        self._lock = threading.Lock()
+        self.progress = {}
+        for entry in read_jsonl(self.progress_path):
+            self.progress[entry['key']] = entry
+
+    @property
+    def filters(self) -> CampaignFilters:
+        return CampaignFilters(**self.manifest['filters'])
+
+    @classmethod
+    def create(cls, filters: CampaignFilters, name: str = "") -> "ReauditCampaign":
+        campaign_id = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+        manifest = {
+            'id': campaign_id,
+            'name': name or campaign_id,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'filters': asdict(filters),
+            'targets': [],
+        }
+        campaign = cls(campaign_id, manifest)
+        os.makedirs(campaign.directory, exist_ok=True)
+        campaign.save_manifest()
+        return campaign
+
+    @classmethod
+    def load(cls, campaign_id: str) -> "ReauditCampaign":
+        with open(os.path.join(_campaigns_dir(), campaign_id, CAMPAIGN_FILE), encoding="utf-8") as f:
+            return cls(campaign_id, json.load(f))
+
+    @classmethod
+    def list_all(cls) -> list["ReauditCampaign"]:
+        campaigns = []
+        for campaign_id in sorted(os.listdir(_campaigns_dir()), reverse=True):
+            try:
+                campaigns.append(cls.load(campaign_id))
+            except (OSError, json.JSONDecodeError, KeyError):
+                continue
+        return campaigns
+
+    def save_manifest(self):
+        path = os.path.join(self.directory, CAMPAIGN_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2, default=str)
+        os.replace(path + ".tmp", path)
+
+    def record(self, key: str, status: str, **data):
+        entry = {'key': key, 'status': status, 'at': datetime.now().isoformat(timespec='seconds'), **data}
+        with self._lock:
+            previous = self.progress.get(key, {})
+            # Depois de gravado na planilha, o resultado não precisa mais ficar no checkpoint.
+            self.progress[key] = {**previous, **entry}
+            if status == STATUS_WRITTEN:
+                self.progress[key].pop('audit_result', None)
+        append_jsonl(self.progress_path, self.progress[key])
+
+    def counts(self) -> dict:
+        statuses = [entry['status'] for entry in self.progress.values()]
+        total = len(self.manifest.get('targets', []))
+        written = statuses.count(STATUS_WRITTEN)
+        return {
+            'total': total,
+            'gravados': written,
+            'auditados': statuses.count(STATUS_AUDITED) + statuses.count(STATUS_ROWS_WRITTEN),
+            'falhas': statuses.count(STATUS_FAILED),
+            'pendentes': total - written,
+        }
+
+
+def load_audited_versions() -> dict:
+    """{chave do documento: versão da base} da reauditoria gravada mais recente de cada documento."""
+    versions = {}
+    for campaign in ReauditCampaign.list_all():
+        for key, entry in campaign.progress.items():
+            if entry['status'] == STATUS_WRITTEN and entry.get('kb_version'):
+                if key not in versions or entry['at'] > versions[key][0]:
+                    versions[key] = (entry['at'], entry['kb_version'])
+    return {key: version for key, (_, version) in versions.items()}
+
+
+class ReauditRunner:
+    """Seleciona os documentos de uma campanha, reaudita em paralelo e grava em lote."""
+
+    def __init__(self, employee_manager, docs_manager, nr_analyzer, gdrive_uploader,
+                 max_workers: int | None = None, write_batch: int = DEFAULT_WRITE_BATCH):
+        self.employee_manager = employee_manager
+        self.docs_manager = docs_manager
+        self.nr_analyzer = nr_analyzer
+        self.gdrive_uploader = gdrive_uploader
+        self.max_workers = max(1, min(max_workers or get_default_max_workers(), MAX_WORKERS_LIMIT))
+        self.write_batch = max(1, write_batch)
+
+    # ------------------------------------------------------------ seleção
+
+    def _frame(self, doc_type: str) -> pd.DataFrame:
+        if doc_type == 'ASO':
+            return self.employee_manager.aso_df
+        if doc_type == 'Treinamento':
+            return self.employee_manager.training_df
+        return self.docs_manager.docs_df
+
+    def select_documents(self, filters: CampaignFilters) -> list[dict]:
+        """Documentos que atendem aos filtros, como dicionários serializáveis no checkpoint."""
+        employees = self.employee_manager.employees_df
+        company_by_employee = dict(zip(employees['id'], employees['empresa_id'])) if not employees.empty else {}
+        normas = {str(n).strip().upper() for n in filters.normas if str(n).strip()}
+        audited_versions = load_audited_versions() if filters.skip_current_version else {}
+        current_version = self.nr_analyzer.rag_version
+
+        targets = []
+        for doc_type in filters.doc_types:
+            df = self._frame(doc_type)
+            if df is None or df.empty or 'arquivo_id' not in df.columns:
+                continue
+            df = df[df['arquivo_id'].astype(str).str.strip() != '']
+            if filters.date_from or filters.date_to:
+                if DATE_COLUMNS[doc_type] not in df.columns:
+                    logging.warning(f"Coluna '{DATE_COLUMNS[doc_type]}' ausente em {CAMPAIGN_DOC_TYPES[doc_type]}; "
+                                    f"documentos do tipo '{doc_type}' ficam fora da campanha filtrada por data.")
+                    continue
+                dates = pd.to_datetime(df[DATE_COLUMNS[doc_type]], format='%d/%m/%Y', errors='coerce')
+                mask = dates.notna()
+                if filters.date_from:
+                    mask &= dates >= pd.Timestamp(filters.date_from)
+                if filters.date_to:
+                    mask &= dates <= pd.Timestamp(filters.date_to)
+                df = df[mask]
+
+            for _, row in df.iterrows():
+                if doc_type == 'Doc. Empresa':
+                    employee_id, company_id = None, str(row.get('empresa_id', ''))
+                    norma, label = "", str(row.get('tipo_documento', ''))
+                else:
+                    employee_id = str(row.get('funcionario_id', ''))
+                    company_id = str(company_by_employee.get(employee_id, ''))
+                    norma = str(row.get('norma', '')) if doc_type == 'Treinamento' else ""
+                    label = norma
+                if filters.company_ids and company_id not in filters.company_ids:
+                    continue
+                if normas and doc_type != 'ASO' and label.strip().upper() not in normas:
+                    continue
+                key = f"{doc_type}:{row['id']}"
+                if current_version and audited_versions.get(key) == current_version:
+                    continue
+                targets.append({
+                    'key': key, 'doc_type': doc_type, 'doc_id': str(row['id']),
+                    'company_id': company_id, 'employee_id': employee_id, 'norma': norma,
+                    'tipo_documento': label if doc_type == 'Doc. Empresa' else "",
+                    'arquivo_id': str(row['arquivo_id']),
+                })
+        return targets
+
+    def prepare(self, campaign: ReauditCampaign) -> list[dict]:
+        """Fixa a lista de documentos na primeira execução; nas retomadas, reutiliza a mesma."""
+        if not campaign.manifest.get('targets'):
+            campaign.manifest['targets'] = self.select_documents(campaign.filters)
+            campaign.save_manifest()
+        return campaign.manifest['targets']
+
+    # ------------------------------------------------------------ auditoria
+
+    def _audit_one(self, target: dict) -> dict:
+        """Executado nas threads de trabalho: não deve depender de elementos de UI."""
+        archive = get_text_archive()
+        archived = archive.get_for_file(target['arquivo_id'])
+        file_content = None
+        if target['doc_type'] in SIGNATURE_CRITICAL_TYPES or archived is None or not archived.has_text_layer:
+            file_content = self.gdrive_uploader.download_bytes(target['arquivo_id'])
+            archived = archive.archive_file(target['arquivo_id'], file_content)
+            if target['doc_type'] in SIGNATURE_CRITICAL_TYPES:
+                archived = None
+
+        doc_info = {'type': target['doc_type']}
+        if target['norma']:
+            doc_info['norma'] = target['norma']
+        if target['tipo_documento']:
+            doc_info['tipo_documento'] = target['tipo_documento']
+        kb_version = self.nr_analyzer.rag_version
+        audit_result = self.nr_analyzer.perform_initial_audit(doc_info, file_content, archived=archived)
+        return {'audit_result': audit_result, 'kb_version': kb_version}
+
+    # ------------------------------------------------------------ gravação
+
+    def _audit_rows(self, target: dict, audit_result: dict, audit_run_id: str, kb_version: str | None,
+                    campaign: ReauditCampaign) -> list:
+        audited_at = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+        norma = target['norma'] or target['tipo_documento'] or "N/A"
+        rows = []
+        for detail in audit_result.get('details', []):
+            observacao = detail.get('observacao', '')
+            if 'resumo' in detail.get('item_verificacao', '').lower():
+                observacao = f"{observacao}\n[Reauditoria {campaign.manifest['name']}; base de conhecimento {kb_version or 'N/A'}]"
+            rows.append([
+                audit_run_id, audited_at, target['company_id'], target['doc_id'], target['employee_id'] or 'N/A',
+                target['doc_type'], norma, detail.get('item_verificacao', ''), detail.get('status', ''), observacao
+            ])
+        return rows
+
+    def _flush(self, campaign: ReauditCampaign, pending: list) -> int:
+        """
+        Grava um lote de resultados: uma chamada para a aba de auditorias e uma para o plano
+        de ação. Cada etapa concluída fica no checkpoint, então uma nova tentativa não duplica
+        as linhas de auditoria já gravadas. Levanta RuntimeError se alguma gravação falhar.
+        """
+        entries = [(target, campaign.progress[target['key']]) for target, _ in pending]
+        audit_rows, new_rows, run_ids = [], [], {}
+        for target, entry in entries:
+            if entry['status'] == STATUS_ROWS_WRITTEN:
+                run_ids[target['key']] = entry['audit_run_id']
+                continue
+            audit_run_id = f"reaudit_{target['doc_id']}_{random.randint(1000, 9999)}"
+            run_ids[target['key']] = audit_run_id
+            audit_rows.extend(self._audit_rows(target, entry['audit_result'], audit_run_id, entry.get('kb_version'), campaign))
+            new_rows.append(target)
+
+        if audit_rows and not self.docs_manager.sheet_ops.adc_dados_aba_em_lote(AUDIT_RESULTS_SHEET_NAME, audit_rows):
+            raise RuntimeError("Falha ao gravar o lote de resultados na aba de auditorias.")
+        for target in new_rows:
+            campaign.record(target['key'], STATUS_ROWS_WRITTEN, audit_run_id=run_ids[target['key']])
+
+        action_entries = []
+        for target, entry in entries:
+            for item in self.nr_analyzer.get_actionable_items(entry['audit_result']):
+                item['employee_id'] = target['employee_id'] or 'N/A'
+                action_entries.append((run_ids[target['key']], target['company_id'], target['doc_id'], item))
+        created = self.nr_analyzer.action_plan_manager.add_action_items_batch(action_entries)
+        if created < len(action_entries):
+            raise RuntimeError(
+                f"Falha ao gravar os itens do plano de ação ({created} de {len(action_entries)}); "
+                f"as auditorias já gravadas terão os itens enviados na retomada."
+            )
+        for target, entry in entries:
+            campaign.record(target['key'], STATUS_WRITTEN, kb_version=entry.get('kb_version'))
+        return created
+
+    def run(self, campaign: ReauditCampaign, on_progress=None) -> dict:
+        """
+        Executa (ou retoma) a campanha. 'on_progress(counts)' é chamado na thread do script
+        a cada documento. Retorna o resumo com 'stopped_reason' se a campanha parou antes do fim.
+        """
+        targets = self.prepare(campaign)
+        summary = {'audited': 0, 'written': 0, 'failed': 0, 'action_items': 0, 'stopped_reason': None}
+        rag_builder = self.nr_analyzer.rag_builder
+        if rag_builder is None:
+            logging.warning("Reauditoria iniciada sem base de conhecimento configurada.")
+        elif not rag_builder.wait_until_ready(RAG_READY_TIMEOUT_S):
+            logging.warning("Reauditoria iniciada sem a busca vetorial da base de conhecimento pronta.")
+
+        # Resultados já auditados numa execução anterior entram direto no próximo lote.
+        done_statuses = (STATUS_AUDITED, STATUS_ROWS_WRITTEN, STATUS_WRITTEN)
+        pending = [(t, campaign.progress[t['key']]) for t in targets
+                   if campaign.progress.get(t['key'], {}).get('status') in (STATUS_AUDITED, STATUS_ROWS_WRITTEN)]
+        to_audit = [t for t in targets
+                    if campaign.progress.get(t['key'], {}).get('status') not in done_statuses]
+
+        futures = {}
+
+        def stop(reason: str):
+            # Cancela o que ainda não começou; as auditorias em andamento terminam e
+            # são registradas no checkpoint, para não pagar de novo por elas na retomada.
+            if not summary['stopped_reason']:
+                summary['stopped_reason'] = reason
+                for other in futures:
+                    other.cancel()
+
+        write_failed = False
+
+        def flush():
+            nonlocal pending, write_failed
+            if not pending or write_failed:
+                return
+            try:
+                summary['action_items'] += self._flush(campaign, pending)
+            except Exception as e:
+                # O checkpoint mantém os resultados pendentes; a retomada grava o que faltou.
+                logging.error(f"Falha ao gravar o lote da reauditoria: {e}")
+                write_failed = True
+                stop(f"Falha ao gravar os resultados na planilha: {e}")
+                return
+            summary['written'] += len(pending)
+            pending = []
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures.update({executor.submit(run_as_batch, self._audit_one, target): target for target in to_audit})
+            for future in as_completed(futures):
+                if future.cancelled():
+                    continue
+                target = futures[future]
+                try:
+                    result = future.result()
+                except BudgetExceededError as e:
+                    stop(str(e))
+                    continue
+                except Exception as e:
+                    logging.error(f"Reauditoria de {target['key']} falhou: {e}")
+                    campaign.record(target['key'], STATUS_FAILED, error=str(e))
+                    summary['failed'] += 1
+                    continue
+
+                if not result['audit_result']:
+                    campaign.record(target['key'], STATUS_FAILED, error="Auditoria sem resposta da IA.")
+                    summary['failed'] += 1
+                else:
+                    campaign.record(target['key'], STATUS_AUDITED, **result)
+                    pending.append((target, campaign.progress[target['key']]))
+                    summary['audited'] += 1
+                    if len(pending) >= self.write_batch:
+                        flush()
+                if on_progress:
+                    on_progress(campaign.counts())
+        flush()
+        if on_progress:
+            on_progress(campaign.counts())
+        campaign.manifest['last_run'] = {**summary, 'finished_at': datetime.now().isoformat(timespec='seconds')}
+        campaign.save_manifest()
+        return summary
@@ -184,7 +184,8 @@ class SheetOperations:
     def adc_dados_aba_em_lote(self, aba_name: str, new_data_list: list):
         """
         Adiciona múltiplas linhas de dados a uma aba de uma vez.
-        O Google Sheets adiciona os IDs automaticamente se a primeira coluna for 'id'.
+        Gera um ID único para cada linha e retorna a lista de IDs, na mesma ordem
+        de 'new_data_list' (ou False em caso de erro).
         """
         worksheet = self._get_worksheet(aba_name)
         if not worksheet: return None
@@ -204,9 +205,10 @@ class SheetOperations:
                 rows_to_append.append([new_id] + row_data)
             
             worksheet.append_rows(rows_to_append, value_input_option='USER_ENTERED')
+            st.cache_data.clear()
             
             logging.info(f"{len(rows_to_append)} linhas adicionadas com sucesso.")
-            return True
+            return [row[0] for row in rows_to_append]
     
         except Exception as e:
             logging.error(f"Erro ao adicionar dados em lote na aba '{aba_name}': {e}", exc_info=True)
@@ -6,7 +6,11 @@ import collections.abc
 from operations.employee import EmployeeManager
 from operations.matrix_manager import MatrixManager
 from ui.metrics import display_minimalist_metrics
+from ui.ai_telemetry import display_ai_telemetry
+from ui.reaudit_campaign import show_reaudit_campaigns
 from analysis.nr_analyzer import NRAnalyzer 
+from operations.company_docs import CompanyDocsManager
+from gdrive.gdrive_upload import GoogleDriveUploader
 from auth.auth_utils import check_permission, is_user_logged_in
 
 st.set_page_config(page_title="Administração", page_icon="⚙️", layout="wide")
@@ -25,18 +29,18 @@ if not check_permission(level='admin'):
 @st.cache_resource
 def get_admin_managers():
     """Instancia os gerenciadores necessários para a página de Administração."""
-    return EmployeeManager(), MatrixManager(), NRAnalyzer()
+    return EmployeeManager(), MatrixManager(), NRAnalyzer(), CompanyDocsManager(), GoogleDriveUploader()
 
-employee_manager, matrix_manager, nr_analyzer = get_admin_managers()
+employee_manager, matrix_manager, nr_analyzer, docs_manager, gdrive_uploader = get_admin_managers()
 
 # --- Exibição das Métricas ---
 st.header("Visão Geral das Pendências")
 display_minimalist_metrics(employee_manager)
 
 # --- UI com Abas para Cadastro ---
-tab_empresa, tab_funcionario, tab_matriz, tab_recomendacoes = st.tabs([
+tab_empresa, tab_funcionario, tab_matriz, tab_recomendacoes, tab_telemetria, tab_reauditoria = st.tabs([
     "Cadastrar Empresa", "Cadastrar Funcionário", 
-    "Gerenciar Matriz Manualmente", "Assistente de Matriz (IA)" 
+    "Gerenciar Matriz Manualmente", "Assistente de Matriz (IA)", "Telemetria da IA", "Reauditoria"
 ])
 
 # --- ABA DE CADASTRO DE EMPRESA ---
@@ -399,3 +403,9 @@ with tab_recomendacoes:
                         st.rerun()
                     else:
                         st.error(message)
+
+with tab_telemetria:
+    display_ai_telemetry()
+
+with tab_reauditoria:
+    show_reaudit_campaigns(employee_manager, docs_manager, nr_analyzer, gdrive_uploader)
@@ -0,0 +1,16 @@
+from AI.json_repair import parse_json_response, repair_json
+
+
+def test_bare_accented_words_do_not_raise():
+    assert parse_json_response('{"a": ótimo}') is None
+    assert parse_json_response('{"parecer_final": Não Conforme}', expected=dict) is None
+    assert repair_json('{"a": ótimo') == '{"a": ótimo}'
+
+
+def test_python_literals_are_still_repaired():
+    assert parse_json_response('{"ok": True, "valor": None,}') == {"ok": True, "valor": None}
+
+
+def test_accented_text_inside_strings_is_preserved():
+    data = parse_json_response('```json\n{"parecer_final": "Não Conforme", "itens": ["ótimo",\n```', expected=dict)
+    assert data == {"parecer_final": "Não Conforme", "itens": ["ótimo"]}
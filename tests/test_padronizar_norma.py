@@ -0,0 +1,38 @@
+import re
+
+import pytest
+
+from operations.employee import EmployeeManager, TRAINING_NORM_PATTERN
+
+
+@pytest.mark.parametrize("bruta, esperada", [
+    ("NR-35", "NR-35"),
+    ("NR 35", "NR-35"),
+    ("NR - 35", "NR-35"),
+    ("nr-6", "NR-06"),
+    ("NR - 23", "BRIGADA DE INCÊNDIO"),
+    ("IT - 17", "BRIGADA DE INCÊNDIO"),
+    ("NBR - 16710", "NBR-16710 RESGATE TÉCNICO"),
+    ("PERMISSAO DE TRABALHO", "PERMISSÃO DE TRABALHO (PT)"),
+])
+def test_padronizar_norma_accepts_local_forms(bruta, esperada):
+    assert EmployeeManager._padronizar_norma(None, bruta) == esperada
+
+
+def test_local_matches_are_normalized():
+    text = "Certificamos a conclusão do treinamento NR - 35 Trabalho em Altura"
+    normas = {EmployeeManager._padronizar_norma(None, m.group(0))
+              for m in re.finditer(TRAINING_NORM_PATTERN, text, re.IGNORECASE)}
+    assert normas == {"NR-35"}
+
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("Certificado de conclusão do treinamento NR-35", "formação"),
+    ("Treinamento de reciclagem NR-35 Trabalho em Altura", "reciclagem"),
+    ("Treinamento inicial NR-10", "formação"),
+    ("Tipo: Reciclagem\nCarga horária da formação: 40h; reciclagem: 8h", "reciclagem"),
+    ("Modalidade: Formação inicial\nA reciclagem deve ser feita a cada 2 anos", "formação"),
+    ("Carga horária da formação: 40h; reciclagem: 8h", None),
+])
+def test_find_training_type_only_decides_when_unambiguous(texto, esperado):
+    assert EmployeeManager._find_training_type(texto) == esperado
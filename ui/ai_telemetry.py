@@ -0,0 +1,75 @@
+import streamlit as st
+
+from AI.budget import get_budget_governor
+from AI.telemetry import load_telemetry, summarize_latency, daily_tokens_by_doc_type
+
+
+@st.cache_data(ttl=60)
+def _load_telemetry_cached(days: int):
+    return load_telemetry(days)
+
+
+def _format_int(value: int) -> str:
+    return f"{int(value):,}".replace(",", ".")
+
+
+def display_ai_budget():
+    """Consumo do orçamento diário de IA (AI.budget) por escopo, reservas e fila."""
+    st.subheader("Orçamento diário de IA")
+    snapshot = get_budget_governor().snapshot()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Na fila (interativas)", snapshot['fila_interativa'])
+    col2.metric("Na fila (lote)", snapshot['fila_lote'])
+    col3.metric("Recusadas hoje", snapshot['recusadas'])
+
+    for scope in snapshot['escopos']:
+        limits = [(scope['tokens'], scope['limite_tokens'], "tokens"), (scope['chamadas'], scope['limite_chamadas'], "chamadas")]
+        for used, limit, unit in limits:
+            if not limit:
+                continue
+            st.progress(
+                min(used / limit, 1.0),
+                text=f"{scope['escopo']}: {_format_int(used)} de {_format_int(limit)} {unit}"
+                     f" (lote até {snapshot['soft_ratio']:.0%})"
+            )
+    st.dataframe(snapshot['escopos'], hide_index=True, use_container_width=True)
+    if not any(scope['limite_tokens'] or scope['limite_chamadas'] for scope in snapshot['escopos']):
+        st.caption("Nenhum limite configurado ([app_settings] 'ai_daily_token_limit', 'ai_daily_call_limit' e variantes por tarefa).")
+
+
+def display_ai_telemetry():
+    """Painel de telemetria das chamadas de IA (latência, tokens, erros e cache)."""
+    st.header("📈 Telemetria das Chamadas de IA")
+
+    display_ai_budget()
+
+    days = st.select_slider("Período (dias)", options=[1, 7, 15, 30, 90], value=7, key="telemetry_days")
+    df = _load_telemetry_cached(days)
+
+    if df.empty:
+        st.info("Nenhuma chamada de IA registrada no período.")
+        return
+
+    ok_calls = df[df['outcome'] == 'ok']
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Chamadas", len(df))
+    col2.metric("Latência p50", f"{ok_calls['latency_s'].quantile(0.5):.1f}s" if not ok_calls.empty else "N/A")
+    col3.metric("Latência p95", f"{ok_calls['latency_s'].quantile(0.95):.1f}s" if not ok_calls.empty else "N/A")
+    col4.metric("Tokens", f"{int(df['total_tokens'].sum()):,}".replace(",", "."))
+
+    st.subheader("Tokens por dia e tipo de documento")
+    daily = daily_tokens_by_doc_type(df)
+    st.bar_chart(daily)
+    st.dataframe(daily, use_container_width=True)
+
+    st.subheader("Latência por tipo de documento")
+    st.dataframe(summarize_latency(df, by='doc_type'), use_container_width=True)
+
+    st.subheader("Latência por tarefa e modelo")
+    st.dataframe(summarize_latency(df, by=['task_type', 'model']), use_container_width=True)
+
+    with st.expander("Últimas chamadas"):
+        st.dataframe(
+            df.sort_values('timestamp', ascending=False).head(200).drop(columns=['date']),
+            hide_index=True, use_container_width=True
+        )
@@ -0,0 +1,141 @@
+import streamlit as st
+import pandas as pd
+
+from operations.bulk_ingestion import (
+    BulkIngestionManager,
+    BULK_DOC_TYPES,
+    MAX_WORKERS_LIMIT,
+    expand_uploaded_files,
+    get_default_max_workers
+)
+
+
+def _employee_labels(employees: pd.DataFrame) -> dict:
+    """Rótulo de cada funcionário na tabela de revisão; nomes repetidos levam o ID para não se confundirem."""
+    repeated = set(employees['nome'][employees['nome'].duplicated()])
+    return {
+        str(emp_id): f"{nome} (ID {emp_id})" if nome in repeated else nome
+        for emp_id, nome in zip(employees['id'], employees['nome'])
+    }
+
+
+def _result_to_row(result: dict, employee_labels: dict) -> dict:
+    """Converte o resultado do processamento em uma linha da tabela de revisão."""
+    info = result.get('info') or {}
+    audit_result = result.get('audit_result') or {}
+    if result['doc_type'] == 'ASO':
+        resumo = f"{info.get('tipo_aso', '')} - {info['data_aso'].strftime('%d/%m/%Y')}" if info.get('data_aso') else ""
+    elif result['doc_type'] == 'Treinamento':
+        resumo = f"{info.get('norma', '')} {info.get('modulo', '') or ''} - {info['data'].strftime('%d/%m/%Y')}" if info.get('data') else ""
+    else:
+        resumo = f"{len(info.get('itens_epi', []))} item(ns) de EPI" if info else ""
+
+    return {
+        'confirmar': result['status'] == 'Pronto' and bool(result.get('funcionario_id')),
+        'arquivo': result['arquivo'],
+        'status': result['status'],
+        'funcionario': employee_labels.get(str(result['funcionario_id'])) if result.get('funcionario_id') else None,
+        'resumo': resumo,
+        'parecer': audit_result.get('summary', 'N/A'),
+        'fonte_extracao': info.get('fonte_extracao', 'ia') if info else '',
+        'mensagem': result.get('mensagem', '')
+    }
+
+
+def show_bulk_ingestion(selected_company, employee_manager, epi_manager, nr_analyzer, gdrive_uploader):
+    """Aba de importação em lote de ASOs, Treinamentos e Fichas de EPI."""
+    st.subheader("Importação em Lote")
+    st.info("Envie vários PDFs ou um arquivo ZIP. Os documentos são analisados e auditados em paralelo; revise a tabela e confirme as linhas que deseja salvar.")
+
+    current_employees = employee_manager.get_employees_by_company(selected_company)
+    if current_employees.empty:
+        st.warning("Cadastre funcionários nesta empresa primeiro.")
+        return
+    employee_labels = _employee_labels(current_employees)
+
+    col1, col2 = st.columns([2, 1])
+    doc_type = col1.radio("Tipo de documento", BULK_DOC_TYPES, horizontal=True, key="bulk_doc_type")
+    max_workers = col2.slider("Processamentos simultâneos", 1, MAX_WORKERS_LIMIT, get_default_max_workers(), key="bulk_max_workers")
+
+    uploaded_files = st.file_uploader(
+        "Anexar PDFs ou ZIP", type=['pdf', 'zip'], accept_multiple_files=True, key="bulk_uploader"
+    )
+
+    manager = BulkIngestionManager(employee_manager, epi_manager, nr_analyzer, gdrive_uploader, max_workers=max_workers)
+
+    if uploaded_files and st.button("Processar Arquivos", type="primary"):
+        pdfs = expand_uploaded_files(uploaded_files)
+        if not pdfs:
+            st.error("Nenhum PDF encontrado nos arquivos enviados.")
+        else:
+            progress_bar = st.progress(0, text=f"Processando {len(pdfs)} arquivo(s)...")
+            live_table = st.empty()
+            live_rows = []
+
+            def on_result(result, done, total):
+                live_rows.append(_result_to_row(result, employee_labels))
+                progress_bar.progress(done / total, text=f"{done} de {total} arquivo(s) processado(s)...")
+                live_table.dataframe(pd.DataFrame(live_rows), hide_index=True, use_container_width=True)
+
+            st.session_state.bulk_results = manager.analyze_files(pdfs, doc_type, current_employees, on_result=on_result)
+            st.session_state.bulk_company = selected_company
+            progress_bar.empty()
+            live_table.empty()
+
+    results = st.session_state.get('bulk_results')
+    if not results or st.session_state.get('bulk_company') != selected_company:
+        return
+
+    st.markdown("### Revisão")
+    employee_options = {label: emp_id for emp_id, label in employee_labels.items()}
+    review_df = pd.DataFrame([_result_to_row(r, employee_labels) for r in results])
+
+    col_all, col_none, _ = st.columns([1, 1, 4])
+    if col_all.button("Marcar todos os prontos"):
+        st.session_state.bulk_default_confirm = True
+    if col_none.button("Desmarcar todos"):
+        st.session_state.bulk_default_confirm = False
+    default_confirm = st.session_state.get('bulk_default_confirm')
+    if default_confirm is not None:
+        review_df['confirmar'] = review_df['status'].eq('Pronto') & default_confirm
+
+    edited_df = st.data_editor(
+        review_df,
+        column_config={
+            "confirmar": st.column_config.CheckboxColumn("Salvar?"),
+            "arquivo": "Arquivo",
+            "status": "Status",
+            "funcionario": st.column_config.SelectboxColumn("Funcionário", options=list(employee_options.keys())),
+            "resumo": "Dados Extraídos",
+            "parecer": "Parecer da Auditoria",
+            "fonte_extracao": "Fonte",
+            "mensagem": "Observação"
+        },
+        disabled=["arquivo", "status", "resumo", "parecer", "fonte_extracao", "mensagem"],
+        hide_index=True, use_container_width=True, key="bulk_review_editor"
+    )
+
+    if st.button("Salvar Linhas Confirmadas", type="primary"):
+        to_save = []
+        for result, (_, row) in zip(results, edited_df.iterrows()):
+            if not row['confirmar'] or result['status'] != 'Pronto':
+                continue
+            employee_id = employee_options.get(row['funcionario'])
+            if not employee_id:
+                continue
+            to_save.append({**result, 'funcionario_id': employee_id})
+
+        if not to_save:
+            st.warning("Nenhuma linha confirmada com funcionário selecionado.")
+            return
+
+        with st.spinner(f"Enviando {len(to_save)} documento(s) e gravando na planilha..."):
+            summary = manager.commit(to_save, selected_company)
+
+        st.success(
+            f"{summary['saved']} documento(s) salvo(s), {summary['action_items']} item(ns) de ação criado(s)."
+            + (f" {summary['failed']} falha(s)." if summary['failed'] else "")
+        )
+        for key in ['bulk_results', 'bulk_company', 'bulk_default_confirm']:
+            if key in st.session_state:
+                del st.session_state[key]
@@ -0,0 +1,20 @@
+import streamlit as st
+
+from analysis.rag_index_builder import STATUS_PENDING, STATUS_LEXICAL, STATUS_ERROR
+
+
+def display_rag_status(nr_analyzer):
+    """Aviso discreto enquanto a base de conhecimento é indexada em segundo plano."""
+    builder = getattr(nr_analyzer, 'rag_builder', None)
+    if builder is None or builder.ready:
+        return
+    if builder.status == STATUS_PENDING:
+        st.caption("⏳ Carregando a base de conhecimento em segundo plano. As auditorias usam os contextos já em cache até concluir.")
+    elif builder.status == STATUS_LEXICAL:
+        done, total = builder.progress
+        progress = f" ({done}/{total})" if total else ""
+        st.caption(f"⏳ Indexando a base de conhecimento{progress}. Enquanto isso, as auditorias usam busca por palavras-chave.")
+        if builder.error:
+            st.caption(f"⚠️ Falha na indexação semântica: {builder.error}")
+    elif builder.status == STATUS_ERROR:
+        st.warning(f"Base de conhecimento indisponível: {builder.error}. Uma nova tentativa será feita automaticamente.")
@@ -0,0 +1,108 @@
+import streamlit as st
+import pandas as pd
+
+from operations.bulk_ingestion import MAX_WORKERS_LIMIT, get_default_max_workers
+from operations.reaudit_campaign import (
+    CAMPAIGN_DOC_TYPES,
+    CampaignFilters,
+    ReauditCampaign,
+    ReauditRunner
+)
+
+
+def _campaign_row(campaign: ReauditCampaign) -> dict:
+    counts = campaign.counts()
+    last_run = campaign.manifest.get('last_run') or {}
+    if not campaign.manifest.get('targets'):
+        situacao = "Nova"
+    elif counts['pendentes'] == 0:
+        situacao = "Concluída"
+    elif last_run.get('stopped_reason'):
+        situacao = "Pausada"
+    else:
+        situacao = "Em andamento"
+    return {
+        'campanha': campaign.manifest['name'],
+        'criada_em': campaign.manifest['created_at'],
+        'situacao': situacao,
+        **counts,
+    }
+
+
+def show_reaudit_campaigns(employee_manager, docs_manager, nr_analyzer, gdrive_uploader):
+    """Aba de campanhas de reauditoria dos documentos já salvos."""
+    st.header("Campanhas de Reauditoria")
+    st.info(
+        "Reaudita documentos já salvos com a base de conhecimento atual. O progresso é salvo a cada "
+        "documento: uma campanha interrompida (ou pausada pelo orçamento de IA) continua de onde parou."
+    )
+
+    with st.form("reaudit_campaign_form"):
+        st.markdown("##### Nova campanha")
+        name = st.text_input("Nome da campanha", placeholder="Ex.: Revisão após atualização da NR-35")
+        doc_types = st.multiselect("Tipos de documento", list(CAMPAIGN_DOC_TYPES), default=list(CAMPAIGN_DOC_TYPES))
+        companies = employee_manager.companies_df
+        company_options = dict(zip(companies['nome'], companies['id'].astype(str))) if not companies.empty else {}
+        selected_companies = st.multiselect("Empresas (vazio = todas)", list(company_options))
+        col1, col2 = st.columns(2)
+        date_from = col1.date_input("Emitidos a partir de", value=None, format="DD/MM/YYYY")
+        date_to = col2.date_input("Emitidos até", value=None, format="DD/MM/YYYY")
+        normas = st.text_input("Normas / tipos de documento (separados por vírgula; vazio = todos)", placeholder="NR-35, PGR")
+        skip_current = st.checkbox("Ignorar documentos já reauditados com a base de conhecimento atual", value=True)
+        if st.form_submit_button("Criar Campanha", type="primary"):
+            if not doc_types:
+                st.error("Selecione ao menos um tipo de documento.")
+            else:
+                filters = CampaignFilters(
+                    doc_types=doc_types,
+                    company_ids=[company_options[c] for c in selected_companies],
+                    date_from=date_from.isoformat() if date_from else None,
+                    date_to=date_to.isoformat() if date_to else None,
+                    normas=[n.strip() for n in normas.split(',') if n.strip()],
+                    skip_current_version=skip_current
+                )
+                campaign = ReauditCampaign.create(filters, name.strip())
+                targets = ReauditRunner(employee_manager, docs_manager, nr_analyzer, gdrive_uploader).prepare(campaign)
+                st.success(f"Campanha criada com {len(targets)} documento(s).")
+
+    campaigns = ReauditCampaign.list_all()
+    if not campaigns:
+        return
+
+    st.markdown("##### Campanhas")
+    st.dataframe(pd.DataFrame([_campaign_row(c) for c in campaigns]), hide_index=True, use_container_width=True)
+
+    open_campaigns = {c.id: c for c in campaigns if c.counts()['pendentes'] > 0}
+    if not open_campaigns:
+        return
+
+    col1, col2 = st.columns([2, 1])
+    selected = col1.selectbox(
+        "Campanha a executar", list(open_campaigns),
+        format_func=lambda campaign_id: f"{open_campaigns[campaign_id].manifest['name']} "
+                                        f"(criada em {open_campaigns[campaign_id].manifest['created_at']})"
+    )
+    max_workers = col2.slider("Processamentos simultâneos", 1, MAX_WORKERS_LIMIT, get_default_max_workers(), key="reaudit_max_workers")
+
+    if st.button("Executar / Retomar Campanha", type="primary"):
+        campaign = open_campaigns[selected]
+        runner = ReauditRunner(employee_manager, docs_manager, nr_analyzer, gdrive_uploader, max_workers=max_workers)
+        progress_bar = st.progress(0, text="Preparando a reauditoria...")
+
+        def on_progress(counts):
+            done = counts['gravados'] + counts['auditados'] + counts['falhas']
+            total = max(counts['total'], 1)
+            progress_bar.progress(min(done / total, 1.0), text=f"{done} de {counts['total']} documento(s) processado(s)...")
+
+        with st.spinner("Reauditando documentos..."):
+            summary = runner.run(campaign, on_progress=on_progress)
+        progress_bar.empty()
+
+        st.success(
+            f"{summary['audited']} documento(s) reauditado(s), {summary['written']} gravado(s) e "
+            f"{summary['action_items']} item(ns) criados no plano de ação."
+        )
+        if summary['failed']:
+            st.warning(f"{summary['failed']} documento(s) falharam; eles serão tentados novamente na próxima execução.")
+        if summary['stopped_reason']:
+            st.warning(f"Campanha pausada: {summary['stopped_reason']} Retome-a para continuar de onde parou.")
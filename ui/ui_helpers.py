@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, date
+from AI.json_stream import IncrementalJSONParser
 
 def mostrar_info_normas():
     with st.expander("Informações sobre Normas Regulamentadoras"):
@@ -46,6 +47,31 @@ def style_audit_table(row):
         return ['background-color: #FFCDD2'] * len(row)
     return [''] * len(row)
 
+def _format_partial_value(value) -> str:
+    if isinstance(value, list):
+        return "; ".join(str(v.get('item', v)) if isinstance(v, dict) else str(v) for v in value) or "—"
+    return "—" if value is None else str(value)
+
+def _streaming_preview(title):
+    """
+    Área que mostra a resposta da IA enquanto ela chega: os campos do JSON já completos
+    e os itens de uma lista ainda em recebimento. Retorna (placeholder, on_partial).
+    """
+    placeholder = st.empty()
+    parser = IncrementalJSONParser()
+
+    def on_partial(text):
+        parser.update(text)
+        lines = [f"**{title}** — {len(text)} caracteres recebidos"]
+        for field, value in parser.fields.items():
+            lines.append(f"- **{field.replace('_', ' ').capitalize()}:** {_format_partial_value(value)}")
+        field, items = parser.pending_items()
+        if items:
+            lines.append(f"- **{field.replace('_', ' ').capitalize()}:** {_format_partial_value(items)} _(recebendo...)_")
+        placeholder.markdown("\n".join(lines))
+
+    return placeholder, on_partial
+
 def _run_analysis_and_audit(manager, analysis_method_name, uploader_key, doc_type_str, employee_id_key=None):
     """
     Função genérica e interna que recebe o objeto gerenciador como argumento.
@@ -65,7 +91,9 @@ def _run_analysis_and_audit(manager, analysis_method_name, uploader_key, doc_typ
     analysis_func = getattr(manager, analysis_method_name)
     
     with st.spinner(f"Analisando conteúdo do PDF..."):
-        info = analysis_func(anexo)
+        preview, on_partial = _streaming_preview("Extração em andamento")
+        info = analysis_func(anexo, on_partial=on_partial)
+        preview.empty()
 
     if not info:
         st.error("Não foi possível extrair informações básicas do documento.")
@@ -76,7 +104,9 @@ def _run_analysis_and_audit(manager, analysis_method_name, uploader_key, doc_typ
         info['employee_id'] = employee_id
 
     with st.spinner(f"Executando auditoria de conformidade..."):
-        audit_result = nr_analyzer.perform_initial_audit(info, anexo.getvalue())
+        preview, on_partial = _streaming_preview("Auditoria em andamento")
+        audit_result = nr_analyzer.perform_initial_audit(info, anexo.getvalue(), on_partial=on_partial)
+        preview.empty()
 
     info['audit_result'] = audit_result or {"summary": "Falha na Auditoria", "details": []}
     